@@ -0,0 +1,192 @@
+"""
+Benchmark of the download and archive path against a local fake image CDN.
+
+Run from the root of the repository, e.g.:
+
+    python -m Benchmarks.bench_download --chapters 5 --pages 30 --latency 0.05 --error-rate 0.01
+
+The results are written to Benchmarks/results/<commit>.json so runs can be compared across commits.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+from Benchmarks.fake_cdn import FakeCdnConfig, FakeCdnProcess
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows, the peak RSS is not reported there
+    resource = None
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Benchmark FileOperations against a local fake image CDN.")
+    parser.add_argument("--chapters", type=int, default=5, help="Number of chapters to download.")
+    parser.add_argument("--pages", type=int, default=30, help="Number of pages per chapter.")
+    parser.add_argument("--latency", type=float, default=0.05, help="Time to first byte of every page, in seconds.")
+    parser.add_argument("--jitter", type=float, default=0.02, help="Standard deviation of the latency, in seconds.")
+    parser.add_argument("--bandwidth", type=int, default=None, help="Bytes per second per connection, unlimited by default.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of the requests answered with a 503.")
+    parser.add_argument("--size-median", type=int, default=400 * 1024, help="Median page size in bytes.")
+    parser.add_argument("--size-sigma", type=float, default=0.5, help="Sigma of the log-normal page size distribution.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the page sizes and contents.")
+    parser.add_argument("--engine", choices=("threads", "asyncio"), default="threads", help="Download engine.")
+    parser.add_argument("--transcode", choices=("webp", "jpeg", "avif"), default=None, help="Re-encode the pages before archiving them.")
+    parser.add_argument("--page-store", action="store_true", help="Keep the pages in the content-addressed page store.")
+    parser.add_argument("--output", default=None, help="JSON file of the results, Benchmarks/results/<commit>.json by default.")
+    return parser.parse_args()
+
+
+def get_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def get_peak_rss_mib():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in KiB everywhere else
+    return peak / (1024 * 1024) if platform.system() == "Darwin" else peak / 1024
+
+
+def percentile(values, q):
+    # Nearest-rank percentile of the measured values
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(q * len(ordered) + 0.5)) - 1))]
+
+
+def time_page_downloads(file_operations, latencies):
+    """
+    Record the latency of every page downloaded by the real download path.
+
+    Args:
+        file_operations (FileOperations): The FileOperations instance under test.
+        latencies (list): The list the latencies are appended to, in seconds.
+    """
+    if file_operations.download_engine == "asyncio":
+        engine = file_operations.async_engine
+        download_image = engine._download_image
+
+        async def timed_download_image(session, img_src):
+            start_time = time.perf_counter()
+            try:
+                return await download_image(session, img_src)
+            finally:
+                latencies.append(time.perf_counter() - start_time)
+        engine._download_image = timed_download_image
+    else:
+        download_image = file_operations.download_image
+
+        def timed_download_image(img_src):
+            start_time = time.perf_counter()
+            try:
+                return download_image(img_src)
+            finally:
+                latencies.append(time.perf_counter() - start_time)
+        file_operations.download_image = timed_download_image
+
+
+def run_benchmark(args, cdn, work_dir):
+    """
+    Download the chapters of the fake CDN with FileOperations and measure the run.
+
+    Args:
+        args (argparse.Namespace): The benchmark options.
+        cdn (FakeCdnProcess): The running fake CDN.
+        work_dir (str): The save path of the run.
+
+    Returns:
+        dict: The measurements of the run.
+    """
+    os.environ["SAVE_PATH"] = work_dir
+    os.environ["PAGE_STORE_PATH"] = os.path.join(work_dir, "pages") if args.page_store else ""
+    # Imported once the environment is set, so the save path and page store of the run are used
+    from MangaDownload import Metrics
+    from MangaDownload.FileOperations import FileOperations
+
+    file_operations = FileOperations(download_engine=args.engine, transcode_format=args.transcode)
+    latencies = []
+    time_page_downloads(file_operations, latencies)
+    try:
+        start_time = time.perf_counter()
+        for chapter_number in range(1, args.chapters + 1):
+            page_data = [("Benchmark", chapter_number, page_number, cdn.page_url(chapter_number, page_number))
+                         for page_number in range(1, args.pages + 1)]
+            file_operations.bulk_save_png_links(page_data)
+        wall_seconds = time.perf_counter() - start_time
+        # Measured before the in-memory path, which holds every page of a chapter by design
+        peak_rss_mib = get_peak_rss_mib()
+
+        # The in-memory archive path, fed with pages already downloaded
+        image_data_list = [("Benchmark in memory", 1, page_number, cdn.page_body(f"/data/1/{page_number}.png"))
+                           for page_number in range(1, args.pages + 1)]
+        start_time = time.perf_counter()
+        file_operations.create_cbz_file(image_data_list)
+        create_cbz_seconds = time.perf_counter() - start_time
+    finally:
+        file_operations.close()
+
+    archive = Metrics.chapter_archive_seconds.snapshot().get('total', {'count': 0, 'sum': 0.0})
+    page_bytes = sum(Metrics.page_bytes.snapshot().values())
+    return {
+        'wall_seconds': wall_seconds,
+        'pages_downloaded': len(latencies),
+        'pages_per_second': len(latencies) / wall_seconds if wall_seconds else 0.0,
+        'bytes_per_second': page_bytes / wall_seconds if wall_seconds else 0.0,
+        'page_latency_p50': percentile(latencies, 0.50),
+        'page_latency_p95': percentile(latencies, 0.95),
+        'page_latency_p99': percentile(latencies, 0.99),
+        'chapters_archived': archive['count'],
+        'cbz_write_seconds_total': archive['sum'],
+        'cbz_write_seconds_per_chapter': archive['sum'] / archive['count'] if archive['count'] else None,
+        'create_cbz_file_seconds': create_cbz_seconds,
+        'peak_rss_mib': peak_rss_mib,
+        'cdn_requests': cdn.requests,
+        'cdn_errors': cdn.errors,
+    }
+
+
+def main():
+    args = parse_arguments()
+    config = FakeCdnConfig(latency=args.latency, latency_jitter=args.jitter, bandwidth=args.bandwidth,
+                           error_rate=args.error_rate, size_median=args.size_median, size_sigma=args.size_sigma,
+                           seed=args.seed)
+    work_dir = tempfile.mkdtemp(prefix="manga-bench-")
+    try:
+        # The CDN runs in its own process so the peak RSS only measures the download path
+        with FakeCdnProcess(config) as cdn:
+            results = run_benchmark(args, cdn, work_dir)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    commit = get_commit()
+    report = {
+        'commit': commit,
+        'timestamp': time.time(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'options': vars(args),
+        'results': results,
+    }
+    output = args.output or os.path.join("Benchmarks", "results", f"{commit}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as output_file:
+        json.dump(report, output_file, indent=2)
+
+    for name, value in results.items():
+        print(f"{name}: {value:.4f}" if isinstance(value, float) else f"{name}: {value}")
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+import multiprocessing
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+
+class FakeCdnConfig:
+    """
+    Behaviour of the fake image CDN.
+    """
+    def __init__(self, latency=0.05, latency_jitter=0.02, bandwidth=None, error_rate=0.0, error_status=503,
+                 size_median=400 * 1024, size_sigma=0.5, seed=0):
+        """
+        Initialize the FakeCdnConfig instance.
+
+        Args:
+            latency (float): The time before the first byte of every response, in seconds.
+            latency_jitter (float): The standard deviation of the latency, in seconds.
+            bandwidth (int): The bytes per second sent on every connection, None for unlimited.
+            error_rate (float): The share of requests answered with error_status.
+            error_status (int): The HTTP status of the failed requests.
+            size_median (int): The median page size in bytes.
+            size_sigma (float): The sigma of the log-normal page size distribution, 0 for a fixed size.
+            seed (int): The seed of the page sizes and contents, the same seed serves the same pages.
+        """
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.bandwidth = bandwidth
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.size_median = size_median
+        self.size_sigma = size_sigma
+        self.seed = seed
+
+
+def generate_page_body(config, path):
+    """
+    Generate the body of a page, a PNG signature followed by pseudo-random bytes.
+
+    Args:
+        config (FakeCdnConfig): The behaviour of the server.
+        path (str): The path of the page.
+
+    Returns:
+        bytes: The page, the same for the same path and seed.
+    """
+    rng = random.Random(f"{config.seed}:{path}")
+    size = int(rng.lognormvariate(0, config.size_sigma) * config.size_median) if config.size_sigma else config.size_median
+    return PNG_SIGNATURE + rng.randbytes(max(0, size - len(PNG_SIGNATURE)))
+
+
+class FakeCdn:
+    """
+    Local HTTP server serving synthetic pages on /data/<chapter>/<page>.png.
+
+    Every page is a PNG signature followed by pseudo-random bytes, its size and content only depend
+    on its path and the seed so every run downloads exactly the same bytes. The pages are generated
+    for every request and never kept, so the server holds no more than the responses it is sending.
+    """
+    def __init__(self, config=None, host="127.0.0.1", port=0):
+        """
+        Initialize the FakeCdn instance and start serving in a background thread.
+
+        Args:
+            config (FakeCdnConfig): The behaviour of the server.
+            host (str): The address to listen on.
+            port (int): The port to listen on, 0 for a random one.
+        """
+        self.config = config or FakeCdnConfig()
+        self.requests = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+        self._error_rng = random.Random(self.config.seed)
+        handler = type("FakeCdnHandler", (_FakeCdnHandler,), {'cdn': self})
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self.server.daemon_threads = True
+        self.base_url = f"http://{host}:{self.server.server_address[1]}"
+        self._thread = threading.Thread(target=self.server.serve_forever, name="fake-cdn", daemon=True)
+        self._thread.start()
+
+    def page_url(self, chapter_number, page_number):
+        return f"{self.base_url}/data/{chapter_number}/{page_number}.png"
+
+    def page_body(self, path):
+        return generate_page_body(self.config, path)
+
+    def should_fail(self):
+        with self._lock:
+            self.requests += 1
+            if self.config.error_rate and self._error_rng.random() < self.config.error_rate:
+                self.errors += 1
+                return True
+        return False
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+
+class FakeCdnProcess:
+    """
+    FakeCdn served from a child process, so the memory and CPU time of the server are not measured
+    with those of the client downloading from it.
+    """
+    def __init__(self, config=None, host="127.0.0.1", port=0):
+        """
+        Initialize the FakeCdnProcess instance and start the server process.
+
+        Args:
+            config (FakeCdnConfig): The behaviour of the server.
+            host (str): The address to listen on.
+            port (int): The port to listen on, 0 for a random one.
+        """
+        self.config = config or FakeCdnConfig()
+        # spawn starts a fresh interpreter, a forked child would share the memory of the client
+        context = multiprocessing.get_context("spawn")
+        self._connection, child_connection = context.Pipe()
+        self._process = context.Process(target=_serve_fake_cdn, args=(self.config, host, port, child_connection),
+                                        name="fake-cdn", daemon=True)
+        self._process.start()
+        child_connection.close()
+        self.base_url = self._connection.recv()
+        self._counters = (0, 0)
+
+    def page_url(self, chapter_number, page_number):
+        return f"{self.base_url}/data/{chapter_number}/{page_number}.png"
+
+    def page_body(self, path):
+        return generate_page_body(self.config, path)
+
+    def get_counters(self):
+        # (requests, errors) served by the child process, the last ones once it is closed
+        if self._process.is_alive():
+            self._connection.send("counters")
+            self._counters = self._connection.recv()
+        return self._counters
+
+    @property
+    def requests(self):
+        return self.get_counters()[0]
+
+    @property
+    def errors(self):
+        return self.get_counters()[1]
+
+    def close(self):
+        if self._process.is_alive():
+            self._counters = self.get_counters()
+            self._connection.send("close")
+            self._process.join()
+        self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+
+def _serve_fake_cdn(config, host, port, connection):
+    # Entry point of the FakeCdnProcess child: serve until the parent asks to close
+    with FakeCdn(config, host, port) as cdn:
+        connection.send(cdn.base_url)
+        while connection.recv() != "close":
+            connection.send((cdn.requests, cdn.errors))
+    connection.close()
+
+
+class _FakeCdnHandler(BaseHTTPRequestHandler):
+    cdn = None
+    # Keep-alive connections, as served by the real CDN
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        config = self.cdn.config
+        if not self.path.startswith("/data/"):
+            self.send_error(404)
+            return
+        time.sleep(max(0.0, random.gauss(config.latency, config.latency_jitter)))
+        if self.cdn.should_fail():
+            self.send_response(config.error_status)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        body = self.cdn.page_body(self.path)
+        self.send_response(200)
+        self.send_header("Content-Type", "image/png")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if not config.bandwidth:
+            self.wfile.write(body)
+            return
+        # Throttle the connection to the configured bandwidth
+        chunk_size = 16 * 1024
+        for offset in range(0, len(body), chunk_size):
+            self.wfile.write(body[offset:offset + chunk_size])
+            time.sleep(min(chunk_size, len(body) - offset) / config.bandwidth)
+
+    def log_message(self, format, *args):
+        pass
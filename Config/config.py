@@ -21,6 +21,91 @@ class Config:
     CRX_PATH = "Extensions/uBlock-Origin.crx"
     FIRST_PAGE_CLASS = "chapter-grid.flex-grow"
     PAGE_WRAP_CLASS = "min-w-0.relative.pages-wrap.md--reader-pages"
+    MANGADEX_API_URL = "https://api.mangadex.org" # Base URL of the MangaDex API (Can be overridden with MANGADEX_API_URL in the .env file)
+    AT_HOME_SERVER_ENDPOINT = "/at-home/server/{}" # Endpoint returning the image server, hash and filenames of a chapter
+    MANGA_FEED_ENDPOINT = "/manga/{}/feed" # Endpoint listing the chapters of a manga
+    CHAPTER_LIST_SOURCE = "api" # Source of the chapter lists ("api" reads the feed, "browser" the title page) (Can be overridden with CHAPTER_LIST_SOURCE in the .env file)
+    CHAPTER_FEED_PAGE_SIZE = 500 # Number of chapters per feed request (500 at most)
+    CHAPTER_FEED_WORKERS = 4 # Number of feed pages requested at the same time
+    DEFAULT_CHAPTER_RESOLVER = "api" # Resolver tried first to find the chapter pages ("api" or "selenium")
+    QUALITY_ORIGINAL = "original" # Original pages, as uploaded
+    QUALITY_DATA_SAVER = "data-saver" # Smaller JPEG versions of the pages
+    QUALITY_DATA_SAVER_WITH_FALLBACK = "data-saver-with-fallback" # Data saver pages, or the originals for a new series whose chapters have no data saver pages
+    QUALITY_TIERS = (QUALITY_ORIGINAL, QUALITY_DATA_SAVER, QUALITY_DATA_SAVER_WITH_FALLBACK) # Available page qualities
+    DEFAULT_QUALITY = QUALITY_ORIGINAL # Quality of the pages downloaded (Can be overridden with QUALITY in the .env file or per job). A series keeps the quality of its saved chapters
+    HTTP_POOL_SIZE = 30 # Number of keep-alive connections kept open per host
+    HTTP_POOL_HOSTS = 20 # Number of hosts (image nodes) for which a connection pool is kept
+    HTTP_MAX_RETRIES = 3 # Number of retries of a failed request
+    HTTP_BACKOFF_FACTOR = 0.5 # Backoff factor between retries (0.5s, 1s, 2s, ...)
+    HTTP_RETRY_STATUSES = (429, 500, 502, 503, 504) # HTTP statuses that are retried
+    HOST_RATE_LIMITS = {
+        "api.mangadex.org": (5, 5),
+    } # Requests per second and burst of the hosts with a published rate limit
+    AIMD_INITIAL_LIMIT = 8 # Starting number of concurrent requests per host
+    AIMD_MIN_LIMIT = 1 # Lowest number of concurrent requests per host
+    AIMD_MAX_LIMIT = 30 # Highest number of concurrent requests per host
+    AIMD_DECREASE_FACTOR = 0.5 # Factor applied to the concurrency limit of a host on 429/5xx/timeouts
+    AIMD_LATENCY_TOLERANCE = 2.0 # The limit stops growing when the latency exceeds the best one seen by this factor
+    AIMD_ADJUSTMENT_HISTORY = 1000 # Number of limit adjustments kept for the metrics
+    MANGADEX_UPLOADS_URL = "https://uploads.mangadex.org" # Origin image server, used when no healthy MangaDex@Home node serves a page
+    NODE_HEALTH_SMOOTHING = 0.2 # Weight of the last download in the latency, error rate and throughput averages of an image node
+    NODE_FAILURE_THRESHOLD = 3 # Number of pages failing in a row after which an image node is quarantined
+    NODE_MAX_ERROR_RATE = 0.5 # Average error rate above which an image node is quarantined
+    NODE_MAX_LATENCY = 8.0 # Average download time of a page, in seconds, above which an image node is quarantined
+    NODE_MIN_SAMPLES = 5 # Number of downloads from a node before its error rate and latency are trusted
+    NODE_QUARANTINE_SECONDS = 5 * 60 # Cooldown of a quarantined image node, doubled every time it is quarantined again
+    NODE_MAX_QUARANTINE_SECONDS = 60 * 60 # Longest cooldown of a quarantined image node
+    NODE_FAILOVER_RESOLVES = 2 # Number of times the image node of a chapter is resolved again before falling back to the origin server
+    NODE_REPORTS = False # Report the outcome of every page to the MangaDex@Home network (Can be overridden with NODE_REPORTS=1 in the .env file)
+    NODE_REPORT_URL = "https://api.mangadex.network/report" # Report endpoint of the MangaDex@Home network
+    DOWNLOAD_ENGINES = ("threads", "asyncio") # Available download engines
+    DEFAULT_DOWNLOAD_ENGINE = "threads" # Download engine used if DOWNLOAD_ENGINE is not set in the .env file
+    ASYNC_MAX_IN_FLIGHT = 1000 # Maximum number of page fetches in flight with the asyncio engine
+    ASYNC_PER_HOST_LIMIT = 100 # Maximum number of connections per host with the asyncio engine
+    CHROMEDRIVER_CACHE_PATH = "./Cache/chromedriver.json" # Path and version of the ChromeDriver binary resolved by ChromeDriverManager
+    CHROMEDRIVER_CACHE_TTL = 7 * 24 * 60 * 60 # Number of seconds during which the cached ChromeDriver is used without checking for a new one
+    REUSE_BROWSER_PAGES = True # Take the pages loaded by the browser from Chrome instead of downloading them again (Can be overridden with REUSE_BROWSER_PAGES=0 in the .env file)
+    BROWSER_PAGES_MAX_BYTES = 512 * 1024 * 1024 # Maximum size of the page bodies taken from the browser and waiting to be archived
+    DRIVER_POOL_SIZE = 2 # Number of headless browsers resolving chapters in parallel (Can be overridden with DRIVER_POOL_SIZE in the .env file)
+    DRIVER_MAX_NAVIGATIONS = 50 # Number of navigations after which a pooled browser is restarted to release its memory
+    CHAPTER_CACHE_PATH = "./Cache/chapters" # Folder of the cached chapter lists
+    CHAPTER_CACHE_VERSION = 2 # Format of the cached chapter lists, lists of another format are fetched again
+    CHAPTER_CACHE_TTL = 6 * 60 * 60 # Seconds during which a cached chapter list is used without refreshing it (Can be overridden with CHAPTER_CACHE_TTL in the .env file)
+    LIBRARY_INDEX_PATH = "./Cache/library.sqlite3" # SQLite index of the saved chapters, kept on the local disk since SQLite cannot lock a database on network storage
+    REINDEX_WORKERS = 16 # Number of series folders scanned at the same time by the reindex command
+    AUDIT_WORKERS = None # Number of processes checking the archives of the audit command, one per core by default (Can be overridden with AUDIT_WORKERS in the .env file)
+    AUDIT_BATCH_SIZE = 32 # Number of archives checked per task by an audit process
+    AUDIT_DECODE_IMAGES = True # Check that every page can be read by Pillow during the audit, on top of the CRC, magic bytes and hashes
+    REPAIR_QUEUE_PATH = "./Cache/repair.jsonl" # Archives found damaged by the audit and the pages the repair command downloads again
+    PAGE_STORE_PATH = None # Content-addressed store of the downloaded pages, disabled by default (Set PAGE_STORE_PATH in the .env file, e.g. ./Cache/pages, to enable it)
+    TRANSCODE_FORMAT = None # Format the pages are re-encoded to before archiving ("webp", "jpeg" or "avif"), None keeps the downloaded pages
+    TRANSCODE_QUALITY = 85 # Quality of the JPEG and AVIF re-encoding (WebP is lossless)
+    TRANSCODE_MIN_SAVINGS = 0.1 # Minimum size reduction for a re-encoded page to replace the original (0.1 = 10%)
+    MANGA_NAME_PROMPT = "Enter the name of the manga: " # First prompt of the download command
+    DEFAULT_LANGUAGE = "English" # Language of the chapters to download (title of the flag shown on the chapter cards)
+    LANGUAGE_NAMES = {
+        "en": "English",
+        "fr": "French",
+        "es": "Spanish",
+        "es-la": "Spanish (LATAM)",
+        "pt-br": "Portuguese (Br)",
+        "it": "Italian",
+        "de": "German",
+        "ru": "Russian",
+        "id": "Indonesian",
+        "vi": "Vietnamese",
+    } # Language codes accepted in the job files and their name on MangaDex
+    MANGADEX_TITLE_URL = "https://mangadex.org/title/{}" # URL of a manga from its id
+    MANGADEX_CHAPTER_URL = "https://mangadex.org/chapter/{}" # URL of a chapter from its id
+    WATCH_STATE_PATH = "./Cache/watch.json" # Cursor, ETag and polling interval of every watched series
+    WATCH_MIN_INTERVAL = 15 * 60 # Shortest polling interval of a series in seconds
+    WATCH_MAX_INTERVAL = 24 * 60 * 60 # Longest polling interval of a series in seconds
+    WATCH_DEFAULT_INTERVAL = 60 * 60 # Polling interval of a new subscription in seconds (Can be overridden with WATCH_INTERVAL in the .env file)
+    WATCH_JITTER = 0.2 # Random spread of the polling intervals (0.2 = +/-20%)
+    WATCH_MAX_ATTEMPTS = 5 # Number of polls during which an updated chapter that could not be saved is tried again
+    METRICS_PORT = None # Local port of the Prometheus metrics endpoint, disabled by default (Can be overridden with METRICS_PORT in the .env file)
+    METRICS_SNAPSHOT_PATH = "./Logs/metrics.json" # JSON snapshot of the metrics written at the end of a run
+    PIPELINE_QUEUE_SIZE = 2 # Number of chapters waiting between two stages of the chapter pipeline
 class ScriptConfig:
     windows_script = "./Scripts/windowsinstaller.ps1"
     linux_script = "./Scripts/linuxinstaller.sh"
@@ -30,13 +115,30 @@ class ScriptConfig:
     windows_curse = "windows-curses"
     javascript_network_script = """
         (function() {
+            // Installed before the page scripts run, and only once per document
+            if (window.getActiveRequests) {
+                return;
+            }
             let open = XMLHttpRequest.prototype.open;
             let send = XMLHttpRequest.prototype.send;
             let fetch = window.fetch;
             let activeRequests = 0;
-            let addRequest = () => activeRequests++;
+            // Number of pages of the chapter, from the at-home response fetched by the reader
+            let expectedPages = null;
+            // Page images loaded so far, from the resource timing entries
+            let loadedPages = new Set();
+            let listeners = [];
+            let notify = () => listeners.slice().forEach(listener => listener());
+            // Time of the last network activity, so a quiet period spans several waits
+            let lastActivity = performance.now();
+            let addRequest = () => {
+                activeRequests++;
+                lastActivity = performance.now();
+            };
             let removeRequest = () => {
                 activeRequests = Math.max(0, activeRequests - 1);
+                lastActivity = performance.now();
+                notify();
             };
             XMLHttpRequest.prototype.open = function() {
                 addRequest();
@@ -50,8 +152,15 @@ class ScriptConfig:
             };
             window.fetch = function() {
                 addRequest();
+                let url = String(arguments[0] && arguments[0].url || arguments[0]);
                 return fetch.apply(this, arguments)
                     .then(response => {
+                        if (url.includes('/at-home/server/')) {
+                            response.clone().json().then(server => {
+                                expectedPages = ((server.chapter || {}).data || []).length || null;
+                                notify();
+                            }).catch(() => {});
+                        }
                         removeRequest();
                         return response;
                     })
@@ -60,8 +169,88 @@ class ScriptConfig:
                         throw error;
                     });
             };
+            new PerformanceObserver(list => {
+                list.getEntries().forEach(entry => {
+                    if (/mangadex\\.network\\/data(-saver)?\\//.test(entry.name)) {
+                        loadedPages.add(entry.name);
+                    }
+                });
+                lastActivity = performance.now();
+                notify();
+            }).observe({type: 'resource', buffered: true});
             window.getActiveRequests = function() {
                 return activeRequests;
             };
+            window.getChapterState = function() {
+                return {active: activeRequests, expected: expectedPages, loaded: loadedPages.size};
+            };
+            // Resolves as soon as every expected page is loaded and no request is active. Without an
+            // expected count, the chapter is ready once some pages are loaded and the network stays quiet.
+            window.waitForChapterReady = function(timeoutMs, quietMs) {
+                return new Promise(resolve => {
+                    let quietTimer = null;
+                    let finish = ready => {
+                        listeners = listeners.filter(listener => listener !== check);
+                        clearTimeout(quietTimer);
+                        clearTimeout(timeoutTimer);
+                        resolve(Object.assign({ready: ready}, window.getChapterState()));
+                    };
+                    let check = () => {
+                        clearTimeout(quietTimer);
+                        if (activeRequests > 0) {
+                            return;
+                        }
+                        if (expectedPages !== null && loadedPages.size >= expectedPages) {
+                            finish(true);
+                        } else if (expectedPages === null && loadedPages.size > 0) {
+                            quietTimer = setTimeout(() => finish(true), Math.max(0, quietMs - (performance.now() - lastActivity)));
+                        }
+                    };
+                    let timeoutTimer = setTimeout(() => finish(false), timeoutMs);
+                    listeners.push(check);
+                    check();
+                });
+            };
         })();
+        """
+    chapter_cards_script = """
+        // Every chapter card of the page in a single call: [cards selector, link selector, flag title]
+        let [cardSelector, linkSelector, language] = arguments;
+        return Array.from(document.querySelectorAll(cardSelector)).map(card => {
+            for (let link of card.querySelectorAll(linkSelector)) {
+                let flag = link.querySelector('img');
+                let anchor = link.querySelector('a');
+                if (!flag || !anchor || flag.getAttribute('title') !== language) {
+                    continue;
+                }
+                if (!anchor.href || anchor.href.includes('mangaplus')) {
+                    continue;
+                }
+                let name = (link.innerText || '').trim().split('\\n')[0];
+                let number = name.match(/Ch\\.\\s*(\\d+(?:\\.\\d+)?)/i);
+                return {
+                    chapter_name: name,
+                    chapter_link: anchor.href,
+                    language: flag.getAttribute('title'),
+                    chapter_number: number ? Number(number[1]) : null,
+                };
+            }
+            return null;
+        }).filter(chapter => chapter);
+        """
+    manga_cards_script = """
+        // Title and link of every search result in a single call: [cards selector]
+        return Array.from(document.querySelectorAll(arguments[0])).map(card => {
+            let anchor = card.querySelector('a');
+            let title = (card.innerText || '').trim().split('\\n')[0];
+            return title && anchor ? {title: title, link: anchor.href} : null;
+        }).filter(manga => manga);
+        """
+    chapter_ready_script = """
+        let done = arguments[arguments.length - 1];
+        if (!window.waitForChapterReady) {
+            done(null);
+            return;
+        }
+        window.waitForChapterReady(arguments[0], arguments[1]).then(done);
         """
\ No newline at end of file
@@ -1,25 +1,91 @@
+import json
+import os
+import subprocess
 import sys
+import threading
+import time
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
-from webdriver_manager.chrome import ChromeDriverManager
 from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.common.desired_capabilities import DesiredCapabilities
 import random
 from Config.config import Config
-from selenium.common.exceptions import WebDriverException
+from selenium.common.exceptions import SessionNotCreatedException, WebDriverException
 
 def check_chrome_installed():
     """
     Function to check if Google Chrome is installed on the user's system.
     """
     try:
-        # Try to install ChromeDriver 
-        ChromeDriverManager().install()
+        # Imported here, webdriver_manager is only needed when the cached driver cannot be used
+        from webdriver_manager.chrome import ChromeDriverManager
+        # Try to install ChromeDriver and return the path of the binary
+        return ChromeDriverManager().install()
     except WebDriverException:
         # Chrome is not installed on the system
         print("Chrome is not installed on your system. Please install it and try again.")
         sys.exit()
 
+def get_chromedriver_version(driver_path):
+    # "ChromeDriver 120.0.6099.109 (...)" -> "120.0.6099.109"
+    try:
+        output = subprocess.run([driver_path, "--version"], capture_output=True, text=True, timeout=10).stdout.split()
+        return output[1] if len(output) > 1 else None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def load_cached_chromedriver(cache_path=Config.CHROMEDRIVER_CACHE_PATH, ttl=Config.CHROMEDRIVER_CACHE_TTL):
+    """
+    Load the ChromeDriver resolved by a previous run.
+
+    Args:
+        cache_path (str): The cache file.
+        ttl (int): The number of seconds during which the cached driver is trusted.
+
+    Returns:
+        str: The path of the cached ChromeDriver binary, None if there is no valid cached driver.
+    """
+    try:
+        with open(cache_path, encoding='utf-8') as cache_file:
+            entry = json.load(cache_file)
+    except (OSError, ValueError):
+        return None
+    driver_path = entry.get('path')
+    # The binary must still be there and the entry young enough for Chrome not to have been updated much
+    if not driver_path or not os.path.isfile(driver_path) or not os.access(driver_path, os.X_OK):
+        return None
+    if time.time() - entry.get('resolved_at', 0) > ttl:
+        return None
+    return driver_path
+
+def save_cached_chromedriver(driver_path, cache_path=Config.CHROMEDRIVER_CACHE_PATH):
+    os.makedirs(os.path.dirname(cache_path) or '.', exist_ok=True)
+    entry = {'path': driver_path, 'version': get_chromedriver_version(driver_path), 'resolved_at': time.time()}
+    # The pooled browsers can start at the same time, every thread writes its own temporary file
+    temp_path = f"{cache_path}.{threading.get_ident()}.tmp"
+    try:
+        with open(temp_path, 'w', encoding='utf-8') as cache_file:
+            json.dump(entry, cache_file)
+        os.replace(temp_path, cache_path)
+    except OSError:
+        pass
+
+def resolve_chromedriver(refresh=False):
+    """
+    Get the path of the ChromeDriver binary, from the cache when possible.
+
+    Args:
+        refresh (bool): Ignore the cache and ask ChromeDriverManager again.
+
+    Returns:
+        str: The path of the ChromeDriver binary.
+    """
+    driver_path = None if refresh else load_cached_chromedriver()
+    if driver_path:
+        return driver_path
+    driver_path = check_chrome_installed()
+    save_cached_chromedriver(driver_path)
+    return driver_path
+
 def configure_browser_options(options, user_agents, crx_path):
     """
     Configures the browser options for automated testing.
@@ -47,10 +113,13 @@ def configure_browser_options(options, user_agents, crx_path):
     # Adding argument to disable the AutomationControlled flag
     options.add_argument("--disable-blink-features=AutomationControlled")
 
-def driver_setup():
+def driver_setup(headless=False):
     """
     Set up and configure the web driver for automated browser testing.
 
+    Args:
+        headless (bool): Run the browser without opening a window.
+
     Returns:
         WebDriver: The configured web driver instance.
     Raises:
@@ -60,16 +129,18 @@ def driver_setup():
         # Set up the driver options
         options = Options()
         # Run in headless mode (without opening a browser window)
-        #options.add_argument('--headless')
+        if headless:
+            options.add_argument('--headless=new')
         # Disable logging and configure other options
         configure_browser_options(options, Config.USER_AGENTS, Config.CRX_PATH)
-        # Check if Chrome is installed
-        check_chrome_installed()
-        # ChromeDriverManager will install the latest version of ChromeDriver
-        # Set up desired capabilities
-        caps = DesiredCapabilities().CHROME
-        caps['goog:loggingPrefs'] = {'performance': 'ALL'}
-        driver = webdriver.Chrome(service=Service(service=Service(check_chrome_installed()), options=options, desired_capabilities=caps))
+        # Enable the performance logs (used to capture the image URLs)
+        options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
+        # Use the cached ChromeDriver, ChromeDriverManager installs the matching version if there is none
+        try:
+            driver = webdriver.Chrome(service=Service(resolve_chromedriver()), options=options)
+        except SessionNotCreatedException:
+            # Chrome was updated since the driver was cached, resolve a matching driver again
+            driver = webdriver.Chrome(service=Service(resolve_chromedriver(refresh=True)), options=options)
         # Changing the property of the navigator value for webdriver to undefined
         driver.execute_script(
             "Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
@@ -0,0 +1,168 @@
+import atexit
+import threading
+from contextlib import contextmanager
+from Config.config import Config
+from Driver.driver_config import driver_setup
+
+
+class PooledDriver:
+    """
+    A WebDriver owned by the DriverPool and the number of navigations it has done.
+    """
+    def __init__(self, driver):
+        self.driver = driver
+        self.navigations = 0
+
+
+class DriverPool:
+    """
+    Pool of browsers leased to the threads that need one.
+
+    The browsers are started lazily, checked before every lease and restarted after a number
+    of navigations to contain the memory growth of Chrome.
+    """
+    def __init__(self, size=Config.DRIVER_POOL_SIZE, max_navigations=Config.DRIVER_MAX_NAVIGATIONS,
+                 headless=True, driver_factory=driver_setup):
+        """
+        Initialize the DriverPool instance.
+
+        Args:
+            size (int): The maximum number of browsers running at the same time.
+            max_navigations (int): The number of navigations after which a browser is restarted.
+            headless (bool): Run the browsers without opening a window.
+            driver_factory (callable): Function creating a WebDriver, called with the headless flag.
+        """
+        if size < 1:
+            raise ValueError(f"The driver pool size must be at least 1, got {size}.")
+        self.size = size
+        self.max_navigations = max_navigations
+        self.headless = headless
+        self.driver_factory = driver_factory
+        self._idle = []
+        self._drivers = set()
+        self._starting = 0
+        self._closed = False
+        self._condition = threading.Condition()
+        # Make sure no browser is left behind if the process exits without calling shutdown
+        atexit.register(self.shutdown)
+
+    def _create(self):
+        return PooledDriver(self.driver_factory(headless=self.headless))
+
+    def _quit(self, pooled):
+        try:
+            pooled.driver.quit()
+        except Exception:
+            # The browser already died, there is nothing left to close
+            pass
+
+    def is_healthy(self, pooled):
+        """
+        Check that the browser still answers.
+
+        Args:
+            pooled (PooledDriver): The pooled driver to check.
+
+        Returns:
+            bool: True if the browser answered, False otherwise.
+        """
+        try:
+            pooled.driver.current_url
+            return True
+        except Exception:
+            return False
+
+    def acquire(self):
+        """
+        Lease a browser, starting one if the pool is not full, or waiting for one to be released.
+
+        Returns:
+            PooledDriver: The leased driver.
+
+        Raises:
+            RuntimeError: If the pool has been shut down.
+        """
+        with self._condition:
+            while True:
+                if self._closed:
+                    raise RuntimeError("The driver pool has been shut down.")
+                if self._idle:
+                    pooled = self._idle.pop()
+                    break
+                if len(self._drivers) + self._starting < self.size:
+                    self._starting += 1
+                    pooled = None
+                    break
+                self._condition.wait()
+
+        if pooled is not None:
+            if self.is_healthy(pooled):
+                return pooled
+            # Replace the dead browser with a new one, keeping its slot
+            with self._condition:
+                self._drivers.discard(pooled)
+                self._starting += 1
+            self._quit(pooled)
+        try:
+            pooled = self._create()
+        except BaseException:
+            with self._condition:
+                self._starting -= 1
+                self._condition.notify()
+            raise
+        # Count the new browser as running before freeing its starting slot, so no waiter starts another one
+        with self._condition:
+            self._drivers.add(pooled)
+            self._starting -= 1
+            closed = self._closed
+            self._condition.notify()
+        if closed:
+            self._discard(pooled)
+            raise RuntimeError("The driver pool has been shut down.")
+        return pooled
+
+    def release(self, pooled):
+        """
+        Return a leased browser to the pool, restarting it if it reached the navigation limit.
+
+        Args:
+            pooled (PooledDriver): The leased driver.
+        """
+        if self._closed or pooled.navigations >= self.max_navigations:
+            self._discard(pooled)
+            return
+        with self._condition:
+            self._idle.append(pooled)
+            self._condition.notify()
+
+    def _discard(self, pooled):
+        # Quit the browser before freeing its slot, so its replacement never runs alongside it
+        self._quit(pooled)
+        with self._condition:
+            self._drivers.discard(pooled)
+            self._condition.notify()
+
+    @contextmanager
+    def lease(self):
+        """
+        Lease a browser for the duration of a with block.
+
+        Yields:
+            PooledDriver: The leased driver.
+        """
+        pooled = self.acquire()
+        try:
+            yield pooled
+        finally:
+            self.release(pooled)
+
+    def shutdown(self):
+        # Quit every browser, idle or leased, so no Chrome process is orphaned
+        with self._condition:
+            self._closed = True
+            drivers = list(self._drivers)
+            self._drivers.clear()
+            self._idle.clear()
+            self._condition.notify_all()
+        for pooled in drivers:
+            self._quit(pooled)
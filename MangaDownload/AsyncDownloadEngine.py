@@ -0,0 +1,170 @@
+import asyncio
+import threading
+import time
+from urllib.parse import urlsplit
+from Config.config import Config
+from MangaDownload import Metrics
+from MangaDownload.DownloadLogger import logger
+
+
+class AsyncDownloadEngine:
+    """
+    Download engine running every page fetch on a single asyncio event loop.
+
+    The event loop runs in a background thread for the lifetime of the engine, so the
+    aiohttp session and its connections are shared by every chapter.
+    """
+    def __init__(self, max_in_flight=Config.ASYNC_MAX_IN_FLIGHT, per_host_limit=Config.ASYNC_PER_HOST_LIMIT,
+                 max_retries=Config.HTTP_MAX_RETRIES, backoff_factor=Config.HTTP_BACKOFF_FACTOR, timeout=10,
+                 rate_controller=None, node_health=None):
+        """
+        Initialize the AsyncDownloadEngine instance.
+
+        Args:
+            max_in_flight (int): The maximum number of page fetches in flight.
+            per_host_limit (int): The maximum number of connections per host.
+            max_retries (int): The maximum number of retries of a page on 429/5xx.
+            backoff_factor (float): The backoff factor between retries.
+            timeout (int): The timeout of a page fetch in seconds.
+            rate_controller (HostRateController): Optional per-host concurrency and rate limits, shared with the HTTP transport.
+            node_health (NodeHealthTracker): Optional health tracker of the image nodes, shared with the HTTP transport.
+
+        Raises:
+            ImportError: If aiohttp is not installed.
+        """
+        try:
+            import aiohttp
+        except ImportError as e:
+            raise ImportError("The asyncio download engine requires aiohttp (pip install aiohttp).") from e
+        self.aiohttp = aiohttp
+        self.max_in_flight = max_in_flight
+        self.per_host_limit = per_host_limit
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.timeout = timeout
+        self.rate_controller = rate_controller
+        self.node_health = node_health
+        self._session = None
+        self._semaphore = None
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run_loop, name="async-download-engine", daemon=True)
+        self._thread.start()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    async def _get_session(self):
+        # The session must be created inside the event loop that uses it
+        if self._session is None:
+            connector = self.aiohttp.TCPConnector(limit=self.max_in_flight, limit_per_host=self.per_host_limit)
+            self._session = self.aiohttp.ClientSession(
+                connector=connector,
+                timeout=self.aiohttp.ClientTimeout(total=self.timeout),
+                headers={'User-Agent': 'Mozilla/5.0'},
+            )
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        return self._session
+
+    async def _download_image(self, session, img_src):
+        host = urlsplit(img_src).hostname
+        for attempt in range(self.max_retries + 1):
+            if self.rate_controller:
+                await self.rate_controller.acquire_async(host)
+            start_time = time.perf_counter()
+            congested = False
+            img_data = None
+            cached = False
+            try:
+                async with session.get(img_src) as response:
+                    congested = response.status in Config.HTTP_RETRY_STATUSES
+                    cached = response.headers.get('X-Cache', '').upper().startswith('HIT')
+                    if congested and attempt < self.max_retries:
+                        await asyncio.sleep(self.backoff_factor * (2 ** attempt))
+                        continue
+                    if response.status >= 400:
+                        Metrics.page_failures.inc(reason=f"http_{response.status}")
+                    response.raise_for_status()
+
+                    # Validate the content type
+                    content_type = response.headers.get('Content-Type', '')
+                    if not content_type.startswith('image/'):
+                        logger.error(f"URL {img_src} did not return an image. Content-Type: {content_type}")
+                        Metrics.page_failures.inc(reason="content_type")
+                        return None
+                    img_data = await response.read()
+                    Metrics.page_download_seconds.observe(time.perf_counter() - start_time, engine="asyncio")
+                    Metrics.pages_downloaded.inc(engine="asyncio")
+                    Metrics.page_bytes.inc(len(img_data), engine="asyncio")
+                    return img_data
+            except (asyncio.TimeoutError, self.aiohttp.ClientConnectionError):
+                congested = True
+                raise
+            finally:
+                if self.rate_controller:
+                    self.rate_controller.release(host, time.perf_counter() - start_time, congested)
+                if self.node_health:
+                    self.node_health.record(img_src, bool(img_data), time.perf_counter() - start_time, len(img_data or b''), cached)
+        return None
+
+    async def _fetch_page(self, session, data, on_page):
+        series_name, chapter_number, page_number, img_src = data
+        async with self._semaphore:
+            try:
+                img_data = await self._download_image(session, img_src)
+                if not img_data:
+                    logger.error(f"Failed to download image from {img_src}")
+                    return None
+                record = (series_name, chapter_number, page_number, img_data)
+                if on_page:
+                    # Hand the page over without blocking the event loop on disk I/O
+                    return await self.loop.run_in_executor(None, on_page, record)
+                return record
+            except asyncio.TimeoutError:
+                logger.error(f"Timeout while downloading image from {img_src}")
+                Metrics.page_failures.inc(reason="timeout")
+            except self.aiohttp.ClientConnectionError as e:
+                logger.error(f"Error downloading image from {img_src}: {e}")
+                Metrics.page_failures.inc(reason="connection")
+            except self.aiohttp.ClientError as e:
+                logger.error(f"Error downloading image from {img_src}: {e}")
+        return None
+
+    async def _fetch_pages(self, page_data, on_page):
+        session = await self._get_session()
+        return await asyncio.gather(*(self._fetch_page(session, data, on_page) for data in page_data))
+
+    def submit_pages(self, page_data, on_page=None):
+        """
+        Schedule the download of pages on the event loop without waiting for them.
+
+        Args:
+            page_data (list): A list of tuples containing series name, chapter number, page number, and image URL.
+            on_page (callable): Optional function called with each (series, chapter, page, bytes) record as
+                                soon as it is downloaded, instead of keeping the records in memory.
+
+        Returns:
+            concurrent.futures.Future: A future resolving to the list of records (or of the on_page results),
+                                       None for the pages that failed.
+        """
+        return asyncio.run_coroutine_threadsafe(self._fetch_pages(page_data, on_page), self.loop)
+
+    def fetch_pages(self, page_data, on_page=None):
+        """
+        Download pages and wait for all of them.
+
+        Args:
+            page_data (list): A list of tuples containing series name, chapter number, page number, and image URL.
+            on_page (callable): Optional function called with each record as soon as it is downloaded.
+
+        Returns:
+            list: The (series, chapter, page, bytes) records (or the on_page results), None for the pages that failed.
+        """
+        return self.submit_pages(page_data, on_page).result()
+
+    def close(self):
+        # Close the session and stop the event loop
+        if self._session is not None:
+            asyncio.run_coroutine_threadsafe(self._session.close(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
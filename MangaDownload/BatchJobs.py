@@ -0,0 +1,168 @@
+import json
+import os
+from Config.config import Config
+from MangaDownload.ChapterPipeline import ChapterPipeline
+from MangaDownload.DownloadLogger import logger
+
+
+def load_job_file(job_file_path):
+    """
+    Load the jobs of a batch file.
+
+    The file is either JSON or YAML (".yml"/".yaml", requires PyYAML). It contains a list of jobs,
+    or a mapping with a "jobs" list and optional "defaults" applied to every job, e.g.:
+
+        defaults:
+          language: en
+          quality: data-saver
+        jobs:
+          - url: https://mangadex.org/title/<id>
+            chapters: 1-20
+          - id: <id>
+            title: Some Manga
+            chapters: all
+
+    Args:
+        job_file_path (str): The path of the job file.
+
+    Returns:
+        list: The jobs, each one a dict with the url, title, language, quality and chapters keys.
+    """
+    with open(job_file_path, encoding='utf-8') as job_file:
+        if os.path.splitext(job_file_path)[1].lower() in ('.yml', '.yaml'):
+            try:
+                import yaml
+            except ImportError:
+                raise ImportError("PyYAML is required to read YAML job files. Install it with 'pip install pyyaml' or use a JSON file.")
+            content = yaml.safe_load(job_file)
+        else:
+            content = json.load(job_file)
+
+    if isinstance(content, list):
+        content = {'jobs': content}
+    if not isinstance(content, dict) or not isinstance(content.get('jobs'), list):
+        raise ValueError(f"Invalid job file {job_file_path}: expected a list of jobs or a mapping with a 'jobs' list.")
+
+    defaults = content.get('defaults') or {}
+    return [normalize_job({**defaults, **job}, index) for index, job in enumerate(content['jobs'], start=1)]
+
+
+def normalize_job(job, index):
+    """
+    Validate a job and fill in its defaults.
+
+    Args:
+        job (dict): The job as written in the job file.
+        index (int): The position of the job in the file, used in the error messages.
+
+    Returns:
+        dict: The job with the url, title, language, quality and chapters keys (quality is None
+              when the job uses the quality of the downloader).
+    """
+    if not isinstance(job, dict):
+        raise ValueError(f"Job {index} must be a mapping, got {job!r}.")
+    url = job.get('url') or (Config.MANGADEX_TITLE_URL.format(job['id']) if job.get('id') else None)
+    if not url:
+        raise ValueError(f"Job {index} has neither a 'url' nor an 'id'.")
+    if job.get('quality') and job['quality'] not in Config.QUALITY_TIERS:
+        raise ValueError(f"Job {index} has an unknown quality '{job['quality']}', expected one of {Config.QUALITY_TIERS}.")
+    return {
+        'url': url,
+        'title': job.get('title'),
+        'language': job.get('language') or Config.DEFAULT_LANGUAGE,
+        'quality': job.get('quality'),
+        'chapters': parse_chapter_range(job.get('chapters')),
+    }
+
+
+def parse_chapter_range(chapters):
+    """
+    Parse the chapter selection of a job.
+
+    Args:
+        chapters: None or "all" for every chapter, a number for a single chapter,
+                  a "first-last" string or a [first, last] list for an inclusive range.
+
+    Returns:
+        tuple: The first and last chapter numbers, None for an open bound.
+    """
+    if chapters is None or (isinstance(chapters, str) and chapters.strip().lower() in ('', 'all')):
+        return None, None
+    try:
+        if isinstance(chapters, (list, tuple)) and len(chapters) == 2:
+            first, last = chapters
+        elif isinstance(chapters, str) and '-' in chapters.strip()[1:]:
+            first, last = chapters.strip().split('-', 1)
+        else:
+            first = last = chapters
+        first = float(first) if first not in (None, '') else None
+        last = float(last) if last not in (None, '') else None
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid chapter selection {chapters!r}. Expected 'all', a number, 'first-last' or [first, last].")
+    if first is not None and last is not None and first > last:
+        raise ValueError(f"Invalid chapter selection {chapters!r}: the first chapter is after the last one.")
+    return first, last
+
+
+def filter_chapters(chapters, chapter_range):
+    """
+    Keep the chapters whose number is in the range of a job.
+
+    Args:
+        chapters (list): The chapters of the series.
+        chapter_range (tuple): The first and last chapter numbers, None for an open bound.
+
+    Returns:
+        list: The selected chapters, in the same order.
+    """
+    first, last = chapter_range
+    if first is None and last is None:
+        # Oneshots have no numeric chapter number, they are only selected by "all"
+        return list(chapters)
+    selected = []
+    for chapter in chapters:
+        try:
+            number = float(chapter['chapter_number'])
+        except (TypeError, ValueError):
+            continue
+        if (first is None or number >= first) and (last is None or number <= last):
+            selected.append(chapter)
+    return selected
+
+
+def run_batch(manga_downloader, jobs):
+    """
+    Download the jobs of a batch one after the other.
+
+    Every job goes through the same MangaDownloader, so the browsers, the HTTP connection pool,
+    the library index and the page store are shared by the whole batch.
+
+    Args:
+        manga_downloader (MangaDownloader): The downloader shared by the jobs.
+        jobs (list): The jobs, as returned by load_job_file.
+
+    Returns:
+        list: The jobs that failed.
+    """
+    failed = []
+    default_quality = manga_downloader.quality
+    for index, job in enumerate(jobs, start=1):
+        try:
+            manga_downloader.set_language(job['language'])
+            manga_downloader.set_quality(job['quality'] or default_quality)
+            chapters = manga_downloader.fetch_chapters(job['url'])
+            series_name = job['title'] or manga_downloader.get_series_title(job['url'])
+            if not chapters or not series_name:
+                logger.error(f"Batch job {index}: no chapters or title found for {job['url']}.")
+                failed.append(job)
+                continue
+
+            selected = filter_chapters(chapters, job['chapters'])
+            print(f"[{index}/{len(jobs)}] {series_name}: {len(selected)} of {len(chapters)} chapters selected.")
+            logger.info(f"Batch job {index}: {series_name} ({job['url']}), {len(selected)} chapters selected.")
+            if selected:
+                ChapterPipeline(manga_downloader).run(selected, series_name)
+        except Exception as e:
+            logger.error(f"Batch job {index} ({job['url']}) failed: {e}")
+            failed.append(job)
+    return failed
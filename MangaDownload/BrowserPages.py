@@ -0,0 +1,101 @@
+import base64
+import threading
+from collections import OrderedDict
+from Config.config import Config
+from MangaDownload.DownloadLogger import logger
+
+
+class BrowserPageBodies:
+    """
+    Page bodies already downloaded by the browser, kept until the download stage picks them up.
+
+    The Selenium resolver reads the body of every page from Chrome through the DevTools protocol
+    while the chapter is still open, so the pages do not have to be downloaded a second time.
+    The oldest bodies are dropped when the store goes over its size limit; those pages are simply
+    downloaded again.
+    """
+    def __init__(self, max_bytes=Config.BROWSER_PAGES_MAX_BYTES):
+        """
+        Initialize the BrowserPageBodies instance.
+
+        Args:
+            max_bytes (int): The maximum number of bytes kept in memory.
+        """
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._bodies = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'captured': 0, 'evicted': 0, 'reused': 0, 'unavailable': 0}
+
+    def capture(self, driver, request_ids):
+        """
+        Read the bodies of the pages of the open chapter from the browser.
+
+        Args:
+            driver (WebDriver): The browser the chapter is open in.
+            request_ids (dict): The DevTools request id of every page URL.
+
+        Returns:
+            int: The number of bodies captured.
+        """
+        captured = 0
+        for url, request_id in request_ids.items():
+            try:
+                response = driver.execute_cdp_cmd('Network.getResponseBody', {'requestId': request_id})
+            except Exception as e:
+                # The browser already evicted the body from its cache, the page will be downloaded
+                logger.info(f"Body of {url} no longer available in the browser: {e}")
+                self.count('unavailable')
+                continue
+            body = response.get('body', '')
+            img_data = base64.b64decode(body) if response.get('base64Encoded') else body.encode('latin-1')
+            if img_data:
+                self.put(url, img_data)
+                captured += 1
+        return captured
+
+    def put(self, url, img_data):
+        with self._lock:
+            previous = self._bodies.pop(url, None)
+            if previous is not None:
+                self.total_bytes -= len(previous)
+            self._bodies[url] = img_data
+            self.total_bytes += len(img_data)
+            self._stats['captured'] += 1
+            while self.total_bytes > self.max_bytes and self._bodies:
+                _, evicted = self._bodies.popitem(last=False)
+                self.total_bytes -= len(evicted)
+                self._stats['evicted'] += 1
+
+    def pop(self, url):
+        """
+        Take the body of a page.
+
+        Args:
+            url (str): The URL of the page.
+
+        Returns:
+            bytes: The body of the page, None if the browser did not provide it.
+        """
+        with self._lock:
+            img_data = self._bodies.pop(url, None)
+            if img_data is not None:
+                self.total_bytes -= len(img_data)
+                self._stats['reused'] += 1
+            return img_data
+
+    def discard(self, urls):
+        # Drop the bodies of pages that did not need them (already staged or in the page store)
+        with self._lock:
+            for url in urls:
+                img_data = self._bodies.pop(url, None)
+                if img_data is not None:
+                    self.total_bytes -= len(img_data)
+
+    def count(self, key):
+        with self._lock:
+            self._stats[key] += 1
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, pending_bytes=self.total_bytes)
@@ -0,0 +1,137 @@
+import hashlib
+import json
+import os
+import threading
+import zipfile
+from Config.config import Config
+
+# Version of the metadata written in the comment of the archives
+ARCHIVE_METADATA_VERSION = 1
+# Size limit of a zip comment
+MAX_COMMENT_BYTES = 65535
+
+
+def read_archive_metadata(cbz_file):
+    """
+    Read the metadata written in the comment of an archive by StreamingCbzWriter.
+
+    Args:
+        cbz_file (zipfile.ZipFile): The open archive.
+
+    Returns:
+        dict: The metadata (chapter link, page quality, member name -> [page number, SHA-256]), None for older archives.
+    """
+    if not cbz_file.comment.startswith(b'{'):
+        return None
+    try:
+        return json.loads(cbz_file.comment.decode('utf-8'))
+    except ValueError:
+        return None
+
+
+class StreamingCbzWriter:
+    """
+    Write the pages of a chapter into a .cbz file as soon as they are downloaded.
+
+    The archive is built as a temporary ".part" file next to the final file and atomically
+    renamed when the chapter is committed, so a partial chapter never looks complete.
+    The chapter link, the quality and the SHA-256 of every page are written in the archive comment,
+    so the audit can check the pages and the repair can download them again in the same quality.
+    """
+    def __init__(self, cbz_file_path, member_name, series_name=None, chapter_number=None, chapter_link=None,
+                 quality=Config.QUALITY_ORIGINAL):
+        """
+        Initialize the StreamingCbzWriter instance.
+
+        Args:
+            cbz_file_path (str): The path of the final .cbz file.
+            member_name (callable): Function returning the member name of a page from its page number,
+                                    the names already in the archive and its file extension.
+            series_name (str): The name of the series of the chapter.
+            chapter_number (int): The number of the chapter.
+            chapter_link (str): The link of the chapter on MangaDex.
+            quality (str): The quality of the pages, "original" or "data-saver".
+        """
+        self.cbz_file_path = cbz_file_path
+        self.series_name = series_name
+        self.chapter_number = chapter_number
+        self.chapter_link = chapter_link
+        self.quality = quality
+        # Member name -> [page number, SHA-256] of every page written
+        self.pages = {}
+        self.temp_file_path = cbz_file_path + ".part"
+        self.member_name = member_name
+        self.page_count = 0
+        self._lock = threading.Lock()
+        self._names = set()
+        self._zip = zipfile.ZipFile(self.temp_file_path, "w")
+
+    def add_page(self, page_number, img_data, extension="png"):
+        """
+        Append a page to the archive. Safe to call from several threads.
+
+        Args:
+            page_number (int): The page number, used to build a deterministic member name.
+            img_data (bytes): The content of the page.
+            extension (str): The file extension matching the format of the page.
+
+        Returns:
+            str: The member name of the page in the archive.
+        """
+        digest = hashlib.sha256(img_data).hexdigest()
+        with self._lock:
+            filename = self.member_name(page_number, self._names, extension)
+            self._zip.writestr(filename, img_data)
+            self._names.add(filename)
+            self.pages[filename] = [page_number, digest]
+            self.page_count += 1
+            return filename
+
+    def commit(self):
+        """
+        Close the archive and move it to its final path.
+
+        Returns:
+            str: The path of the .cbz file.
+        """
+        with self._lock:
+            self._zip.comment = self.build_comment()
+            self._zip.close()
+            os.replace(self.temp_file_path, self.cbz_file_path)
+        return self.cbz_file_path
+
+    def build_comment(self):
+        metadata = {
+            'version': ARCHIVE_METADATA_VERSION,
+            'series': self.series_name,
+            'chapter': str(self.chapter_number),
+            'chapter_link': self.chapter_link,
+            'quality': self.quality,
+            'pages': self.pages,
+        }
+        comment = json.dumps(metadata, separators=(',', ':')).encode('utf-8')
+        if len(comment) > MAX_COMMENT_BYTES:
+            # Only chapters of several hundred pages go over the limit, their pages are audited without hashes
+            metadata['pages'] = {name: [page_number, None] for name, (page_number, _) in self.pages.items()}
+            comment = json.dumps(metadata, separators=(',', ':')).encode('utf-8')
+        if len(comment) > MAX_COMMENT_BYTES:
+            metadata['pages'] = {}
+            comment = json.dumps(metadata, separators=(',', ':')).encode('utf-8')
+        return comment
+
+    def abort(self):
+        # Close and remove the temporary archive
+        with self._lock:
+            self._zip.close()
+            if os.path.exists(self.temp_file_path):
+                os.remove(self.temp_file_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None and self.page_count:
+            self.commit()
+        else:
+            self.abort()
+        return False
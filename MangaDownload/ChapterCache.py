@@ -0,0 +1,86 @@
+import hashlib
+import json
+import os
+import time
+from Config.config import Config
+from MangaDownload.DownloadLogger import logger
+
+
+class ChapterListCache:
+    """
+    On-disk cache of the chapter list of every series, keyed by the manga URL.
+    """
+    def __init__(self, cache_dir=Config.CHAPTER_CACHE_PATH, ttl=None):
+        """
+        Initialize the ChapterListCache instance.
+
+        Args:
+            cache_dir (str): The folder where the chapter lists are stored.
+            ttl (int): The number of seconds during which a cached list is used without refreshing it.
+        """
+        self.cache_dir = cache_dir
+        self.ttl = ttl if ttl is not None else int(os.getenv("CHAPTER_CACHE_TTL", Config.CHAPTER_CACHE_TTL))
+
+    def get_cache_path(self, manga_url):
+        # Hash the URL to get a valid file name
+        return os.path.join(self.cache_dir, hashlib.sha1(manga_url.encode('utf-8')).hexdigest() + ".json")
+
+    def load(self, manga_url):
+        """
+        Load the cached chapter list of a series.
+
+        Args:
+            manga_url (str): The URL of the manga.
+
+        Returns:
+            dict: The cache entry with the fetch time and the chapters, None if there is none.
+        """
+        try:
+            with open(self.get_cache_path(manga_url), encoding='utf-8') as cache_file:
+                entry = json.load(cache_file)
+            # Lists cached before the chapters were numbered from their labels are fetched again
+            if entry.get('url') != manga_url or entry.get('version') != Config.CHAPTER_CACHE_VERSION:
+                return None
+            return entry
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable chapter cache for {manga_url}: {e}")
+            return None
+
+    def is_fresh(self, entry):
+        return entry is not None and time.time() - entry.get('fetched_at', 0) < self.ttl
+
+    def save(self, manga_url, chapters, title=None):
+        """
+        Save the chapter list of a series.
+
+        Args:
+            manga_url (str): The URL of the manga.
+            chapters (list): The chapters, newest first.
+            title (str): The title of the series.
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        cache_path = self.get_cache_path(manga_url)
+        temp_path = cache_path + ".tmp"
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as cache_file:
+                json.dump({'version': Config.CHAPTER_CACHE_VERSION, 'url': manga_url, 'title': title, 'fetched_at': time.time(), 'chapters': chapters}, cache_file)
+            os.replace(temp_path, cache_path)
+        except OSError as e:
+            logger.error(f"Error saving chapter cache for {manga_url}: {e}")
+
+    def merge(self, new_chapters, cached_chapters):
+        """
+        Merge the newly collected chapters on top of the cached ones.
+
+        Args:
+            new_chapters (list): The chapters collected during the refresh, newest first.
+            cached_chapters (list): The chapters already in the cache, newest first.
+
+        Returns:
+            list: The merged chapters without duplicated links.
+        """
+        seen = set()
+        return [chapter for chapter in new_chapters + cached_chapters
+                if chapter['chapter_link'] not in seen and not seen.add(chapter['chapter_link'])]
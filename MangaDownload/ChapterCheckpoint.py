@@ -0,0 +1,165 @@
+import json
+import os
+import shutil
+import threading
+from Config.config import Config
+from MangaDownload.DownloadLogger import logger
+
+
+class ChapterCheckpoint:
+    """
+    Staging folder of a chapter being downloaded, with a manifest of the completed pages.
+
+    Every page is written to the staging folder (or to the page store) as soon as it is downloaded
+    and appended to the manifest, so an interrupted chapter only has to download its missing pages
+    on the next run.
+    """
+    MANIFEST_FILENAME = "manifest.jsonl"
+
+    def __init__(self, staging_dir, cbz_file_path, series_name, chapter_number, page_store=None):
+        """
+        Initialize the ChapterCheckpoint instance, loading the pages completed by a previous run.
+
+        Args:
+            staging_dir (str): The staging folder of the chapter.
+            cbz_file_path (str): The path of the .cbz file the chapter will be saved to.
+            series_name (str): The name of the series of the chapter.
+            chapter_number (int): The number of the chapter.
+            page_store (PageStore): Optional content-addressed store keeping the pages instead of the staging folder.
+        """
+        self.staging_dir = staging_dir
+        self.page_store = page_store
+        self.cbz_file_path = cbz_file_path
+        self.series_name = series_name
+        self.chapter_number = chapter_number
+        self.manifest_path = os.path.join(staging_dir, self.MANIFEST_FILENAME)
+        # Page numbers the chapter is expected to contain
+        self.expected_pages = set()
+        # Link of the chapter on MangaDex and quality of its pages, recorded in the archive
+        self.chapter_link = None
+        self.quality = Config.QUALITY_ORIGINAL
+        # URL of every page, and the URLs on a fresh image node once the node of the chapter is quarantined
+        self.page_urls = {}
+        self.failover_urls = {}
+        self.failover_resolves = 0
+        self.failover_lock = threading.Lock()
+        self._lock = threading.Lock()
+        os.makedirs(staging_dir, exist_ok=True)
+        self.completed = self.load_manifest()
+
+    def load_manifest(self):
+        """
+        Load the pages recorded in the manifest whose staged file is complete.
+
+        Returns:
+            dict: The manifest entry of every completed page, by page number.
+        """
+        completed = {}
+        try:
+            with open(self.manifest_path, encoding='utf-8') as manifest:
+                for line in manifest:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # The last line can be truncated if the process died while writing it
+                        continue
+                    if self.is_entry_available(entry):
+                        completed[entry['page']] = entry
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"Ignoring unreadable manifest {self.manifest_path}: {e}")
+        return completed
+
+    def is_entry_available(self, entry):
+        # A page is only completed if its content is still where the manifest says
+        if 'sha256' in entry:
+            return self.page_store is not None and self.page_store.has(entry['sha256'])
+        page_path = os.path.join(self.staging_dir, entry['file'])
+        return os.path.isfile(page_path) and os.path.getsize(page_path) == entry['size']
+
+    def is_completed(self, page_number):
+        with self._lock:
+            return page_number in self.completed
+
+    def add_page(self, page_number, img_data, url=None):
+        """
+        Stage a downloaded page and record it in the manifest.
+
+        Args:
+            page_number (int): The page number.
+            img_data (bytes): The content of the page.
+            url (str): The URL of the page, recorded by the page store.
+        """
+        if self.page_store is not None:
+            self.add_stored_page(page_number, self.page_store.put(img_data, url), len(img_data))
+            return
+        filename = f"{page_number:04d}.page"
+        page_path = os.path.join(self.staging_dir, filename)
+        # Write to a temporary file first so a staged page is never partial
+        with open(page_path + ".tmp", 'wb') as page_file:
+            page_file.write(img_data)
+        os.replace(page_path + ".tmp", page_path)
+        self.record_entry({'page': page_number, 'file': filename, 'size': len(img_data)})
+
+    def add_stored_page(self, page_number, digest, size):
+        """
+        Record a page already in the page store.
+
+        Args:
+            page_number (int): The page number.
+            digest (str): The SHA-256 of the page in the store.
+            size (int): The size of the page.
+        """
+        self.record_entry({'page': page_number, 'sha256': digest, 'size': size})
+
+    def set_quality(self, quality):
+        """
+        Set the quality of the pages of the chapter, restarting the checkpoint if its staged pages
+        are of another quality, so an archive never mixes original and data saver pages.
+
+        Args:
+            quality (str): The quality of the pages, "original" or "data-saver".
+        """
+        with self._lock:
+            self.quality = quality
+            # Entries written before the quality was recorded are original pages
+            if all(entry.get('quality', Config.QUALITY_ORIGINAL) == quality for entry in self.completed.values()):
+                return
+            logger.info(f"Restarting chapter {self.chapter_number} of {self.series_name}: "
+                        f"its staged pages are not in {quality} quality.")
+            shutil.rmtree(self.staging_dir, ignore_errors=True)
+            os.makedirs(self.staging_dir, exist_ok=True)
+            self.completed = {}
+
+    def record_entry(self, entry):
+        entry['quality'] = self.quality
+        with self._lock:
+            with open(self.manifest_path, 'a', encoding='utf-8') as manifest:
+                manifest.write(json.dumps(entry) + "\n")
+            self.completed[entry['page']] = entry
+
+    def read_page(self, page_number):
+        entry = self.completed[page_number]
+        if 'sha256' in entry:
+            return self.page_store.get(entry['sha256'])
+        with open(os.path.join(self.staging_dir, entry['file']), 'rb') as page_file:
+            return page_file.read()
+
+    def pages(self):
+        # The completed page numbers in reading order, leaving out pages the chapter no longer has
+        with self._lock:
+            return sorted(page for page in self.completed if not self.expected_pages or page in self.expected_pages)
+
+    def missing_pages(self):
+        with self._lock:
+            return sorted(self.expected_pages - self.completed.keys())
+
+    @property
+    def page_count(self):
+        with self._lock:
+            return len(self.completed)
+
+    def clear(self):
+        # Remove the staging folder once the archive is saved
+        shutil.rmtree(self.staging_dir, ignore_errors=True)
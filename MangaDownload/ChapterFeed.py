@@ -0,0 +1,160 @@
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from itertools import takewhile
+import requests
+from Config.config import Config
+from MangaDownload.DownloadLogger import logger
+
+
+def extract_manga_id(manga_url):
+    # The manga id is the UUID following /title/ in the manga URL
+    match = re.search(r'/title/([0-9a-fA-F-]{36})', manga_url or '')
+    return match.group(1) if match else None
+
+
+def parse_chapter_number(chapter):
+    # Whole chapter numbers are kept as integers, as on the chapter cards
+    try:
+        number = float(chapter)
+    except (TypeError, ValueError):
+        return None
+    return int(number) if number.is_integer() else number
+
+
+def get_language_code(language):
+    # The feed filters on language codes, the jobs and the downloader can use the MangaDex language names
+    for code, name in Config.LANGUAGE_NAMES.items():
+        if language == name:
+            return code
+    return language
+
+
+class ChapterFeed:
+    """
+    Chapter list of a series read from the MangaDex feed endpoint.
+
+    The first page of the feed gives the total number of chapters, the remaining pages are then
+    requested concurrently by offset instead of clicking through the pagination of the title page
+    one page load at a time. The chapters come out in the order of the title page, newest first.
+    """
+    def __init__(self, session, api_url=None, page_size=Config.CHAPTER_FEED_PAGE_SIZE, max_workers=Config.CHAPTER_FEED_WORKERS):
+        """
+        Initialize the ChapterFeed instance.
+
+        Args:
+            session (HttpTransport): The session used to query the API, so the requests follow its rate limit.
+            api_url (str): The base URL of the MangaDex API.
+            page_size (int): The number of chapters per request (500 at most).
+            max_workers (int): The number of feed pages requested at the same time.
+        """
+        self.session = session
+        self.api_url = (api_url or os.getenv("MANGADEX_API_URL", Config.MANGADEX_API_URL)).rstrip('/')
+        self.page_size = page_size
+        self.max_workers = max_workers
+
+    def build_feed_params(self, language, offset):
+        return {
+            'translatedLanguage[]': get_language_code(language),
+            'order[volume]': 'desc',
+            'order[chapter]': 'desc',
+            'limit': self.page_size,
+            'offset': offset,
+            'contentRating[]': ['safe', 'suggestive', 'erotica', 'pornographic'],
+            'includeFutureUpdates': 0,
+            # Chapters hosted elsewhere (e.g. MangaPlus) cannot be downloaded
+            'includeExternalUrl': 0,
+        }
+
+    def fetch_page(self, manga_id, language, offset):
+        """
+        Fetch a page of the chapter feed of a manga.
+
+        Args:
+            manga_id (str): The id of the manga.
+            language (str): The language of the chapters.
+            offset (int): The position of the first chapter of the page.
+
+        Returns:
+            dict: The decoded JSON response.
+
+        Raises:
+            requests.RequestException: If the request failed.
+        """
+        url = self.api_url + Config.MANGA_FEED_ENDPOINT.format(manga_id)
+        response = self.session.get(url, params=self.build_feed_params(language, offset))
+        response.raise_for_status()
+        return response.json()
+
+    def fetch_chapters(self, manga_url, language, known_links=None):
+        """
+        Fetch the chapters of a series, newest first.
+
+        Args:
+            manga_url (str): The URL of the manga.
+            language (str): The language of the chapters, as a code or a MangaDex language name.
+            known_links (set): Links of the chapters already known, the chapters from the first of them are left out.
+
+        Returns:
+            list: The chapters newer than the known ones, None if the feed could not be read.
+        """
+        manga_id = extract_manga_id(manga_url)
+        if not manga_id:
+            logger.warning(f"No manga id in {manga_url}, the chapter feed cannot be used.")
+            return None
+        known_links = known_links or set()
+        try:
+            first_page = self.fetch_page(manga_id, language, 0)
+            pages = [first_page]
+            first_chapters = self.build_chapters(first_page.get('data', []), language)
+            # A known chapter on the first page means the other pages only hold cached chapters
+            if not any(chapter['chapter_link'] in known_links for chapter in first_chapters):
+                offsets = range(self.page_size, first_page.get('total', 0), self.page_size)
+                with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                    pages.extend(executor.map(lambda offset: self.fetch_page(manga_id, language, offset), offsets))
+        except requests.RequestException as e:
+            logger.error(f"Error requesting the chapter feed of {manga_url}: {e}")
+            return None
+        except (ValueError, KeyError, TypeError) as e:
+            logger.error(f"Invalid chapter feed response for {manga_url}: {e}")
+            return None
+
+        # The pages are merged in offset order, the same chapter can be listed by several groups
+        chapters = self.build_chapters([entry for page in pages for entry in page.get('data', [])], language)
+        logger.info(f"Chapter feed of {manga_url}: {len(chapters)} chapters from {len(pages)} pages")
+        return list(takewhile(lambda chapter: chapter['chapter_link'] not in known_links, chapters))
+
+    def build_chapters(self, entries, language):
+        """
+        Convert feed entries to chapters, keeping the first entry of every chapter number.
+
+        Args:
+            entries (list): The chapter entries of the feed.
+            language (str): The language of the chapters.
+
+        Returns:
+            list: The chapters, in the format of the chapter cards of the title page.
+        """
+        chapters = []
+        seen = set()
+        for entry in entries:
+            attributes = entry['attributes']
+            number = self.parse_chapter_number(attributes.get('chapter'))
+            key = number if number is not None else entry['id']
+            if key in seen:
+                continue
+            seen.add(key)
+            chapters.append({
+                'chapter_name': self.format_chapter_name(number, attributes.get('title')),
+                'chapter_link': Config.MANGADEX_CHAPTER_URL.format(entry['id']),
+                'language': Config.LANGUAGE_NAMES.get(language, language),
+                'chapter_number': number,
+            })
+        return chapters
+
+    def parse_chapter_number(self, chapter):
+        return parse_chapter_number(chapter)
+
+    def format_chapter_name(self, number, title):
+        label = f"Ch. {number}" if number is not None else "Oneshot"
+        return f"{label} - {title}" if title else label
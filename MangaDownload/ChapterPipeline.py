@@ -0,0 +1,187 @@
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from Config.config import Config
+from MangaDownload.DownloadLogger import logger
+
+# Marks the end of the chapters in a stage queue
+_END = object()
+
+
+class StageStats:
+    """
+    Busy time and processed items of a pipeline stage.
+    """
+    def __init__(self, name, workers=1):
+        self.name = name
+        self.workers = workers
+        self.busy_seconds = 0.0
+        self.items = 0
+        self._lock = threading.Lock()
+
+    def add_busy(self, seconds):
+        with self._lock:
+            self.busy_seconds += seconds
+
+    def add_item(self):
+        with self._lock:
+            self.items += 1
+
+    def utilisation(self, wall_seconds):
+        capacity = wall_seconds * self.workers
+        return self.busy_seconds / capacity if capacity > 0 else 0.0
+
+
+class ChapterPipeline:
+    """
+    Process chapters in three stages (resolve -> download -> archive) connected by bounded queues.
+
+    Chapter N+1 is resolved while the pages of chapter N are downloading in the shared download
+    pool and chapter N-1 is being committed to disk.
+    """
+    def __init__(self, manga_downloader, queue_size=Config.PIPELINE_QUEUE_SIZE):
+        """
+        Initialize the ChapterPipeline instance.
+
+        Args:
+            manga_downloader (MangaDownloader): The MangaDownloader used to resolve and save the chapters.
+            queue_size (int): The number of chapters allowed to wait between two stages.
+        """
+        self.manga_downloader = manga_downloader
+        self.file_operations = manga_downloader.file_operations
+        self.download_queue = queue.Queue(maxsize=queue_size)
+        self.archive_queue = queue.Queue(maxsize=queue_size)
+        # Chapters are resolved in parallel when every chapter can lease its own browser
+        driver_pool = manga_downloader.driver_pool
+        self.stats = {
+            "resolve": StageStats("resolve", driver_pool.size if driver_pool else 1),
+            "download": StageStats("download"),
+            "archive": StageStats("archive"),
+        }
+
+    def resolve_chapter(self, chapter, series_name):
+        """
+        Resolve the pages of a chapter.
+
+        Args:
+            chapter (dict): The chapter to resolve.
+            series_name (str): The name of the manga series.
+
+        Returns:
+            tuple: The page data, the link of the chapter and the quality of its pages, None if the chapter is skipped or failed.
+        """
+        stats = self.stats["resolve"]
+        start_time = time.perf_counter()
+        try:
+            self.manga_downloader.print_chapter_info(chapter)
+            chapter_number = chapter['chapter_number']
+            if self.file_operations.check_cbz_file_exist(series_name, chapter_number):
+                logger.info(f"Chapter {chapter_number} already exists for {series_name}. Skipping download.")
+                return None
+            pages, quality = self.manga_downloader.resolve_series_chapter(chapter['chapter_link'], series_name)
+            if not pages:
+                logger.error(f"Failed to capture any pages for chapter {chapter_number} of {series_name}.")
+                return None
+            stats.add_item()
+            return [(series_name, chapter_number, page_number, page_url) for page_number, page_url in pages], chapter['chapter_link'], quality
+        except Exception as e:
+            logger.error(f"Error resolving chapter {chapter.get('chapter_number')}: {e}")
+            return None
+        finally:
+            stats.add_busy(time.perf_counter() - start_time)
+
+    def resolve_stage(self, chapters, series_name):
+        workers = self.stats["resolve"].workers
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                # At most one chapter per worker is resolved ahead, and chapters are forwarded in order
+                pending = deque()
+                for chapter in chapters:
+                    pending.append(executor.submit(self.resolve_chapter, chapter, series_name))
+                    if len(pending) >= workers:
+                        self.forward_resolved(pending.popleft().result())
+                while pending:
+                    self.forward_resolved(pending.popleft().result())
+        finally:
+            self.download_queue.put(_END)
+
+    def forward_resolved(self, resolved):
+        if resolved:
+            self.download_queue.put(resolved)
+
+    def download_stage(self):
+        stats = self.stats["download"]
+        try:
+            while (resolved := self.download_queue.get()) is not _END:
+                page_data, chapter_link, quality = resolved
+                start_time = time.perf_counter()
+                try:
+                    print(f"Saving {len(page_data)} pages for chapter {page_data[0][1]}...")
+                    self.archive_queue.put(self.file_operations.submit_chapter_pages(page_data, chapter_link, quality))
+                    stats.add_item()
+                except Exception as e:
+                    logger.error(f"Error starting the download of chapter {page_data[0][1]}: {e}")
+                finally:
+                    stats.add_busy(time.perf_counter() - start_time)
+        finally:
+            self.archive_queue.put(_END)
+
+    def archive_stage(self):
+        stats = self.stats["archive"]
+        while (item := self.archive_queue.get()) is not _END:
+            checkpoint, futures = item
+            # Waiting for the downloads is not archive work, only the commit is counted
+            for future in futures:
+                future.exception()
+            start_time = time.perf_counter()
+            try:
+                if self.file_operations.finalize_chapter(checkpoint, futures):
+                    stats.add_item()
+            except Exception as e:
+                logger.error(f"Error archiving {checkpoint.cbz_file_path}: {e}")
+            finally:
+                stats.add_busy(time.perf_counter() - start_time)
+
+    def run(self, chapters, series_name):
+        """
+        Download the chapters of a series through the pipeline.
+
+        Args:
+            chapters (list): The chapters to download, as returned by MangaDownloader.fetch_chapters.
+            series_name (str): The name of the manga series.
+
+        Returns:
+            dict: The utilisation of every stage, between 0 and 1.
+        """
+        start_time = time.perf_counter()
+        busy_before = self.file_operations.download_busy_seconds
+        threads = [
+            threading.Thread(target=self.resolve_stage, args=(chapters, series_name), name="pipeline-resolve", daemon=True),
+            threading.Thread(target=self.download_stage, name="pipeline-download", daemon=True),
+            threading.Thread(target=self.archive_stage, name="pipeline-archive", daemon=True),
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wall_seconds = time.perf_counter() - start_time
+
+        utilisation = {name: stats.utilisation(wall_seconds) for name, stats in self.stats.items()}
+        # The pages are downloaded by the shared pool, its utilisation is the share of worker time spent busy
+        if self.file_operations.download_engine == "threads":
+            pool_seconds = wall_seconds * self.file_operations.max_workers_number
+            utilisation["download_pool"] = (self.file_operations.download_busy_seconds - busy_before) / pool_seconds if pool_seconds else 0.0
+        self.report(utilisation, wall_seconds)
+        return utilisation
+
+    def report(self, utilisation, wall_seconds):
+        # Print and log the utilisation of every stage
+        lines = [f"Pipeline finished in {wall_seconds:.1f}s"]
+        for name, value in utilisation.items():
+            items = self.stats[name].items if name in self.stats else None
+            suffix = f" ({items} chapters)" if items is not None else ""
+            lines.append(f"  {name}: {value:.0%} busy{suffix}")
+        print("\n".join(lines))
+        logger.info(" | ".join(lines))
@@ -0,0 +1,326 @@
+import json, os, re, time
+import requests
+from selenium.common.exceptions import TimeoutException
+from Config.config import Config, ScriptConfig
+from MangaDownload.DownloadLogger import logger
+from MangaDownload import Metrics
+from MangaDownload.PerformanceLog import PerformanceLogConsumer
+
+
+class ChapterResolver:
+    """
+    Base class of the chapter resolvers.
+
+    A resolver turns a chapter link into the list of (page_number, url) tuples
+    expected by FileOperations.save_chapter_pages.
+    """
+    name = "base"
+
+    def resolve(self, chapter_link, quality=Config.QUALITY_ORIGINAL):
+        """
+        Resolve the page URLs of a chapter.
+
+        Args:
+            chapter_link (str): The link of the chapter on MangaDex.
+            quality (str): The quality of the pages, "original" or "data-saver".
+
+        Returns:
+            list: A list of tuples containing page numbers and URLs, sorted by page number,
+                  empty if the chapter has no pages of that quality.
+        """
+        raise NotImplementedError
+
+
+def build_page_urls(server, quality=Config.QUALITY_ORIGINAL):
+    """
+    Build the page URLs of a chapter from an at-home response.
+
+    Page URLs follow the {baseUrl}/data/{hash}/{filename} format of the at-home protocol,
+    or {baseUrl}/data-saver/{hash}/{filename} for the data saver pages.
+
+    Args:
+        server (dict): The decoded at-home response.
+        quality (str): The quality of the pages, "original" or "data-saver".
+
+    Returns:
+        list: The (page_number, url) tuples, empty if the chapter has no pages of that quality.
+    """
+    base_url = server['baseUrl'].rstrip('/')
+    chapter = server['chapter']
+    if quality == Config.QUALITY_DATA_SAVER:
+        path, filenames = "data-saver", chapter.get('dataSaver') or []
+    else:
+        path, filenames = "data", chapter['data']
+    return [(page_number, f"{base_url}/{path}/{chapter['hash']}/{filename}")
+            for page_number, filename in enumerate(filenames, start=1)]
+
+
+class ApiChapterResolver(ChapterResolver):
+    """
+    Resolve chapter pages through the MangaDex at-home/server endpoint, without a browser.
+    """
+    name = "api"
+
+    def __init__(self, api_url=None, session=None, timeout=10):
+        """
+        Initialize the ApiChapterResolver instance.
+
+        Args:
+            api_url (str): The base URL of the API (a local stand-in server can be used for testing).
+            session (requests.Session): The session used to query the API (an HttpTransport can be used as well).
+            timeout (int): The timeout of the API requests in seconds.
+        """
+        self.api_url = (api_url or os.getenv("MANGADEX_API_URL", Config.MANGADEX_API_URL)).rstrip('/')
+        self.session = session or requests.Session()
+        self.timeout = timeout
+
+    def extract_chapter_id(self, chapter_link):
+        # The chapter id is the UUID following /chapter/ in the chapter link
+        match = re.search(r'/chapter/([0-9a-fA-F-]{36})', chapter_link or '')
+        return match.group(1) if match else None
+
+    def fetch_at_home_server(self, chapter_id):
+        """
+        Fetch the image server information of a chapter.
+
+        Args:
+            chapter_id (str): The id of the chapter.
+
+        Returns:
+            dict: The decoded JSON response of the at-home/server endpoint.
+
+        Raises:
+            requests.RequestException: If the request failed.
+            ValueError: If the response is not a successful at-home response.
+        """
+        url = self.api_url + Config.AT_HOME_SERVER_ENDPOINT.format(chapter_id)
+        response = self.session.get(url, timeout=self.timeout)
+        response.raise_for_status()
+        server = response.json()
+        if server.get('result') != 'ok':
+            raise ValueError(f"Unexpected at-home response for chapter {chapter_id}: {server.get('result')}")
+        return server
+
+    def resolve(self, chapter_link, quality=Config.QUALITY_ORIGINAL):
+        chapter_id = self.extract_chapter_id(chapter_link)
+        if not chapter_id:
+            logger.error(f"No chapter id found in chapter link: {chapter_link}")
+            return []
+        try:
+            return build_page_urls(self.fetch_at_home_server(chapter_id), quality)
+        except requests.RequestException as e:
+            logger.error(f"Error requesting at-home server for chapter {chapter_id}: {e}")
+        except (ValueError, KeyError, TypeError) as e:
+            logger.error(f"Invalid at-home server response for chapter {chapter_id}: {e}")
+        return []
+
+
+class SeleniumChapterResolver(ChapterResolver):
+    """
+    Resolve chapter pages by opening the chapter in the browser and reading the performance logs.
+    """
+    name = "selenium"
+
+    def __init__(self, web_interactions=None, driver_pool=None, page_bodies=None, headless=False):
+        """
+        Initialize the SeleniumChapterResolver instance.
+
+        Args:
+            web_interactions (WebInteractions): The WebInteractions instance used without a driver pool.
+            driver_pool (DriverPool): Optional pool from which a browser is leased for every chapter.
+            page_bodies (BrowserPageBodies): Optional store receiving the page bodies loaded by the browser.
+            headless (bool): Start the browser without a window if it has to be created by the resolver.
+        """
+        self._web_interactions = web_interactions
+        self.driver_pool = driver_pool
+        self.page_bodies = page_bodies
+        self.headless = headless
+
+    @property
+    def web_interactions(self):
+        if not self._web_interactions:
+            from MangaDownload.WebInteractions import WebInteractions
+            self._web_interactions = WebInteractions(headless=self.headless)
+        return self._web_interactions
+
+    def resolve(self, chapter_link, quality=Config.QUALITY_ORIGINAL):
+        if self.driver_pool:
+            return self.resolve_with_leased_driver(chapter_link, quality)
+        log_consumer = PerformanceLogConsumer(self.web_interactions.driver)
+        log_consumer.discard_pending()
+        # The log is drained while the chapter loads, so the pages are known as soon as it is ready
+        chapter_state = self.navigate_to_chapter(chapter_link, log_consumer)
+        self.retry_capture_network_logs(log_consumer, (chapter_state or {}).get('expected'))
+        pages = self.select_pages(log_consumer, quality)
+        if pages and self.page_bodies is not None:
+            # The bodies must be read before the browser leaves the chapter
+            request_ids = log_consumer.request_ids
+            page_request_ids = {url: request_ids[url] for _, url in pages if url in request_ids}
+            captured = self.page_bodies.capture(self.web_interactions.driver, page_request_ids)
+            logger.info(f"Reusing {captured} of {len(pages)} pages loaded by the browser for {chapter_link}")
+        return pages
+
+    def select_pages(self, log_consumer, quality):
+        """
+        Get the pages of the requested quality from what the reader loaded.
+
+        The reader loads the original or the data saver pages depending on its settings. When it did not
+        load the requested ones, their URLs are built from the at-home response it fetched.
+
+        Args:
+            log_consumer (PerformanceLogConsumer): The consumer that read the log of the chapter.
+            quality (str): The quality of the pages, "original" or "data-saver".
+
+        Returns:
+            list: The (page_number, url) tuples of the requested quality.
+        """
+        pages = log_consumer.sorted_pages(data_saver=quality == Config.QUALITY_DATA_SAVER)
+        if pages or not log_consumer.at_home_request_id:
+            return pages
+        try:
+            response = self.web_interactions.driver.execute_cdp_cmd('Network.getResponseBody', {'requestId': log_consumer.at_home_request_id})
+            return build_page_urls(json.loads(response.get('body', '')), quality)
+        except Exception as e:
+            logger.error(f"Error reading the at-home response loaded by the browser: {e}")
+            return []
+
+    def resolve_with_leased_driver(self, chapter_link, quality=Config.QUALITY_ORIGINAL):
+        # Every chapter gets its own browser from the pool so several chapters can resolve in parallel
+        from MangaDownload.WebInteractions import WebInteractions
+        with self.driver_pool.lease() as pooled:
+            web_interactions = WebInteractions(driver=pooled.driver)
+            try:
+                return SeleniumChapterResolver(web_interactions, page_bodies=self.page_bodies).resolve(chapter_link, quality)
+            finally:
+                pooled.navigations += web_interactions.navigation_count
+
+    def navigate_to_chapter(self, chapter_link, log_consumer=None):
+        """
+        Open a chapter and wait until all of its pages are loaded.
+
+        Args:
+            chapter_link (str): The link of the chapter.
+            log_consumer (PerformanceLogConsumer): Optional consumer draining the performance log while the chapter loads.
+
+        Returns:
+            dict: The state of the chapter in the browser (active requests, expected and loaded pages),
+                  None if the chapter did not load.
+        """
+        monitored = self.install_network_monitoring()
+        self.web_interactions.navigate(chapter_link)
+        if not monitored:
+            self.inject_network_monitoring_js()
+        for _ in range(3):
+            try:
+                self.web_interactions.wait_until_element_loaded('class_name', 'overflow-x-auto.flex.items-center.h-full')
+                return self.wait_for_network_idle(log_consumer=log_consumer)
+            except TimeoutException:
+                # The element wait is itself the back-off, so the retry starts right away
+                logger.warning("Timeout occurred. Retrying...")
+        logger.error("Failed to navigate to chapter after multiple attempts.")
+        return None
+
+    def install_network_monitoring(self):
+        """
+        Register the network monitoring script to run before the scripts of every page of the browser,
+        so the requests sent while the chapter loads are counted from the start.
+
+        Returns:
+            bool: True if the script is registered, False if the browser does not support it.
+        """
+        driver = self.web_interactions.driver
+        # Registered once per browser, a leased browser keeps it across chapters
+        if getattr(driver, 'network_monitoring_installed', False):
+            return True
+        try:
+            driver.execute_cdp_cmd('Page.addScriptToEvaluateOnNewDocument', {'source': ScriptConfig.javascript_network_script})
+        except Exception as e:
+            logger.warning(f"Could not register the network monitoring script, injecting it after navigation: {e}")
+            return False
+        driver.network_monitoring_installed = True
+        return True
+
+    def inject_network_monitoring_js(self):
+        self.web_interactions.driver.execute_script(ScriptConfig.javascript_network_script)
+
+    def wait_for_network_idle(self, timeout=30, quiet_period=0.5, log_consumer=None):
+        """
+        Wait until every page of the chapter is loaded and no request is active.
+
+        The wait is a promise resolved by the network monitoring script of the page, so it ends as soon
+        as the last page is loaded. With a log consumer, the promise is awaited in slices of its poll
+        interval and the performance log is drained between them, on this thread since ChromeDriver runs
+        the commands of a session one at a time.
+
+        Args:
+            timeout (float): The maximum number of seconds to wait.
+            quiet_period (float): The number of seconds without requests after which the chapter is
+                                  considered loaded when its page count is unknown.
+            log_consumer (PerformanceLogConsumer): Optional consumer draining the performance log between the waits.
+
+        Returns:
+            dict: The state of the chapter in the browser (ready, active, expected and loaded), None on error.
+        """
+        driver = self.web_interactions.driver
+        start_time = time.perf_counter()
+        deadline = time.monotonic() + timeout
+        slice_seconds = log_consumer.poll_interval if log_consumer else timeout
+        chapter_state = None
+        try:
+            # The script timeout is a safety net, the promise resolves by itself after each slice
+            driver.set_script_timeout(slice_seconds + 5)
+            while True:
+                remaining = deadline - time.monotonic()
+                chapter_state = driver.execute_async_script(ScriptConfig.chapter_ready_script,
+                                                            int(max(0.0, min(slice_seconds, remaining)) * 1000), int(quiet_period * 1000))
+                if log_consumer:
+                    log_consumer.drain()
+                if not chapter_state or chapter_state.get('ready') or remaining <= slice_seconds:
+                    break
+        except Exception as e:
+            logger.error(f"Error waiting for the chapter to load: {e}")
+            chapter_state = None
+        outcome = "idle" if chapter_state and chapter_state.get('ready') else "timeout"
+        Metrics.network_idle_seconds.observe(time.perf_counter() - start_time, outcome=outcome)
+        return chapter_state
+
+    def retry_capture_network_logs(self, log_consumer, expected=None, timeout=5):
+        """
+        Wait until the pages of the chapter are in the performance log.
+
+        Args:
+            log_consumer (PerformanceLogConsumer): The consumer reading the log of the chapter.
+            expected (int): The number of pages of the chapter, None if unknown.
+            timeout (float): The maximum number of seconds to wait for the log.
+
+        Returns:
+            list: The (page_number, url) tuples found.
+        """
+        if not log_consumer.wait_for_pages(expected, timeout):
+            logger.warning(f"Only {log_consumer.page_count()} pages found in the performance log (expected: {expected or 'unknown'}).")
+        logger.info(f"Performance log: {log_consumer.entries_read} entries read, {log_consumer.entries_parsed} parsed, "
+                    f"{log_consumer.page_count()} pages")
+        return log_consumer.sorted_pages()
+
+
+def create_chapter_resolvers(web_interactions=None, preferred=None, driver_pool=None, session=None, page_bodies=None, headless=False):
+    """
+    Create the chapter resolvers in the order they should be tried.
+
+    Args:
+        web_interactions (WebInteractions): The WebInteractions instance used by the Selenium resolver.
+        preferred (str): The name of the resolver to try first ("api" or "selenium").
+        driver_pool (DriverPool): Optional pool of browsers used by the Selenium resolver.
+        session (HttpTransport): The session used by the API resolver, so its requests share the rate limits of the downloads.
+        page_bodies (BrowserPageBodies): Optional store receiving the pages loaded by the browser of the Selenium resolver.
+        headless (bool): Start the browser of the Selenium resolver without a window if it has to be created.
+
+    Returns:
+        list: The resolvers, the Selenium resolver always being the last fallback.
+    """
+    preferred = preferred or os.getenv("CHAPTER_RESOLVER", Config.DEFAULT_CHAPTER_RESOLVER)
+    resolvers = []
+    if preferred == ApiChapterResolver.name:
+        resolvers.append(ApiChapterResolver(session=session))
+    resolvers.append(SeleniumChapterResolver(web_interactions, driver_pool, page_bodies, headless))
+    return resolvers
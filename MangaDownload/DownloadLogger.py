@@ -0,0 +1,5 @@
+from Config.config import Config
+from Config.logs_config import setup_logging
+
+# Logger of the downloader, kept in its own module so importing it does not load Selenium
+logger = setup_logging('manga_download', Config.MANGA_DOWNLOAD_LOG_PATH)
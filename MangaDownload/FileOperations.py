@@ -1,43 +1,110 @@
 import os, requests, re, io, concurrent.futures
 import time
+import threading
 # import threadpoolExecutor
 from concurrent.futures import ThreadPoolExecutor
-import zipfile
 from Config.config import Config
 # Configure logging
-from MangaDownload.WebInteractions import logger
-from MangaDownload.WebInteractions import WebInteractions
-
-from PIL import Image
-import pyzipper
+from MangaDownload.DownloadLogger import logger
+from MangaDownload.HttpTransport import HttpTransport
+from MangaDownload.RateControl import HostRateController
+from MangaDownload import Metrics
+from MangaDownload.CbzWriter import StreamingCbzWriter
+from MangaDownload.ChapterCheckpoint import ChapterCheckpoint
+from MangaDownload.PageStore import PageStore
+from MangaDownload.BrowserPages import BrowserPageBodies
+from MangaDownload.ImageTranscoder import ImageTranscoder, detect_image_extension
+from MangaDownload.LibraryIndex import LibraryIndex, list_archive_names, scan_series_folder
+from MangaDownload.NodeHealth import NodeHealthTracker, NodeReporter, get_host, replace_base_url
 class FileOperations:
-    def __init__(self, web_interactions=None):
+    def __init__(self, web_interactions=None, download_engine=None, transcode_format=None, headless=False):
         """Initialize the FileOperations instance. 
 
         Args:
             web_interactions (WebInteractions): The WebInteractions instance.
-            driver (WebDriver): The Selenium WebDriver instance.
+            download_engine (str): The download engine to use ("threads" or "asyncio").
+            transcode_format (str): The format the pages are re-encoded to before archiving ("webp", "jpeg" or "avif").
+            headless (bool): Start the browser without a window if it has to be created by the FileOperations.
         """
-        if not web_interactions:
-            from MangaDownload.WebInteractions import WebInteractions
-            web_interactions = WebInteractions()
-        self.web_interactions = web_interactions
-        # Initialize the WebDriver instance
-        self.driver = web_interactions.driver
+        # The browser is only started when it is actually needed
+        self._web_interactions = web_interactions
+        self.headless = headless
         # Store the original tab handle
         self.original_tab_handles = None
         # Store the last processed URL
         self.last_processed_url = None
-        # Store the unique base64 data (to avoid duplicates)
-        self.unique_base64_data = set()
         # Store the last loaded image source (to check if the image is loaded)
         self.last_loaded_img_src = None
-        self.max_workers_number = 30
-        
+        # Upper bound of the download workers, the number of requests actually sent to a host is set by the rate controller
+        self.max_workers_number = int(os.getenv("AIMD_MAX_LIMIT", Config.AIMD_MAX_LIMIT))
+        self.download_engine = download_engine or os.getenv("DOWNLOAD_ENGINE", Config.DEFAULT_DOWNLOAD_ENGINE)
+        if self.download_engine not in Config.DOWNLOAD_ENGINES:
+            raise ValueError(f"Unknown download engine '{self.download_engine}'. Expected one of {Config.DOWNLOAD_ENGINES}.")
+        # Per-host AIMD concurrency limits and token buckets, shared by the HTTP transport and the asyncio engine
+        max_host_limit = self.max_workers_number if self.download_engine == "threads" else Config.ASYNC_PER_HOST_LIMIT
+        self.rate_controller = HostRateController(max_limit=max_host_limit)
+        # Shared HTTP transport, one keep-alive connection per worker and host is reused across chapters
+        self.transport = HttpTransport(pool_size=self.max_workers_number, rate_controller=self.rate_controller)
+        self._metrics_collectors = [Metrics.watch_rate_controller(self.rate_controller)]
+        # Health of the image nodes, the pages of a quarantined node are downloaded from another one
+        send_node_reports = os.getenv("NODE_REPORTS", str(int(Config.NODE_REPORTS))).lower() not in ("0", "false", "no")
+        self.node_health = NodeHealthTracker(reporter=NodeReporter() if send_node_reports else None)
+        self._metrics_collectors.append(Metrics.watch_node_health(self.node_health))
+        self._failover_resolver = None
+        self._async_engine = None
+        self._download_executor = None
+        # Time spent by the download workers, used to report the pool utilisation
+        self.download_busy_seconds = 0.0
+        self._stats_lock = threading.Lock()
+
         self.save_path = os.getenv("SAVE_PATH", Config.DEFAULT_SAVE_PATH)
         if not os.path.isdir(self.save_path):
             raise ValueError(f"Save path '{self.save_path}' is not a valid directory.")
-
+        # Index of the saved chapters, queried once per series
+        self.library_index = LibraryIndex(Config.LIBRARY_INDEX_PATH)
+        # Content-addressed store keeping each unique page once (opt-in with PAGE_STORE_PATH, its blobs are never removed)
+        page_store_path = os.getenv("PAGE_STORE_PATH", Config.PAGE_STORE_PATH)
+        self.page_store = PageStore(page_store_path) if page_store_path else None
+        # Pages loaded by the browser of the Selenium resolver, archived without downloading them again
+        reuse_browser_pages = os.getenv("REUSE_BROWSER_PAGES", str(int(Config.REUSE_BROWSER_PAGES))).lower() not in ("0", "false", "no")
+        self.browser_pages = BrowserPageBodies() if reuse_browser_pages else None
+        # Optional re-encoding of the pages before they are archived
+        transcode_format = transcode_format or os.getenv("TRANSCODE_FORMAT", Config.TRANSCODE_FORMAT)
+        self.transcoder = ImageTranscoder(
+            transcode_format,
+            quality=int(os.getenv("TRANSCODE_QUALITY", Config.TRANSCODE_QUALITY)),
+            min_savings=float(os.getenv("TRANSCODE_MIN_SAVINGS", Config.TRANSCODE_MIN_SAVINGS)),
+        ) if transcode_format else None
+        self._existing_chapters = {}
+        self._existing_chapters_lock = threading.Lock()
+
+    @property
+    def web_interactions(self):
+        if not self._web_interactions:
+            # Selenium is only imported when the browser is actually needed
+            from MangaDownload.WebInteractions import WebInteractions
+            self._web_interactions = WebInteractions(headless=self.headless)
+        return self._web_interactions
+
+    @property
+    def driver(self):
+        # The Selenium WebDriver instance
+        return self.web_interactions.driver
+
+    @property
+    def async_engine(self):
+        if not self._async_engine:
+            from MangaDownload.AsyncDownloadEngine import AsyncDownloadEngine
+            self._async_engine = AsyncDownloadEngine(rate_controller=self.rate_controller, node_health=self.node_health)
+        return self._async_engine
+
+    @property
+    def failover_resolver(self):
+        # The at-home endpoint hands out a fresh image node for a chapter, no browser is needed
+        if not self._failover_resolver:
+            from MangaDownload.ChapterResolvers import ApiChapterResolver
+            self._failover_resolver = ApiChapterResolver(session=self.transport)
+        return self._failover_resolver
 
     def sanitize_folder_name(self, folder_name):
         """
@@ -57,58 +124,305 @@ class FileOperations:
 
 
 
-    def create_screenshot_filename(self, page_number, part_number=0):
-        return f"page_{page_number}_{part_number}.png"
+    def create_screenshot_filename(self, page_number, part_number=0, extension="png"):
+        # Zero-padded page numbers keep the members in reading order when sorted by name
+        if part_number:
+            return f"page_{page_number:04d}_{part_number}.{extension}"
+        return f"page_{page_number:04d}.{extension}"
 
 
 
+    def bulk_save_png_links(self, page_data, chapter_link=None, quality=Config.QUALITY_ORIGINAL):
+        """
+        Save multiple PNG images from URLs to a single .cbz file.
 
+        Every page is staged on disk as soon as it is downloaded, so the memory used by a chapter
+        is bounded by the pages in flight and an interrupted chapter resumes where it stopped.
 
+        Args:
+            page_data (list): A list of tuples containing series name, chapter number, page number, and image URL.
+            chapter_link (str): The link of the chapter, recorded in the archive.
+            quality (str): The quality of the pages, recorded in the archive and the library index.
 
-    def bulk_save_png_links(self, page_data):
+        Returns:
+            None
         """
-        Save multiple PNG images from URLs to a single .cbz file.
+        if not page_data:
+            logger.error("No valid image data to save.")
+            return
+
+        try:
+            self.finalize_chapter(*self.submit_chapter_pages(page_data, chapter_link, quality))
+        except Exception as e:
+            logger.error(f"Error saving PNG links for chapter {page_data[0][1]}: {e}")
+
+    @property
+    def download_executor(self):
+        # Single download pool shared by every chapter
+        if not self._download_executor:
+            self._download_executor = ThreadPoolExecutor(max_workers=self.max_workers_number)
+        return self._download_executor
+
+    def submit_chapter_pages(self, page_data, chapter_link=None, quality=Config.QUALITY_ORIGINAL):
+        """
+        Start downloading the missing pages of a chapter into its checkpoint without waiting for them.
 
         Args:
             page_data (list): A list of tuples containing series name, chapter number, page number, and image URL.
+            chapter_link (str): The link of the chapter, recorded in the archive.
+            quality (str): The quality of the pages, recorded in the archive and the library index.
 
         Returns:
-            None
+            tuple: The ChapterCheckpoint of the chapter and the futures of its downloads.
         """
-        def process_image(data):
-            series_name, chapter_number, page_number, img_src = data
-            try:
-                img_data = self.download_image(img_src)
-                if not img_data:
-                    logger.error(f"Failed to download image from {img_src}")
-                    return None
-                return (series_name, chapter_number, page_number, img_data)
-            except Exception as e:
-                logger.error(f"Error saving PNG link {img_src} for chapter {chapter_number}, page {page_number}: {e}")
-            return None
+        series_name, chapter_number = self.get_series_and_chapter_info(page_data)
+        checkpoint = self.open_checkpoint(series_name, chapter_number)
+        checkpoint.expected_pages = {data[2] for data in page_data}
+        checkpoint.chapter_link = chapter_link
+        checkpoint.set_quality(quality)
+        checkpoint.page_urls = {data[2]: data[3] for data in page_data}
+        missing_page_data = [data for data in page_data
+                             if not checkpoint.is_completed(data[2]) and not self.reuse_stored_page(checkpoint, data)
+                             and not self.reuse_browser_page(checkpoint, data)]
+        if self.browser_pages:
+            # Bodies of pages completed another way are not needed anymore
+            self.browser_pages.discard(data[3] for data in page_data)
+        if len(missing_page_data) < len(page_data):
+            print(f"Resuming chapter {chapter_number}: {len(page_data) - len(missing_page_data)} pages already downloaded.")
+
+        if not missing_page_data:
+            futures = []
+        elif self.download_engine == "asyncio":
+            # Pages of a node already quarantined are moved before they are scheduled
+            missing_page_data = [data[:3] + (self.get_failover_url(checkpoint, data[2], data[3]),)
+                                 if self.node_health.is_quarantined(get_host(data[3])) else data
+                                 for data in missing_page_data]
+            page_urls = {data[2]: data[3] for data in missing_page_data}
+            futures = [self.async_engine.submit_pages(missing_page_data,
+                                                      on_page=lambda page: self.write_page(checkpoint, page, page_urls[page[2]]))]
+        else:
+            futures = [self.download_executor.submit(self.save_page, checkpoint, data) for data in missing_page_data]
+        return checkpoint, futures
+
+    def finalize_chapter(self, checkpoint, futures):
+        """
+        Wait for the downloads of a chapter and save its archive from the staged pages.
+
+        A chapter with missing pages keeps its checkpoint so the next run only downloads those pages.
+
+        Args:
+            checkpoint (ChapterCheckpoint): The checkpoint of the chapter.
+            futures (list): The futures returned by submit_chapter_pages.
+
+        Returns:
+            bool: True if the archive was saved, False otherwise.
+        """
+        concurrent.futures.wait(futures)
+        missing_pages = checkpoint.missing_pages()
+        if missing_pages:
+            # Pages that failed before their node was quarantined get one more try on another node
+            missing_pages = self.retry_quarantined_pages(checkpoint, missing_pages)
+        if missing_pages:
+            logger.error(f"Chapter {checkpoint.chapter_number} of {checkpoint.series_name} is missing pages {missing_pages}. "
+                         f"It will be resumed on the next run.")
+            Metrics.chapters_incomplete.inc()
+            return False
+
+        # Pages are copied one at a time from the staging folder, in page order
+        pages = ((page_number, checkpoint.read_page(page_number)) for page_number in checkpoint.pages())
+        with Metrics.chapter_archive_seconds.time():
+            with self.open_cbz_writer(checkpoint.series_name, checkpoint.chapter_number, checkpoint.chapter_link,
+                                      checkpoint.quality) as cbz_writer:
+                for page_number, img_data, extension in self.prepare_pages(pages):
+                    cbz_writer.add_page(page_number, img_data, extension)
+        Metrics.chapters_archived.inc()
+        print(f"Saved {cbz_writer.page_count} images in {os.path.basename(cbz_writer.cbz_file_path)}...")
+        self.record_saved_chapter(cbz_writer)
+        checkpoint.clear()
+        logger.info(f"Saved {cbz_writer.cbz_file_path}")
+        self.log_transport_stats()
+        return True
+
+    def save_page(self, checkpoint, data):
+        """
+        Download a page and stage it in the checkpoint of its chapter.
+
+        Args:
+            checkpoint (ChapterCheckpoint): The checkpoint of the chapter.
+            data (tuple): The series name, chapter number, page number and image URL.
 
+        Returns:
+            bool: True if the page was saved, False otherwise.
+        """
+        series_name, chapter_number, page_number, img_src = data
+        start_time = time.perf_counter()
         try:
-            # Ensure all images are loaded
-            #if not self.web_interactions.wait_for_images_to_load():
-             #   logger.warning("Not all images were fully loaded. Proceeding with available images.")
-            # Process images concurrently
-            with ThreadPoolExecutor(max_workers=self.max_workers_number) as executor:
-                image_data_list = list(executor.map(process_image, page_data))
-
-            if image_data_list:
-                valid_image_data_list = [item for item in image_data_list if item]
-                valid_image_data_list.sort(key=lambda x: x[2])  # Sort by page number
-                print(f"Saving {len(valid_image_data_list)} images for chapter ...")
-            else:
-                logger.error("No valid image data to save.")
-                return
-
-            # Create a .cbz file for the chapter
-            self.create_cbz_file(valid_image_data_list)
+            if self.node_health.is_quarantined(get_host(img_src)):
+                img_src = self.get_failover_url(checkpoint, page_number, img_src)
+            img_data = self.download_image(img_src)
+            if not img_data and self.node_health.is_quarantined(get_host(img_src)):
+                # The node was quarantined by this failure or by the pages downloaded at the same time
+                failover_url = self.get_failover_url(checkpoint, page_number, img_src)
+                if failover_url != img_src:
+                    img_src = failover_url
+                    img_data = self.download_image(img_src)
+            if not img_data:
+                logger.error(f"Failed to download image from {img_src}")
+                return False
+            return self.write_page(checkpoint, (series_name, chapter_number, page_number, img_data), img_src)
         except Exception as e:
-            logger.error(f"Error saving PNG links for chapter: {e}")
+            logger.error(f"Error saving PNG link {img_src} for chapter {chapter_number}, page {page_number}: {e}")
+        finally:
+            with self._stats_lock:
+                self.download_busy_seconds += time.perf_counter() - start_time
+        return False
+
+    def get_failover_url(self, checkpoint, page_number, img_src):
+        """
+        Get the URL of a page on a healthy image node.
+
+        The chapter is resolved again through the at-home endpoint, once for all its pages, to get
+        a fresh node. The origin server is used when the fresh node is quarantined as well.
 
+        Args:
+            checkpoint (ChapterCheckpoint): The checkpoint of the chapter.
+            page_number (int): The page number.
+            img_src (str): The URL of the page on the quarantined node.
 
+        Returns:
+            str: The URL of the page on another node, img_src if the page cannot be moved.
+        """
+        with checkpoint.failover_lock:
+            failover_url = checkpoint.failover_urls.get(page_number)
+            if (checkpoint.chapter_link and checkpoint.failover_resolves < Config.NODE_FAILOVER_RESOLVES
+                    and (not failover_url or self.node_health.is_quarantined(get_host(failover_url)))):
+                checkpoint.failover_resolves += 1
+                checkpoint.failover_urls = dict(self.failover_resolver.resolve(checkpoint.chapter_link, checkpoint.quality))
+                failover_url = checkpoint.failover_urls.get(page_number)
+        if failover_url and not self.node_health.is_quarantined(get_host(failover_url)):
+            Metrics.page_failovers.inc(target="node")
+            return failover_url
+        origin_url = replace_base_url(img_src, Config.MANGADEX_UPLOADS_URL)
+        if not origin_url:
+            return img_src
+        Metrics.page_failovers.inc(target="origin")
+        return origin_url
+
+    def retry_quarantined_pages(self, checkpoint, missing_pages):
+        """
+        Download again the missing pages of a chapter whose image node is quarantined, from another node.
+
+        Args:
+            checkpoint (ChapterCheckpoint): The checkpoint of the chapter.
+            missing_pages (list): The page numbers missing from the chapter.
+
+        Returns:
+            list: The page numbers still missing.
+        """
+        page_data = [(checkpoint.series_name, checkpoint.chapter_number, page_number, checkpoint.page_urls[page_number])
+                     for page_number in missing_pages
+                     if page_number in checkpoint.page_urls and self.node_health.is_quarantined(get_host(checkpoint.page_urls[page_number]))]
+        if not page_data:
+            return missing_pages
+        logger.info(f"Downloading {len(page_data)} pages of chapter {checkpoint.chapter_number} from another image node")
+        # save_page moves the pages of a quarantined node before downloading them
+        concurrent.futures.wait([self.download_executor.submit(self.save_page, checkpoint, data) for data in page_data])
+        return checkpoint.missing_pages()
+
+    def write_page(self, checkpoint, image_data, img_src=None):
+        """
+        Write a downloaded page into the checkpoint of its chapter.
+
+        Args:
+            checkpoint (ChapterCheckpoint): The checkpoint of the chapter.
+            image_data (tuple): The series name, chapter number, page number and image bytes.
+            img_src (str): The URL the page was downloaded from.
+
+        Returns:
+            bool: True if the page was written, False otherwise.
+        """
+        series_name, chapter_number, page_number, img_data = image_data
+        if not self.is_valid_image_data(img_data, page_number):
+            return False
+        checkpoint.add_page(page_number, img_data, img_src)
+        return True
+
+    def is_valid_image_data(self, img_data, page_number):
+        # Validate img_data
+        if not isinstance(img_data, bytes) or not img_data:
+            logger.error(f"Invalid image data for page {page_number}. Skipping...")
+            return False
+        return True
+
+    def reuse_stored_page(self, checkpoint, data):
+        """
+        Complete a page from the page store when its URL embeds the hash of a stored page.
+
+        Args:
+            checkpoint (ChapterCheckpoint): The checkpoint of the chapter.
+            data (tuple): The series name, chapter number, page number and image URL.
+
+        Returns:
+            bool: True if the page was found in the store and does not need to be downloaded.
+        """
+        if not self.page_store:
+            return False
+        digest = self.page_store.lookup_url(data[3])
+        if not digest:
+            return False
+        checkpoint.add_stored_page(data[2], digest, self.page_store.size(digest))
+        return True
+
+    def reuse_browser_page(self, checkpoint, data):
+        """
+        Complete a page with the body loaded by the browser when the chapter was resolved.
+
+        Args:
+            checkpoint (ChapterCheckpoint): The checkpoint of the chapter.
+            data (tuple): The series name, chapter number, page number and image URL.
+
+        Returns:
+            bool: True if the page was written and does not need to be downloaded.
+        """
+        if not self.browser_pages:
+            return False
+        img_data = self.browser_pages.pop(data[3])
+        if not img_data:
+            return False
+        Metrics.pages_downloaded.inc(engine="browser")
+        Metrics.page_bytes.inc(len(img_data), engine="browser")
+        return self.write_page(checkpoint, (*data[:3], img_data), data[3])
+
+    def prepare_pages(self, pages):
+        """
+        Re-encode the pages if transcoding is enabled and find the file extension of each page.
+
+        Args:
+            pages (iterable): The (page_number, bytes) pairs of a chapter, in order.
+
+        Returns:
+            iterable: The (page_number, bytes, extension) triples to archive, in order.
+        """
+        if self.transcoder:
+            return self.transcoder.transcode_pages(pages)
+        return ((page_number, img_data, detect_image_extension(img_data)) for page_number, img_data in pages)
+
+    def open_checkpoint(self, series_name, chapter_number):
+        """
+        Open the checkpoint of a chapter, with the pages completed by a previous run.
+
+        Args:
+            series_name (str): The name of the manga series.
+            chapter_number (int): The number of the chapter.
+
+        Returns:
+            ChapterCheckpoint: The checkpoint of the chapter.
+        """
+        cbz_file_path = self.get_cbz_file_path(series_name, chapter_number)
+        folder_path, cbz_filename = os.path.split(cbz_file_path)
+        # Hidden staging folder next to the archive, e.g. ".Attack on Titan Chapter 1.cbz.pages"
+        staging_dir = os.path.join(folder_path, f".{cbz_filename}.pages")
+        return ChapterCheckpoint(staging_dir, cbz_file_path, series_name, chapter_number, self.page_store)
 
 
 
@@ -128,26 +442,41 @@ class FileOperations:
         # Create the folder path for the series ex: ./Mangas/A/Attack on Titan
         return os.path.join(self.save_path, sanitized_series_name[0].upper(), sanitized_series_name)
     
+    def get_cbz_file_path(self, series_name, chapter_number):
+        # Generate the .cbz file path of a chapter inside the sanitized series folder
+        folder_path = self.create_folder_path(series_name)
+        return self.create_cbz_folder_path(folder_path, self.create_cbz_filename(series_name, chapter_number))
+
+    def open_cbz_writer(self, series_name, chapter_number, chapter_link=None, quality=Config.QUALITY_ORIGINAL):
+        """
+        Open the streaming archive writer of a chapter.
+
+        Args:
+            series_name (str): The name of the manga series.
+            chapter_number (int): The number of the chapter.
+            chapter_link (str): The link of the chapter, recorded in the archive.
+            quality (str): The quality of the pages, recorded in the archive.
+
+        Returns:
+            StreamingCbzWriter: The writer of the chapter archive.
+        """
+        cbz_file_path = self.get_cbz_file_path(series_name, chapter_number)
+        os.makedirs(os.path.dirname(cbz_file_path), exist_ok=True)
+        print(f"Creating .cbz file for chapter {chapter_number}...")
+        return StreamingCbzWriter(cbz_file_path, self.get_screenshot_filename, series_name, chapter_number, chapter_link, quality)
+
     def create_cbz_file(self, image_data_list):
+        chapter_number = None
         try:
             series_name, chapter_number = self.get_series_and_chapter_info(image_data_list)
-            folder_path = self.create_folder_path(series_name)
-            os.makedirs(folder_path, exist_ok=True)
-            cbz_file_path = self.create_cbz_folder_path(folder_path, self.create_cbz_filename(series_name, chapter_number))
-            print(f"Creating .cbz file for chapter {chapter_number}...")
-
-            with zipfile.ZipFile(cbz_file_path, "w") as cbz_file:
-                for series_name, chapter_number, page_number, img_data in image_data_list:
-                    # Validate img_data
-                    if not isinstance(img_data, bytes) or not img_data:
-                        logger.error(f"Invalid image data for page {page_number}. Skipping...")
-                        continue
-
-                    # Pass cbz_file.namelist() instead of cbz_file
-                    screenshot_filename = self.get_screenshot_filename(page_number, cbz_file.namelist())
-                    cbz_file.writestr(screenshot_filename, img_data)
-
-            logger.info(f"Saved chapter {chapter_number} as {cbz_file_path}")
+            with self.open_cbz_writer(series_name, chapter_number) as cbz_writer:
+                pages = ((page_number, img_data) for series_name, chapter_number, page_number, img_data in image_data_list
+                         if self.is_valid_image_data(img_data, page_number))
+                for page_number, img_data, extension in self.prepare_pages(pages):
+                    cbz_writer.add_page(page_number, img_data, extension)
+            self.record_saved_chapter(cbz_writer)
+
+            logger.info(f"Saved chapter {chapter_number} as {cbz_writer.cbz_file_path}")
         except Exception as e:
             logger.error(f"Error creating .cbz file for chapter {chapter_number}: {e}")
 
@@ -156,9 +485,9 @@ class FileOperations:
     def get_series_and_chapter_info(self, image_data_list):
         return image_data_list[0][:2]
 
-    def get_screenshot_filename(self, page_number, existing_files):
+    def get_screenshot_filename(self, page_number, existing_files, extension="png"):
         # Generate base filename
-        base_filename = self.create_screenshot_filename(page_number, page_number)
+        base_filename = self.create_screenshot_filename(page_number, extension=extension)
         extension = base_filename.split('.')[-1]
         name = '.'.join(base_filename.split('.')[:-1])
 
@@ -185,28 +514,81 @@ class FileOperations:
         Returns:
             bytes or None: The binary content of the image if successful, None otherwise.
         """
+        start_time = time.perf_counter()
+        img_data = None
+        cached = False
         try:
-            headers = {'User-Agent': 'Mozilla/5.0'} 
-            with requests.get(img_src, headers=headers, timeout=10, stream=True) as response:
+            with self.transport.get(img_src, timeout=10, stream=True) as response:
                 response.raise_for_status()
+                cached = response.headers.get('X-Cache', '').upper().startswith('HIT')
 
                 # Validate the content type
                 content_type = response.headers.get('Content-Type', '')
                 if not content_type.startswith('image/'):
                     logger.error(f"URL {img_src} did not return an image. Content-Type: {content_type}")
+                    Metrics.page_failures.inc(reason="content_type")
                     return None
 
                 # Read the image in chunks
-                return b"".join(chunk for chunk in response.iter_content(chunk_size=8192) if chunk)
+                img_data = b"".join(chunk for chunk in response.iter_content(chunk_size=8192) if chunk)
+                Metrics.page_download_seconds.observe(time.perf_counter() - start_time, engine="threads")
+                Metrics.pages_downloaded.inc(engine="threads")
+                Metrics.page_bytes.inc(len(img_data), engine="threads")
+                return img_data
         except requests.Timeout:
             logger.error(f"Timeout while downloading image from {img_src}")
+            Metrics.page_failures.inc(reason="timeout")
+        except requests.HTTPError as e:
+            logger.error(f"Error downloading image from {img_src}: {e}")
+            Metrics.page_failures.inc(reason=f"http_{e.response.status_code if e.response is not None else 'error'}")
         except requests.RequestException as e:
             logger.error(f"Error downloading image from {img_src}: {e}")
+            Metrics.page_failures.inc(reason="connection")
+        finally:
+            self.node_health.record(img_src, bool(img_data), time.perf_counter() - start_time, len(img_data or b''), cached)
         return None
 
     
     
-    def save_chapter_pages(self, series_name, chapter_number, pages):
+    def close(self):
+        # Release the download pool, the asyncio engine and the pooled connections
+        if self._download_executor:
+            self._download_executor.shutdown(wait=True)
+            self._download_executor = None
+        if self._async_engine:
+            self._async_engine.close()
+            self._async_engine = None
+        self.transport.close()
+        self.node_health.close()
+        # The metrics of a closed instance are no longer collected, the batch jobs and the repairer each create one
+        for collector in self._metrics_collectors:
+            Metrics.registry.remove_collector(collector)
+        self._metrics_collectors = []
+        self.library_index.close()
+        if self.page_store:
+            self.page_store.report()
+        if self.transcoder:
+            self.transcoder.report()
+            self.transcoder.close()
+        if self.browser_pages:
+            stats = self.browser_pages.stats()
+            if stats['captured']:
+                logger.info(f"Browser pages: {stats['reused']} reused without downloading, {stats['unavailable']} evicted by the browser, "
+                            f"{stats['evicted']} dropped over the memory limit")
+
+    def log_transport_stats(self):
+        # Log the connection pool statistics to check that connections are reused
+        stats = self.transport.stats()
+        logger.info(f"HTTP pool stats: {stats['hits']} hits, {stats['new_connections']} new connections, {stats['retries']} retries")
+        for host, host_stats in self.rate_controller.stats().items():
+            logger.info(f"Rate control {host}: limit {host_stats['limit']}, {host_stats['increases']} increases, "
+                        f"{host_stats['decreases']} decreases, {host_stats['throttled_seconds']:.1f}s throttled")
+        for host, node_stats in self.node_health.stats().items():
+            if node_stats['failures'] or node_stats['quarantines']:
+                logger.info(f"Image node {host}: {node_stats['successes']} pages, {node_stats['failures']} failures, "
+                            f"error rate {node_stats['error_rate']:.2f}, {node_stats['quarantines']} quarantines")
+
+    def save_chapter_pages(self, series_name, chapter_number, pages, chapter_link=None, quality=Config.QUALITY_ORIGINAL):
         """
         Save the captured PNG links for the chapter.
 
@@ -214,6 +596,8 @@ class FileOperations:
             series_name (str): The name of the manga series.
             chapter_number (int): The number of the chapter.
             pages (list): A list of tuples containing page numbers and URLs.
+            chapter_link (str): The link of the chapter, recorded in the archive.
+            quality (str): The quality of the pages, recorded in the archive and the library index.
 
         Returns:
             None
@@ -225,7 +609,7 @@ class FileOperations:
             for page_number, page_url in pages:
                 page_data.append((series_name, chapter_number, page_number, page_url ))
             print(f"Saving {len(page_data)} pages for chapter {chapter_number}...")
-            self.bulk_save_png_links(page_data)
+            self.bulk_save_png_links(page_data, chapter_link, quality)
         except Exception as e:
             logger.error(f"Error saving chapter pages for chapter {chapter_number}: {e}")
         
@@ -242,9 +626,10 @@ class FileOperations:
             bool: True if the image was successfully saved, False otherwise.
         """
         try:
-            response = requests.get(img_src)
+            response = self.transport.get(img_src)
             response.raise_for_status()  # Raise an HTTPError if the HTTP request returned an unsuccessful status code
             # Save the image to the specified folder
+            from PIL import Image
             Image.open(io.BytesIO(response.content)).save(os.path.join(folder_path, file_name))
             return True
         except requests.RequestException as e:
@@ -260,9 +645,67 @@ class FileOperations:
         return os.path.join(self.save_path, self.sanitize_folder_name(series_name), chapter_number)
     
     def check_cbz_file_exist(self, series_name, chapter_number):
-        # Generate the sanitized series folder path
-        folder_path = self.create_folder_path(series_name)
-        # Generate the .cbz file path for the chapter
-        cbz_file_path = self.create_cbz_folder_path(folder_path, self.create_cbz_filename(series_name, chapter_number))
-        # Check if the .cbz file already exists
-        return os.path.exists(cbz_file_path)
+        # Check if the chapter is in the library index
+        return str(chapter_number) in self.get_existing_chapters(series_name)
+
+    def get_existing_chapters(self, series_name):
+        """
+        Get the chapters already saved for a series, with a single index query and a single listing of its folder per series.
+
+        Series saved before the index existed are indexed from their folder the first time they are queried, and the
+        chapters whose archive was deleted since they were indexed are dropped so they are downloaded again.
+
+        Args:
+            series_name (str): The name of the manga series.
+
+        Returns:
+            dict: The path of the .cbz file of every saved chapter number, as strings.
+        """
+        series = self.sanitize_folder_name(series_name)
+        with self._existing_chapters_lock:
+            if series not in self._existing_chapters:
+                folder_path = self.create_folder_path(series_name)
+                if not self.library_index.has_series(series) and os.path.isdir(folder_path):
+                    self.library_index.record_chapters(scan_series_folder(folder_path))
+                chapter_files = self.library_index.get_chapter_files(series)
+                archive_names = list_archive_names(folder_path) if chapter_files else set()
+                deleted = [chapter_number for chapter_number, file_path in chapter_files.items()
+                           if os.path.basename(file_path) not in archive_names]
+                if deleted:
+                    logger.info(f"{len(deleted)} archives of {series_name} were deleted, their chapters are downloaded again.")
+                    self.library_index.remove_chapters(series, deleted)
+                    for chapter_number in deleted:
+                        del chapter_files[chapter_number]
+                self._existing_chapters[series] = chapter_files
+            return self._existing_chapters[series]
+
+    def get_series_quality(self, series_name):
+        """
+        Get the quality of the chapters already saved for a series.
+
+        Args:
+            series_name (str): The name of the manga series.
+
+        Returns:
+            str: "original" or "data-saver", None if the series has no saved chapter.
+        """
+        # Indexes the series from its folder if it was saved before the index existed
+        if not self.get_existing_chapters(series_name):
+            return None
+        return self.library_index.get_series_quality(self.sanitize_folder_name(series_name))
+
+    def record_saved_chapter(self, cbz_writer):
+        # Record the committed archive in the library index, a writer without valid pages aborted and wrote nothing
+        if not cbz_writer.page_count or not os.path.isfile(cbz_writer.cbz_file_path):
+            logger.warning(f"No archive written for chapter {cbz_writer.chapter_number} of {cbz_writer.series_name}, it is not recorded.")
+            return
+        series = self.sanitize_folder_name(cbz_writer.series_name)
+        try:
+            self.library_index.record_chapter(series, cbz_writer.chapter_number, cbz_writer.cbz_file_path, cbz_writer.page_count,
+                                              quality=cbz_writer.quality)
+        except Exception as e:
+            logger.error(f"Error recording {cbz_writer.cbz_file_path} in the library index: {e}")
+            return
+        with self._existing_chapters_lock:
+            if series in self._existing_chapters:
+                self._existing_chapters[series][str(cbz_writer.chapter_number)] = cbz_writer.cbz_file_path
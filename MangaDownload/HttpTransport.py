@@ -0,0 +1,193 @@
+import threading
+import time
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from Config.config import Config
+from MangaDownload.RateControl import HostRateController
+from MangaDownload import Metrics
+
+
+class CountingRetry(Retry):
+    """
+    Retry policy that reports every retry it schedules to a callback.
+    """
+    def __init__(self, *args, on_retry=None, **kwargs):
+        self.on_retry = on_retry
+        super().__init__(*args, **kwargs)
+
+    def new(self, **kwargs):
+        # urllib3 creates a new Retry object for every attempt, keep the callback on it
+        retry = super().new(**kwargs)
+        retry.on_retry = self.on_retry
+        return retry
+
+    def increment(self, *args, **kwargs):
+        # increment raises once the retries are exhausted, so only scheduled retries are counted
+        retry = super().increment(*args, **kwargs)
+        if self.on_retry:
+            pool = kwargs.get('_pool')
+            self.on_retry(getattr(pool, 'host', None))
+        return retry
+
+
+class StreamedResponse:
+    """
+    Response of a streamed request, holding the concurrency slot of its host until the body is read.
+
+    The slot is released when the response is closed, with the latency of the whole transfer, and a
+    timeout or a reset while reading the body is reported as congestion.
+    """
+    def __init__(self, response, on_close):
+        """
+        Initialize the StreamedResponse instance.
+
+        Args:
+            response (requests.Response): The response whose body is not read yet.
+            on_close (callable): Function called once with whether reading the body failed.
+        """
+        self.response = response
+        self._on_close = on_close
+        self.failed = False
+
+    def __getattr__(self, name):
+        return getattr(self.response, name)
+
+    def iter_content(self, *args, **kwargs):
+        try:
+            yield from self.response.iter_content(*args, **kwargs)
+        except (requests.Timeout, requests.ConnectionError, requests.exceptions.ChunkedEncodingError):
+            self.failed = True
+            raise
+
+    def close(self):
+        on_close, self._on_close = self._on_close, None
+        try:
+            self.response.close()
+        finally:
+            if on_close:
+                on_close(self.failed)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class HttpTransport:
+    """
+    Shared HTTP transport with a keep-alive connection pool per host and retries with backoff.
+
+    Every request goes through the rate controller, which limits the concurrency and the request
+    rate of each host.
+    """
+    def __init__(self, pool_size=Config.HTTP_POOL_SIZE, max_retries=Config.HTTP_MAX_RETRIES,
+                 backoff_factor=Config.HTTP_BACKOFF_FACTOR, timeout=10, rate_controller=None):
+        """
+        Initialize the HttpTransport instance.
+
+        Args:
+            pool_size (int): The maximum number of connections kept open per host.
+            max_retries (int): The maximum number of retries of a request.
+            backoff_factor (float): The backoff factor between retries (0.5 waits 0.5s, 1s, 2s, ...).
+            timeout (int): The default timeout of the requests in seconds.
+            rate_controller (HostRateController): The per-host concurrency and rate limits, shared with the other engines.
+        """
+        self.timeout = timeout
+        self.rate_controller = rate_controller or HostRateController(max_limit=pool_size)
+        self._retries = 0
+        self._lock = threading.Lock()
+        retry = CountingRetry(
+            total=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=Config.HTTP_RETRY_STATUSES,
+            allowed_methods=frozenset(["GET", "HEAD"]),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+            on_retry=self._count_retry,
+        )
+        # pool_block keeps the number of connections per host bounded by the pool size
+        self.adapter = HTTPAdapter(pool_connections=Config.HTTP_POOL_HOSTS, pool_maxsize=pool_size,
+                                   max_retries=retry, pool_block=True)
+        self.session = requests.Session()
+        self.session.headers.update({'User-Agent': 'Mozilla/5.0'})
+        self.session.mount("https://", self.adapter)
+        self.session.mount("http://", self.adapter)
+
+    def _count_retry(self, host=None):
+        with self._lock:
+            self._retries += 1
+        Metrics.http_retries.inc(host=host or "unknown")
+        # Every 429/5xx/timeout retried by urllib3 is a congestion signal for the host
+        if host:
+            self.rate_controller.get_limiter(host).record_congestion()
+
+    def get(self, url, **kwargs):
+        """
+        Send a GET request through the pooled session.
+
+        A streamed response keeps the concurrency slot of its host until it is closed, so the
+        rate controller sees the whole transfer and not only the time to the first byte.
+
+        Args:
+            url (str): The URL to request.
+            **kwargs: Additional arguments passed to requests.Session.get.
+
+        Returns:
+            requests.Response: The response of the request, a StreamedResponse to close when stream=True.
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        host = urlsplit(url).hostname
+        self.rate_controller.acquire(host)
+        start_time = time.perf_counter()
+        congested = False
+        streamed = False
+        try:
+            response = self.session.get(url, **kwargs)
+            congested = response.status_code in Config.HTTP_RETRY_STATUSES
+            if kwargs.get('stream'):
+                streamed = True
+                return StreamedResponse(response, lambda failed: self.rate_controller.release(
+                    host, time.perf_counter() - start_time, congested or failed))
+            return response
+        except (requests.Timeout, requests.ConnectionError):
+            congested = True
+            raise
+        finally:
+            if not streamed:
+                self.rate_controller.release(host, time.perf_counter() - start_time, congested)
+
+    def stats(self):
+        """
+        Get the connection pool statistics.
+
+        Returns:
+            dict: The number of requests served by a reused connection (hits), the number of
+                  connections opened (new_connections) and the number of retries.
+        """
+        requests_count = new_connections = 0
+        pools = self.adapter.poolmanager.pools
+        # Hosts evicted from the pool manager are no longer counted
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            requests_count += pool.num_requests
+            new_connections += pool.num_connections
+        with self._lock:
+            retries = self._retries
+        return {
+            'hits': max(0, requests_count - new_connections),
+            'new_connections': new_connections,
+            'retries': retries,
+        }
+
+    def rate_stats(self):
+        # The concurrency limit and the adjustments of every host
+        return self.rate_controller.stats()
+
+    def close(self):
+        # Close all the pooled connections
+        self.session.close()
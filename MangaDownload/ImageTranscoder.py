@@ -0,0 +1,185 @@
+import io
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from Config.config import Config
+
+# This module is imported by the worker processes, so it only depends on the standard library
+# and Pillow; the logger is the one configured by the main process.
+logger = logging.getLogger('manga_download')
+
+# Magic bytes of the image formats served by MangaDex
+IMAGE_SIGNATURES = (
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'\xff\xd8\xff', 'jpg'),
+    (b'GIF87a', 'gif'),
+    (b'GIF89a', 'gif'),
+)
+
+# Pillow format name and file extension of every transcoding target
+TRANSCODE_FORMATS = {
+    'webp': ('WEBP', 'webp'),
+    'jpeg': ('JPEG', 'jpg'),
+    'avif': ('AVIF', 'avif'),
+}
+
+
+def detect_image_extension(img_data, default='png'):
+    """
+    Detect the file extension of an image from its magic bytes.
+
+    Args:
+        img_data (bytes): The content of the image.
+        default (str): The extension returned if the format is not recognised.
+
+    Returns:
+        str: The file extension, without the dot.
+    """
+    for signature, extension in IMAGE_SIGNATURES:
+        if img_data.startswith(signature):
+            return extension
+    if img_data[:4] == b'RIFF' and img_data[8:12] == b'WEBP':
+        return 'webp'
+    if img_data[4:12] in (b'ftypavif', b'ftypavis'):
+        return 'avif'
+    return default
+
+
+def transcode_image(img_data, target_format, quality):
+    """
+    Re-encode an image. Runs in a worker process.
+
+    Args:
+        img_data (bytes): The content of the image.
+        target_format (str): The target format ("webp", "jpeg" or "avif").
+        quality (int): The quality of the lossy formats, WebP is always lossless.
+
+    Returns:
+        tuple: The re-encoded bytes and the time spent in seconds.
+    """
+    from PIL import Image
+    start_time = time.perf_counter()
+    pil_format, _ = TRANSCODE_FORMATS[target_format]
+    with Image.open(io.BytesIO(img_data)) as image:
+        output = io.BytesIO()
+        if target_format == 'webp':
+            image.save(output, pil_format, lossless=True, method=4)
+        else:
+            # JPEG has no alpha channel nor palette
+            if target_format == 'jpeg' and image.mode not in ('RGB', 'L'):
+                image = image.convert('RGB')
+            image.save(output, pil_format, quality=quality)
+    return output.getvalue(), time.perf_counter() - start_time
+
+
+class ImageTranscoder:
+    """
+    Re-encode the pages of a chapter in a process pool before they are archived.
+    """
+    def __init__(self, target_format, quality=Config.TRANSCODE_QUALITY, min_savings=Config.TRANSCODE_MIN_SAVINGS,
+                 max_workers=None):
+        """
+        Initialize the ImageTranscoder instance.
+
+        Args:
+            target_format (str): The target format ("webp", "jpeg" or "avif").
+            quality (int): The quality of the lossy formats.
+            min_savings (float): The minimum size reduction (0.1 = 10%) for a re-encoded page to replace the original.
+            max_workers (int): The number of worker processes, one per core by default.
+        """
+        if target_format not in TRANSCODE_FORMATS:
+            raise ValueError(f"Unknown transcoding format '{target_format}'. Expected one of {tuple(TRANSCODE_FORMATS)}.")
+        self.target_format = target_format
+        self.extension = TRANSCODE_FORMATS[target_format][1]
+        self.quality = quality
+        self.min_savings = min_savings
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._executor = None
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    @property
+    def executor(self):
+        if not self._executor:
+            # Spawned workers do not inherit the threads (and locks) of the downloader
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    def transcode_pages(self, pages):
+        """
+        Re-encode pages in the process pool, keeping a bounded number of pages in flight.
+
+        Args:
+            pages (iterable): The (page_number, bytes) pairs of a chapter, in order.
+
+        Yields:
+            tuple: The page number, the bytes to archive and their file extension, in the same order.
+        """
+        pending = deque()
+        for page_number, img_data in pages:
+            pending.append((page_number, img_data, self.executor.submit(transcode_image, img_data, self.target_format, self.quality)))
+            if len(pending) >= self.max_workers * 2:
+                yield self.select_output(*pending.popleft())
+        while pending:
+            yield self.select_output(*pending.popleft())
+
+    def select_output(self, page_number, img_data, future):
+        """
+        Choose between the original page and its re-encoded version.
+
+        Args:
+            page_number (int): The page number.
+            img_data (bytes): The original content of the page.
+            future (Future): The future of the re-encoding.
+
+        Returns:
+            tuple: The page number, the bytes to archive and their file extension.
+        """
+        source_format = detect_image_extension(img_data)
+        try:
+            output, seconds = future.result()
+        except Exception as e:
+            logger.error(f"Error transcoding page {page_number} to {self.target_format}: {e}")
+            self.record(source_format, len(img_data), len(img_data), 0.0, kept_original=True)
+            return page_number, img_data, source_format
+
+        # Keep the original unless the re-encoded page is at least min_savings smaller
+        kept_original = len(output) > len(img_data) * (1 - self.min_savings)
+        self.record(source_format, len(img_data), len(img_data) if kept_original else len(output), seconds, kept_original)
+        if kept_original:
+            return page_number, img_data, source_format
+        return page_number, output, self.extension
+
+    def record(self, source_format, input_bytes, output_bytes, seconds, kept_original):
+        key = f"{source_format}->{self.target_format}"
+        with self._lock:
+            stats = self._stats.setdefault(key, {'pages': 0, 'kept_original': 0, 'input_bytes': 0, 'output_bytes': 0, 'seconds': 0.0})
+            stats['pages'] += 1
+            stats['kept_original'] += kept_original
+            stats['input_bytes'] += input_bytes
+            stats['output_bytes'] += output_bytes
+            stats['seconds'] += seconds
+
+    def stats(self):
+        # Size and time accounting per source and target format
+        with self._lock:
+            return {key: dict(stats) for key, stats in self._stats.items()}
+
+    def report(self):
+        # Log and print the transcoding statistics of the run
+        for key, stats in self.stats().items():
+            saved = 1 - stats['output_bytes'] / stats['input_bytes'] if stats['input_bytes'] else 0.0
+            message = (f"Transcoding {key}: {stats['pages']} pages ({stats['kept_original']} kept original), "
+                       f"{stats['input_bytes'] / (1024 * 1024):.1f} MiB -> {stats['output_bytes'] / (1024 * 1024):.1f} MiB "
+                       f"({saved:.0%} saved), {stats['seconds']:.1f}s of encoding")
+            print(message)
+            logger.info(message)
+
+    def close(self):
+        if self._executor:
+            self._executor.shutdown(wait=True)
+            self._executor = None
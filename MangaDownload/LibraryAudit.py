@@ -0,0 +1,224 @@
+import hashlib
+import io
+import json
+import logging
+import multiprocessing
+import os
+import re
+import time
+import zipfile
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from Config.config import Config
+from MangaDownload.CbzWriter import read_archive_metadata
+from MangaDownload.ImageTranscoder import detect_image_extension
+
+# This module is imported by the worker processes, so it only depends on the standard library
+# and Pillow; the logger is the one configured by the main process.
+logger = logging.getLogger('manga_download')
+
+# Page number of the members written before the archives had metadata, e.g. page_0001.png or page_1_0.png
+MEMBER_PAGE_PATTERN = re.compile(r'page_(\d+)')
+READ_CHUNK_SIZE = 1024 * 1024
+
+
+def audit_member(cbz_file, info, recorded, decode):
+    """
+    Check a page of an archive: zip CRC, magic bytes, recorded hash and optionally decodability.
+
+    Args:
+        cbz_file (zipfile.ZipFile): The open archive.
+        info (zipfile.ZipInfo): The member of the page.
+        recorded (list): The page number and SHA-256 recorded in the archive comment, None if unknown.
+        decode (bool): Check that Pillow can read the page.
+
+    Returns:
+        str: The reason the page is bad ("crc", "unreadable", "magic", "hash" or "decode"), None if it is valid.
+    """
+    digest = hashlib.sha256()
+    head = b''
+    # The page is only kept in memory when it has to be decoded
+    buffer = io.BytesIO() if decode else None
+    try:
+        with cbz_file.open(info) as member:
+            while chunk := member.read(READ_CHUNK_SIZE):
+                if len(head) < 16:
+                    head += chunk[:16 - len(head)]
+                digest.update(chunk)
+                if buffer:
+                    buffer.write(chunk)
+    except zipfile.BadZipFile:
+        # Raised by the zip module when the CRC-32 of the member does not match
+        return "crc"
+    except (OSError, EOFError, zlib.error):
+        return "unreadable"
+
+    if detect_image_extension(head, default=None) is None:
+        return "magic"
+    if recorded and recorded[1] and recorded[1] != digest.hexdigest():
+        return "hash"
+    if buffer:
+        try:
+            from PIL import Image
+        except ImportError:
+            return None
+        try:
+            buffer.seek(0)
+            with Image.open(buffer) as image:
+                image.verify()
+        except Exception:
+            return "decode"
+    return None
+
+
+def audit_archive(cbz_file_path, decode=True):
+    """
+    Check every page of an archive. Runs in a worker process.
+
+    Args:
+        cbz_file_path (str): The path of the .cbz file.
+        decode (bool): Check that Pillow can read the pages.
+
+    Returns:
+        dict: The path, chapter link, quality and page count of the archive, its bad pages and the error
+              preventing it from being read at all (None if it could be read).
+    """
+    result = {'path': cbz_file_path, 'chapter_link': None, 'quality': Config.QUALITY_ORIGINAL, 'page_count': 0,
+              'bad_pages': [], 'error': None}
+    try:
+        with zipfile.ZipFile(cbz_file_path) as cbz_file:
+            metadata = read_archive_metadata(cbz_file) or {}
+            recorded_pages = metadata.get('pages') or {}
+            result['chapter_link'] = metadata.get('chapter_link')
+            result['quality'] = metadata.get('quality') or Config.QUALITY_ORIGINAL
+            members = [info for info in cbz_file.infolist() if not info.is_dir()]
+            result['page_count'] = len(members)
+            for info in members:
+                recorded = recorded_pages.get(info.filename)
+                reason = audit_member(cbz_file, info, recorded, decode)
+                if reason:
+                    result['bad_pages'].append({'member': info.filename, 'page': get_page_number(info.filename, recorded), 'reason': reason})
+            # Pages recorded when the archive was written but no longer in it
+            names = {info.filename for info in members}
+            for name, recorded in recorded_pages.items():
+                if name not in names:
+                    result['bad_pages'].append({'member': name, 'page': recorded[0], 'reason': "missing"})
+    except (OSError, zipfile.BadZipFile, zlib.error, EOFError) as e:
+        result['error'] = str(e) or type(e).__name__
+    return result
+
+
+def audit_archives(cbz_file_paths, decode=True):
+    # A batch of archives per task keeps the inter-process traffic low
+    return [audit_archive(cbz_file_path, decode) for cbz_file_path in cbz_file_paths]
+
+
+def get_page_number(member_name, recorded=None):
+    if recorded:
+        return recorded[0]
+    match = MEMBER_PAGE_PATTERN.search(member_name)
+    return int(match.group(1)) if match else None
+
+
+def iter_archives(save_path):
+    # Walk the library one series folder at a time
+    from MangaDownload.LibraryIndex import CBZ_FILENAME_PATTERN, list_series_folders
+    for series_folder in list_series_folders(save_path):
+        try:
+            with os.scandir(series_folder) as entries:
+                for entry in entries:
+                    if CBZ_FILENAME_PATTERN.match(entry.name) and entry.is_file():
+                        yield entry.path
+        except OSError as e:
+            logger.error(f"Error scanning {series_folder}: {e}")
+
+
+def iter_batches(items, batch_size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def build_repair_entry(result):
+    """
+    Turn the audit of a damaged archive into an entry of the repair queue.
+
+    Args:
+        result (dict): The result of audit_archive.
+
+    Returns:
+        dict: The archive, its series, chapter number, link and quality, and the pages to download again
+              (None for the whole chapter).
+    """
+    from MangaDownload.LibraryIndex import CBZ_FILENAME_PATTERN
+    match = CBZ_FILENAME_PATTERN.match(os.path.basename(result['path']))
+    pages = None
+    # Pages without a number cannot be matched with the chapter, the whole chapter is downloaded again
+    if not result['error'] and all(page['page'] is not None for page in result['bad_pages']):
+        pages = sorted({page['page'] for page in result['bad_pages']})
+    return {
+        'path': result['path'],
+        'series': os.path.basename(os.path.dirname(result['path'])),
+        'chapter_number': match.group(1) if match else None,
+        'chapter_link': result['chapter_link'],
+        'quality': result['quality'],
+        'pages': pages,
+        'problems': [result['error']] if result['error'] else [f"{page['member']}: {page['reason']}" for page in result['bad_pages']],
+    }
+
+
+def run_audit(save_path, queue_path=Config.REPAIR_QUEUE_PATH, max_workers=None, decode=True, batch_size=Config.AUDIT_BATCH_SIZE):
+    """
+    Audit every archive of the library in a process pool and write the repair queue.
+
+    The archives are submitted in batches with a bounded number of batches in flight, and every
+    damaged archive is written to the queue as soon as it is found, so the memory used does not
+    depend on the size of the library.
+
+    Args:
+        save_path (str): The root folder of the library.
+        queue_path (str): The JSON lines file receiving the archives to repair.
+        max_workers (int): The number of worker processes, one per core by default.
+        decode (bool): Check that Pillow can read the pages.
+        batch_size (int): The number of archives audited per task.
+
+    Returns:
+        dict: The number of archives audited, damaged and unreadable, and of bad pages.
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    summary = {'archives': 0, 'damaged': 0, 'unreadable': 0, 'bad_pages': 0}
+    start_time = time.perf_counter()
+    os.makedirs(os.path.dirname(queue_path) or '.', exist_ok=True)
+
+    def record(results):
+        for result in results:
+            summary['archives'] += 1
+            if result['error'] or result['bad_pages']:
+                summary['damaged'] += 1
+                summary['unreadable'] += bool(result['error'])
+                summary['bad_pages'] += len(result['bad_pages'])
+                queue_file.write(json.dumps(build_repair_entry(result)) + "\n")
+                logger.warning(f"Damaged archive {result['path']}: {result['error'] or result['bad_pages']}")
+        if summary['archives'] and summary['archives'] % (batch_size * 100) < len(results):
+            print(f"Audited {summary['archives']} archives ({summary['archives'] / (time.perf_counter() - start_time):.0f}/s)...")
+
+    # Spawned workers do not inherit the threads (and locks) of the downloader
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn")) as executor, \
+            open(queue_path + ".tmp", 'w', encoding='utf-8') as queue_file:
+        pending = deque()
+        for batch in iter_batches(iter_archives(save_path), batch_size):
+            pending.append(executor.submit(audit_archives, batch, decode))
+            if len(pending) >= max_workers * 2:
+                record(pending.popleft().result())
+        while pending:
+            record(pending.popleft().result())
+    os.replace(queue_path + ".tmp", queue_path)
+
+    logger.info(f"Audit of {save_path}: {summary} in {time.perf_counter() - start_time:.1f}s")
+    return summary
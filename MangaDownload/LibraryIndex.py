@@ -0,0 +1,193 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from Config.config import Config
+from MangaDownload.CbzWriter import read_archive_metadata
+from MangaDownload.DownloadLogger import logger
+
+# The chapter number is what follows the last " Chapter " of a .cbz filename
+CBZ_FILENAME_PATTERN = re.compile(r'^.* Chapter (.+)\.cbz$')
+CHAPTER_COLUMNS = "series, chapter_number, file_path, size, page_count, completed_at, quality"
+
+
+class LibraryIndex:
+    """
+    SQLite index of the chapters saved in the library.
+    """
+    def __init__(self, db_path):
+        """
+        Initialize the LibraryIndex instance.
+
+        Args:
+            db_path (str): The path of the SQLite database.
+        """
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._connection = sqlite3.connect(db_path, check_same_thread=False)
+        # WAL lets readers work while a chapter is being recorded
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute("""
+            CREATE TABLE IF NOT EXISTS chapters (
+                series TEXT NOT NULL,
+                chapter_number TEXT NOT NULL,
+                file_path TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                page_count INTEGER NOT NULL,
+                completed_at REAL NOT NULL,
+                quality TEXT,
+                PRIMARY KEY (series, chapter_number)
+            )
+        """)
+        # Indexes created before the quality was recorded get the column, their chapters are original quality
+        columns = {row[1] for row in self._connection.execute("PRAGMA table_info(chapters)")}
+        if 'quality' not in columns:
+            self._connection.execute("ALTER TABLE chapters ADD COLUMN quality TEXT")
+        self._connection.commit()
+
+    def record_chapter(self, series, chapter_number, file_path, page_count, completed_at=None, quality=None):
+        """
+        Record a saved chapter, replacing a previous record of the same chapter.
+
+        Args:
+            series (str): The sanitized name of the series.
+            chapter_number (str): The number of the chapter.
+            file_path (str): The path of the .cbz file.
+            page_count (int): The number of pages in the archive.
+            completed_at (float): The time the chapter was saved, now by default.
+            quality (str): The quality of the pages, "original" or "data-saver".
+        """
+        self.record_chapters([(series, str(chapter_number), file_path, os.path.getsize(file_path),
+                               page_count, completed_at or time.time(), quality or Config.QUALITY_ORIGINAL)])
+
+    def record_chapters(self, rows):
+        # rows are (series, chapter_number, file_path, size, page_count, completed_at, quality) tuples
+        with self._lock, self._connection:
+            self._connection.executemany(f"INSERT OR REPLACE INTO chapters ({CHAPTER_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def has_series(self, series):
+        with self._lock:
+            return self._connection.execute("SELECT 1 FROM chapters WHERE series = ? LIMIT 1", (series,)).fetchone() is not None
+
+    def get_chapter_files(self, series):
+        """
+        Get the chapters saved for a series and their archives in a single query.
+
+        Args:
+            series (str): The sanitized name of the series.
+
+        Returns:
+            dict: The path of the .cbz file of every chapter number, as strings.
+        """
+        with self._lock:
+            rows = self._connection.execute("SELECT chapter_number, file_path FROM chapters WHERE series = ?", (series,)).fetchall()
+        return dict(rows)
+
+    def remove_chapters(self, series, chapter_numbers):
+        with self._lock, self._connection:
+            self._connection.executemany("DELETE FROM chapters WHERE series = ? AND chapter_number = ?",
+                                         [(series, str(chapter_number)) for chapter_number in chapter_numbers])
+
+    def get_series_quality(self, series):
+        """
+        Get the quality of most of the chapters saved for a series.
+
+        Args:
+            series (str): The sanitized name of the series.
+
+        Returns:
+            str: "original" or "data-saver", None if the series has no saved chapter.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT COALESCE(quality, ?) AS tier FROM chapters WHERE series = ? GROUP BY tier ORDER BY COUNT(*) DESC LIMIT 1",
+                (Config.QUALITY_ORIGINAL, series)).fetchone()
+        return row[0] if row else None
+
+    def replace_all(self, rows):
+        # Replace the whole index in a single transaction
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM chapters")
+            self._connection.executemany(f"INSERT INTO chapters ({CHAPTER_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+def scan_series_folder(series_folder):
+    """
+    List the chapters saved in a series folder.
+
+    Args:
+        series_folder (str): The folder of the series, its name is the sanitized series name.
+
+    Returns:
+        list: The (series, chapter_number, file_path, size, page_count, completed_at, quality) rows of the folder.
+    """
+    series = os.path.basename(series_folder)
+    rows = []
+    try:
+        with os.scandir(series_folder) as entries:
+            for entry in entries:
+                match = CBZ_FILENAME_PATTERN.match(entry.name)
+                if not match or not entry.is_file():
+                    continue
+                try:
+                    stat = entry.stat()
+                    with zipfile.ZipFile(entry.path) as cbz_file:
+                        page_count = len(cbz_file.namelist())
+                        # Archives written before the quality was recorded hold original pages
+                        quality = (read_archive_metadata(cbz_file) or {}).get('quality') or Config.QUALITY_ORIGINAL
+                except (OSError, zipfile.BadZipFile) as e:
+                    logger.warning(f"Skipping unreadable archive {entry.path}: {e}")
+                    continue
+                rows.append((series, match.group(1), entry.path, stat.st_size, page_count, stat.st_mtime, quality))
+    except OSError as e:
+        logger.error(f"Error scanning {series_folder}: {e}")
+    return rows
+
+
+def list_archive_names(series_folder):
+    # The names of the .cbz files of a series folder, from a single listing of the folder
+    try:
+        with os.scandir(series_folder) as entries:
+            return {entry.name for entry in entries if entry.name.endswith(".cbz")}
+    except OSError:
+        return set()
+
+
+def list_series_folders(save_path):
+    # The library is organised as <save path>/<first letter>/<series>
+    folders = []
+    with os.scandir(save_path) as letters:
+        for letter in letters:
+            if not letter.is_dir():
+                continue
+            with os.scandir(letter.path) as series_folders:
+                folders.extend(series_folder.path for series_folder in series_folders if series_folder.is_dir())
+    return folders
+
+
+def rebuild_library_index(library_index, save_path, max_workers=Config.REINDEX_WORKERS):
+    """
+    Rebuild the index from the archives on disk, scanning the series folders in parallel.
+
+    Args:
+        library_index (LibraryIndex): The index to rebuild.
+        save_path (str): The root folder of the library.
+        max_workers (int): The number of folders scanned at the same time.
+
+    Returns:
+        int: The number of chapters indexed.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        rows = [row for folder_rows in executor.map(scan_series_folder, list_series_folders(save_path)) for row in folder_rows]
+    library_index.replace_all(rows)
+    logger.info(f"Reindexed {len(rows)} chapters from {save_path}")
+    return len(rows)
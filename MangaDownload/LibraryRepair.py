@@ -0,0 +1,184 @@
+import json
+import os
+import zipfile
+from Config.config import Config
+from MangaDownload.CbzWriter import StreamingCbzWriter, read_archive_metadata
+from MangaDownload.DownloadLogger import logger
+from MangaDownload.ImageTranscoder import detect_image_extension
+from MangaDownload.LibraryAudit import get_page_number
+
+
+def load_repair_queue(queue_path=Config.REPAIR_QUEUE_PATH):
+    try:
+        with open(queue_path, encoding='utf-8') as queue_file:
+            return [json.loads(line) for line in queue_file if line.strip()]
+    except FileNotFoundError:
+        return []
+
+
+def save_repair_queue(entries, queue_path=Config.REPAIR_QUEUE_PATH):
+    with open(queue_path + ".tmp", 'w', encoding='utf-8') as queue_file:
+        for entry in entries:
+            queue_file.write(json.dumps(entry) + "\n")
+    os.replace(queue_path + ".tmp", queue_path)
+
+
+class ArchiveRepairer:
+    """
+    Repair the archives found damaged by the audit, downloading only their bad pages.
+
+    The chapter is resolved again to get fresh page URLs, the bad pages are downloaded, and the
+    archive is rewritten with its good pages copied over one at a time.
+    """
+    def __init__(self, manga_downloader):
+        """
+        Initialize the ArchiveRepairer instance.
+
+        Args:
+            manga_downloader (MangaDownloader): The downloader resolving the chapters and downloading the pages.
+        """
+        self.manga_downloader = manga_downloader
+        self.file_operations = manga_downloader.file_operations
+        self._cached_links = None
+
+    def repair_queue(self, queue_path=Config.REPAIR_QUEUE_PATH):
+        """
+        Repair every archive of the repair queue, keeping the ones that could not be repaired in the queue.
+
+        Args:
+            queue_path (str): The repair queue written by the audit.
+
+        Returns:
+            tuple: The number of archives repaired and the number left in the queue.
+        """
+        entries = load_repair_queue(queue_path)
+        remaining = []
+        for index, entry in enumerate(entries, start=1):
+            pages = "all pages" if entry['pages'] is None else f"pages {entry['pages']}"
+            print(f"[{index}/{len(entries)}] Repairing {os.path.basename(entry['path'])} ({pages})...")
+            try:
+                repaired = self.repair(entry)
+            except Exception as e:
+                logger.error(f"Error repairing {entry['path']}: {e}")
+                repaired = False
+            if not repaired:
+                remaining.append(entry)
+        save_repair_queue(remaining, queue_path)
+        return len(entries) - len(remaining), len(remaining)
+
+    def repair(self, entry):
+        """
+        Repair an archive of the repair queue.
+
+        Args:
+            entry (dict): The entry written by the audit.
+
+        Returns:
+            bool: True if the archive was rewritten with valid pages, False otherwise.
+        """
+        chapter_link = entry['chapter_link'] or self.find_chapter_link(entry)
+        if not chapter_link:
+            logger.error(f"No chapter link recorded in {entry['path']} nor in the cached chapter lists. "
+                         f"Delete it and download the chapter again.")
+            return False
+        entry['chapter_link'] = chapter_link
+        # The pages are downloaded again in the quality of the archive, so it is not mixed
+        pages = dict(self.manga_downloader.resolve_chapter_pages(chapter_link, entry.get('quality', Config.QUALITY_ORIGINAL)))
+        if not pages:
+            logger.error(f"No pages found for {entry['chapter_link']}, {entry['path']} is left as is.")
+            return False
+
+        bad_pages = set(pages) if entry['pages'] is None else set(entry['pages'])
+        replacements = self.download_pages({page_number: pages.get(page_number) for page_number in bad_pages})
+        if len(replacements) < len(bad_pages):
+            logger.error(f"Pages {sorted(bad_pages - replacements.keys())} of {entry['path']} could not be downloaded again.")
+            return False
+        self.rewrite_archive(entry, replacements, keep_existing=entry['pages'] is not None)
+        return True
+
+    def find_chapter_link(self, entry):
+        """
+        Find the link of a chapter in the cached chapter lists, for archives whose comment is missing.
+
+        Args:
+            entry (dict): The entry of the repair queue.
+
+        Returns:
+            str: The link of the chapter, None if no cached list has it.
+        """
+        if self._cached_links is None:
+            # (series folder, chapter number) -> link of every cached chapter, read once per repair
+            self._cached_links = {}
+            cache_dir = self.manga_downloader.chapter_cache.cache_dir
+            for filename in os.listdir(cache_dir) if os.path.isdir(cache_dir) else []:
+                try:
+                    with open(os.path.join(cache_dir, filename), encoding='utf-8') as cache_file:
+                        cached = json.load(cache_file)
+                except (OSError, ValueError):
+                    continue
+                if not cached.get('title'):
+                    continue
+                series = self.file_operations.sanitize_folder_name(cached['title'])
+                for chapter in cached.get('chapters', []):
+                    self._cached_links.setdefault((series, str(chapter['chapter_number'])), chapter['chapter_link'])
+        return self._cached_links.get((entry['series'], entry['chapter_number']))
+
+    def download_pages(self, page_urls):
+        """
+        Download pages in the shared download pool.
+
+        Args:
+            page_urls (dict): The URL of every page number, None for pages the chapter no longer has.
+
+        Returns:
+            dict: The content of every page downloaded as a valid image, by page number.
+        """
+        futures = {page_number: self.file_operations.download_executor.submit(self.file_operations.download_image, url)
+                   for page_number, url in page_urls.items() if url}
+        replacements = {}
+        for page_number, future in futures.items():
+            img_data = future.result()
+            if img_data and detect_image_extension(img_data, default=None):
+                replacements[page_number] = img_data
+        return replacements
+
+    def rewrite_archive(self, entry, replacements, keep_existing=True):
+        """
+        Write the archive again with the downloaded pages in place of the bad ones.
+
+        Args:
+            entry (dict): The entry of the repair queue.
+            replacements (dict): The downloaded pages, by page number.
+            keep_existing (bool): Copy the good pages of the current archive, False when it cannot be read.
+        """
+        cbz_writer = StreamingCbzWriter(entry['path'], self.file_operations.get_screenshot_filename,
+                                        entry['series'], entry['chapter_number'], entry['chapter_link'],
+                                        entry.get('quality', Config.QUALITY_ORIGINAL))
+        with cbz_writer:
+            existing = zipfile.ZipFile(entry['path']) if keep_existing else None
+            try:
+                members = self.list_pages(existing) if existing else {}
+                for page_number in sorted(members.keys() | replacements.keys()):
+                    if page_number in replacements:
+                        for _, img_data, extension in self.file_operations.prepare_pages([(page_number, replacements[page_number])]):
+                            cbz_writer.add_page(page_number, img_data, extension)
+                    else:
+                        # Good pages are copied one at a time
+                        img_data = existing.read(members[page_number])
+                        cbz_writer.add_page(page_number, img_data, detect_image_extension(img_data))
+            finally:
+                if existing:
+                    existing.close()
+        self.file_operations.library_index.record_chapter(entry['series'], entry['chapter_number'], entry['path'], cbz_writer.page_count,
+                                                          quality=cbz_writer.quality)
+        logger.info(f"Repaired {entry['path']}: {len(replacements)} pages downloaded again")
+
+    def list_pages(self, cbz_file):
+        # Page number -> member name of the pages of the archive
+        recorded_pages = (read_archive_metadata(cbz_file) or {}).get('pages') or {}
+        members = {}
+        for info in cbz_file.infolist():
+            page_number = get_page_number(info.filename, recorded_pages.get(info.filename))
+            if not info.is_dir() and page_number is not None:
+                members.setdefault(page_number, info.filename)
+        return members
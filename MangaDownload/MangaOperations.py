@@ -1,18 +1,39 @@
-import json, time, os, re
+import os
+import re
+import threading
+import time
+from itertools import takewhile
 from selenium.webdriver.common.by import By
-from selenium.common.exceptions import NoSuchElementException, TimeoutException
-from concurrent.futures import ThreadPoolExecutor
 from Config.config import Config, ScriptConfig
+from MangaDownload.ChapterResolvers import create_chapter_resolvers
+from MangaDownload.ChapterCache import ChapterListCache
+from MangaDownload.ChapterFeed import ChapterFeed
 from MangaDownload.FileOperations import FileOperations
 from MangaDownload.WebInteractions import WebInteractions
-from MangaDownload.WebInteractions import logger
+from MangaDownload.DownloadLogger import logger
+from MangaDownload import Metrics
 from MangaFetch.FetchOperations import fetch_and_process_manga_cards
 
 class MangaDownloader:
 
-    def __init__(self, web_interactions=None, file_operations=None):
+    def __init__(self, web_interactions=None, file_operations=None, resolvers=None, driver_pool=None, chapter_cache=None,
+                 headless=False):
         self._web_interactions = web_interactions
+        # Start the browser without a window if it has to be created by the MangaDownloader
+        self.headless = headless
+        # Language of the chapters to download, as shown in the title of the chapter flags
+        self.language = Config.DEFAULT_LANGUAGE
+        # Quality of the pages to download, a series keeps the quality of the chapters it already has
+        self.set_quality(os.getenv("QUALITY", Config.DEFAULT_QUALITY))
+        # Quality chosen for every series during the run
+        self._series_quality = {}
+        self._series_quality_lock = threading.Lock()
         self._file_operations = file_operations
+        self._resolvers = resolvers
+        self._chapter_feed = None
+        self.chapter_cache = chapter_cache or ChapterListCache()
+        # Pool of browsers leased per chapter, the chapters are resolved with the shared browser without it
+        self.driver_pool = driver_pool
         self.save_path = os.getenv("SAVE_PATH", Config.DEFAULT_SAVE_PATH)
         if not os.path.isdir(self.save_path):
             raise ValueError(f"Invalid save path: {self.save_path}")
@@ -20,32 +41,154 @@ class MangaDownloader:
     @property
     def web_interactions(self):
         if not self._web_interactions:
-            self._web_interactions = WebInteractions()
+            self._web_interactions = WebInteractions(headless=self.headless)
         return self._web_interactions
 
     @property
     def file_operations(self):
         if not self._file_operations:
-            self._file_operations = FileOperations(self.web_interactions)
+            self._file_operations = FileOperations(self._web_interactions, headless=self.headless)
         return self._file_operations
 
+    @property
+    def chapter_feed(self):
+        if not self._chapter_feed:
+            # The feed shares the rate limit of the API with the API chapter resolver
+            self._chapter_feed = ChapterFeed(self.file_operations.transport)
+        return self._chapter_feed
+
+    def set_language(self, language):
+        """
+        Set the language of the chapters to download.
+
+        Args:
+            language (str): A language code (e.g. "en") or the language name shown on MangaDex (e.g. "English").
+        """
+        self.language = Config.LANGUAGE_NAMES.get(language, language)
+
+    def set_quality(self, quality):
+        """
+        Set the quality of the pages to download.
+
+        Args:
+            quality (str): "original", "data-saver" or "data-saver-with-fallback".
+        """
+        if quality not in Config.QUALITY_TIERS:
+            raise ValueError(f"Unknown quality '{quality}'. Expected one of {Config.QUALITY_TIERS}.")
+        self.quality = quality
+
+    def get_series_quality(self, series_name):
+        """
+        Get the quality of the pages of a series: the one of its saved chapters, or the one chosen earlier in the run.
+
+        Args:
+            series_name (str): The name of the manga series.
+
+        Returns:
+            str: "original" or "data-saver", None if the series has no quality yet.
+        """
+        with self._series_quality_lock:
+            if series_name not in self._series_quality:
+                saved_quality = self.file_operations.get_series_quality(series_name)
+                if not saved_quality:
+                    return None
+                if saved_quality != self.quality and not (saved_quality == Config.QUALITY_DATA_SAVER and self.quality == Config.QUALITY_DATA_SAVER_WITH_FALLBACK):
+                    logger.warning(f"{series_name} is saved in {saved_quality} quality, its chapters are downloaded in {saved_quality} "
+                                   f"instead of {self.quality} so the two are not mixed.")
+                self._series_quality[series_name] = saved_quality
+            return self._series_quality[series_name]
+
+    def lock_series_quality(self, series_name, quality):
+        # The first chapter resolved sets the quality of a new series, the later ones follow it
+        with self._series_quality_lock:
+            return self._series_quality.setdefault(series_name, quality)
+
+    def get_chapter_cache_key(self, link):
+        # Chapter lists of other languages than the default one are cached separately
+        return link if self.language == Config.DEFAULT_LANGUAGE else f"{link}#{self.language}"
+
+    def get_series_title(self, link):
+        """
+        Get the title of a series from its cached chapter list, or from its page.
+
+        Args:
+            link (str): The URL of the manga.
+
+        Returns:
+            str: The title of the series, None if it could not be found.
+        """
+        cached = self.chapter_cache.load(self.get_chapter_cache_key(link))
+        if cached and cached.get('title'):
+            return cached['title']
+        if not self.web_interactions.navigate(link, wait_condition=1):
+            return None
+        return self.read_page_title()
+
+    def read_page_title(self):
+        # The title of a manga page is "<title> - MangaDex"
+        title = self.web_interactions.driver.title or ''
+        return title.rsplit(' - MangaDex', 1)[0].strip() or None
+
+    @property
+    def resolvers(self):
+        if not self._resolvers:
+            # The browser is only started if the Selenium resolver is actually used
+            self._resolvers = create_chapter_resolvers(self._web_interactions, driver_pool=self.driver_pool,
+                                                       session=self.file_operations.transport,
+                                                       page_bodies=self.file_operations.browser_pages, headless=self.headless)
+        return self._resolvers
+
     def print_chapter_info(self, chapter):
         print(f"{chapter['chapter_number']}, {chapter['chapter_name']}, {chapter['chapter_link']}")
 
-    def fetch_chapters(self, link):
+    def fetch_chapters(self, link, refresh=False):
+        """
+        Fetch the chapter list of a series, newest first.
+
+        The list is cached per series. A cached list younger than the TTL is returned as is,
+        otherwise only the chapters newer than the cached ones are collected and merged.
+        The chapters are read from the MangaDex feed, the title page being the fallback.
+
+        Args:
+            link (str): The URL of the manga.
+            refresh (bool): Refresh the list even if the cached one is still fresh.
+
+        Returns:
+            list: The chapters of the series.
+        """
         if not link or not isinstance(link, str):
             logger.error(f"Invalid URL provided: {link}")
             return []
 
+        cache_key = self.get_chapter_cache_key(link)
+        cached = self.chapter_cache.load(cache_key)
+        if not refresh and self.chapter_cache.is_fresh(cached):
+            logger.info(f"Using the cached chapter list of {link}")
+            return cached['chapters']
+        cached_chapters = cached['chapters'] if cached else []
+        known_links = {chapter['chapter_link'] for chapter in cached_chapters}
+
+        if os.getenv("CHAPTER_LIST_SOURCE", Config.CHAPTER_LIST_SOURCE) == "api":
+            new_chapters = self.chapter_feed.fetch_chapters(link, self.language, known_links)
+            if new_chapters is not None:
+                chapters = self.chapter_cache.merge(new_chapters, cached_chapters)
+                self.fill_missing_chapter_numbers(chapters)
+                # The title is read from the page by get_series_title when it is not cached yet
+                self.chapter_cache.save(cache_key, chapters, cached.get('title') if cached else None)
+                return chapters
+            logger.warning(f"Falling back to the title page for the chapters of {link}")
+
         self.web_interactions.navigate(link, wait_condition=1)
         try:
             self.web_interactions.wait_until((By.CLASS_NAME, Config.CHAPTER_CARDS), multiple=True)
-            chapters = self.collect_chapters()
+            new_chapters = self.collect_chapters(known_links)
+            chapters = self.chapter_cache.merge(new_chapters, cached_chapters)
             self.fill_missing_chapter_numbers(chapters)
+            self.chapter_cache.save(cache_key, chapters, self.read_page_title())
             return chapters
         except Exception as e:
             logger.error(f"Error fetching chapters: {e}")
-            return []
+            return cached_chapters
 
     def collect_chapter_cards(self, url):
         """
@@ -55,61 +198,61 @@ class MangaDownloader:
             self.web_interactions.navigate(url)
             # Wait until chapter cards are available
             self.web_interactions.wait_until((By.CLASS_NAME, Config.CHAPTER_CARDS), multiple=True)
-            # Re-fetch chapter cards after ensuring the page is loaded
-            chapter_cards = self.web_interactions.driver.find_elements(By.CLASS_NAME, Config.CHAPTER_CARDS)
-            return self.process_chapter_cards(chapter_cards)
+            return self.extract_chapter_cards()
         except Exception as e:
             logger.error(f"Error collecting chapter cards from {url}: {e}")
             return []
 
-    def collect_chapters(self):
+    def collect_chapters(self, known_links=None):
+        """
+        Collect the chapters of every pagination page, newest first.
+
+        Args:
+            known_links (set): Links of the chapters already known, the pagination stops at the first of them.
+
+        Returns:
+            list: The chapters newer than the known ones.
+        """
+        known_links = known_links or set()
         chapters = []
         while True:
-            chapter_cards = self.web_interactions.driver.find_elements(By.CLASS_NAME, Config.CHAPTER_CARDS)
-            chapters.extend(self.process_chapter_cards(chapter_cards))
-            if not self.web_interactions.click_next_page():
+            page_chapters = self.extract_chapter_cards()
+            new_chapters = list(takewhile(lambda chapter: chapter['chapter_link'] not in known_links, page_chapters))
+            chapters.extend(new_chapters)
+            # Reaching a known chapter means every older chapter is already cached
+            if len(new_chapters) < len(page_chapters) or not self.web_interactions.click_next_page():
                 break
             self.web_interactions.wait_until_page_loaded(1)
         return chapters
 
 
     def fill_missing_chapter_numbers(self, chapters):
-        next_number = len(chapters)
-        for chapter in chapters:
-            if 'chapter_number' not in chapter or chapter['chapter_number'] is None:
-                chapter['chapter_number'] = next_number
-                next_number -= 1
-
-    def process_chapter_cards(self, chapter_cards):
-        with ThreadPoolExecutor() as executor:
-            results = list(filter(None, executor.map(self.extract_chapter_info, chapter_cards)))
-
-        seen = set()
-        return [chapter for chapter in results if chapter['chapter_name'] not in seen and not seen.add(chapter['chapter_name'])]
-
-    def extract_chapter_info(self, chapter):
-        link_element, link_url = self.find_chapter_link(chapter)
-        if not link_element or not link_url:
-            return None
+        # Chapters without a "Ch. N" label (oneshots) are numbered from their id, so their number can never
+        # be the one of a labeled chapter and does not change when new chapters are released
+        for position, chapter in enumerate(reversed(chapters), start=1):
+            if chapter.get('chapter_number') is None:
+                match = re.search(r'/chapter/([0-9a-fA-F-]{36})', chapter.get('chapter_link') or '')
+                chapter['chapter_number'] = f"Oneshot-{match.group(1)[:8] if match else position}"
+
+    def extract_chapter_cards(self):
+        """
+        Extract the chapters of the current pagination page in the language of the downloader.
 
-        return {
-            'chapter_name': link_element.text.strip().split('\n')[0],
-            'chapter_link': link_url
-        }
+        Every card is read by a single script in the browser, instead of several WebDriver
+        requests per card.
 
-    def find_chapter_link(self, chapter):
+        Returns:
+            list: The chapters of the page (name, link, language and number), without duplicated names.
+        """
         try:
-            for link in chapter.find_elements(By.CLASS_NAME, Config.CHAPTER_LINK):
-                img_element = link.find_element(By.TAG_NAME, Config.IMG)
-                if img_element.get_attribute('title') == 'English':
-                    link_url = link.find_element(By.TAG_NAME, Config.HYPERLINK).get_attribute(Config.HREF)
-                    if link_url and not 'mangaplus' in link_url:
-                        return link, link_url
-        except NoSuchElementException as e:
-            logger.error(f"No such element found: {e}")
+            results = self.web_interactions.driver.execute_script(
+                ScriptConfig.chapter_cards_script, f".{Config.CHAPTER_CARDS}", f".{Config.CHAPTER_LINK}", self.language) or []
         except Exception as e:
-            logger.error(f"Error finding chapter link: {e}")
-        return None, None
+            logger.error(f"Error extracting chapter cards: {e}")
+            return []
+
+        seen = set()
+        return [chapter for chapter in results if chapter['chapter_name'] not in seen and not seen.add(chapter['chapter_name'])]
 
     def download_images_from_chapter(self, manga_chapter):
         try:
@@ -118,101 +261,77 @@ class MangaDownloader:
                 logger.info(f"Chapter {chapter_number} already exists for {series_name}. Skipping download.")
                 return
 
-            self.navigate_to_chapter(chapter_link)
-            self.process_chapter(series_name, chapter_number)
+            self.process_chapter(chapter_link, series_name, chapter_number)
         except Exception as e:
             logger.critical(f"Critical error during download: {e}")
 
-    def navigate_to_chapter(self, chapter_link):
-        self.web_interactions.navigate(chapter_link)
-        self.inject_network_monitoring_js()
-        for _ in range(3):
-            try:
-                self.web_interactions.wait_until_element_loaded('class_name', 'overflow-x-auto.flex.items-center.h-full')
-                self.wait_for_network_idle()
-                break
-            except TimeoutException:
-                logger.warning("Timeout occurred. Retrying...")
-                time.sleep(2)
-        else:
-            logger.error("Failed to navigate to chapter after multiple attempts.")
-
-    def inject_network_monitoring_js(self):
-        self.web_interactions.driver.execute_script(ScriptConfig.javascript_network_script)
-
-    def wait_for_network_idle(self, timeout=30, poll_frequency=0.5):
-        end_time = time.time() + timeout
-        while time.time() < end_time:
-            active_requests = self.web_interactions.driver.execute_script("return window.getActiveRequests();")
-            if active_requests == 0:
-                return True
-            time.sleep(poll_frequency)
-        return False
-
-    def process_chapter(self, series_name, chapter_number):
+    def resolve_chapter_pages(self, chapter_link, quality=Config.QUALITY_ORIGINAL):
+        """
+        Resolve the page URLs of a chapter, trying each resolver in order until one returns pages.
+
+        Args:
+            chapter_link (str): The link of the chapter.
+            quality (str): The quality of the pages, "original" or "data-saver".
+
+        Returns:
+            list: A list of tuples containing page numbers and URLs.
+        """
+        for resolver in self.resolvers:
+            start_time = time.perf_counter()
+            pages = resolver.resolve(chapter_link, quality)
+            Metrics.chapter_resolve_seconds.observe(time.perf_counter() - start_time, resolver=resolver.name)
+            Metrics.chapters_resolved.inc(resolver=resolver.name, outcome="pages" if pages else "empty")
+            if pages:
+                return pages
+            logger.warning(f"The {resolver.name} resolver found no pages for {chapter_link}.")
+        return []
+
+    def resolve_series_chapter(self, chapter_link, series_name):
+        """
+        Resolve the pages of a chapter in the quality of its series.
+
+        A series without saved chapters gets the quality of the downloader. With "data-saver-with-fallback",
+        a new series whose first chapter has no data saver pages is downloaded in original quality.
+
+        Args:
+            chapter_link (str): The link of the chapter.
+            series_name (str): The name of the manga series.
+
+        Returns:
+            tuple: The (page_number, url) tuples of the chapter and their quality.
+        """
+        quality = self.get_series_quality(series_name)
+        if quality:
+            return self.resolve_chapter_pages(chapter_link, quality), quality
+
+        quality = Config.QUALITY_ORIGINAL if self.quality == Config.QUALITY_ORIGINAL else Config.QUALITY_DATA_SAVER
+        pages = self.resolve_chapter_pages(chapter_link, quality)
+        if not pages and self.quality == Config.QUALITY_DATA_SAVER_WITH_FALLBACK:
+            logger.warning(f"No data saver pages for {chapter_link}, falling back to the original pages.")
+            quality = Config.QUALITY_ORIGINAL
+            pages = self.resolve_chapter_pages(chapter_link, quality)
+        if not pages:
+            return [], quality
+        locked_quality = self.lock_series_quality(series_name, quality)
+        if locked_quality != quality:
+            # Another chapter of the series was resolved first in the other quality
+            return self.resolve_chapter_pages(chapter_link, locked_quality), locked_quality
+        return pages, quality
+
+    def process_chapter(self, chapter_link, series_name, chapter_number):
         try:
-            pages = self.retry_capture_network_logs()
+            pages, quality = self.resolve_series_chapter(chapter_link, series_name)
             if not pages:
                 logger.error(f"Failed to capture any pages for chapter {chapter_number} of {series_name}.")
                 return
-            self.file_operations.save_chapter_pages(series_name, chapter_number, pages)
+            self.file_operations.save_chapter_pages(series_name, chapter_number, pages, chapter_link, quality)
         except Exception as e:
             logger.error(f"Error processing chapter: {e}")
 
-    def retry_capture_network_logs(self, max_attempts=5):
-        pages = []
-        for attempt in range(max_attempts):
-            try:
-                pages = self.capture_network_logs(re.compile(r"^https://.*mangadex\.network/data/.*\.(png|jpg)$"))
-                if pages and pages[0][0] == 1:
-                    break
-                time.sleep(1)
-            except Exception as e:
-                logger.error(f"Error retrying network logs capture: {e}")
-        return pages
-
-    def capture_network_logs(self, png_pattern):
-        try:
-            logs = self.web_interactions.driver.get_log('performance')
-            return sorted(self.extract_png_urls(logs, png_pattern), key=lambda x: x[0])
-        except Exception as e:
-            logger.error(f"Error capturing network logs: {e}")
-            return []
-
-    def extract_png_urls(self, logs, png_pattern):
-        pages = []
-        for log in logs:
-            url = self.extract_url_from_log(log)
-            if url and png_pattern.match(url):
-                page_number = self.extract_page_number(url)
-                if page_number is not None:
-                    pages.append((page_number, url))
-                else:
-                    logger.warning(f"Invalid page number in URL: {url}")
-        return pages
-
-    def extract_url_from_log(self, log):
-        try:
-            return json.loads(log['message']).get('message', {}).get('params', {}).get('response', {}).get('url')
-        except Exception as e:
-            logger.error(f"Error extracting URL from log: {e}")
-            return None
-
-    def extract_page_number(self, url):
-        try:
-            match = re.search(r'/(\d+)-', url)
-            if match:
-                return int(match.group(1))
-            else:
-                logger.warning(f"No valid page number found in URL: {url}")
-        except Exception as e:
-            logger.error(f"Error extracting page number from URL {url}: {e}")
-        return None
-
 
-    def search_and_select_manga(self):
+    def search_and_select_manga(self, manga_name=None):
         try:
-            mangas = self.fetch_and_process_manga_cards(self.prompt_manga_name())
+            mangas = self.fetch_and_process_manga_cards(manga_name or self.prompt_manga_name())
             if not mangas:
                 print("No manga found. Please try again.")
                 return self.search_and_select_manga()
@@ -232,7 +351,7 @@ class MangaDownloader:
             logger.error(f"Error searching and selecting manga: {e}")
 
     def prompt_manga_name(self):
-        return input("Enter the name of the manga: ")
+        return input(Config.MANGA_NAME_PROMPT)
 
     def fetch_and_process_manga_cards(self, manga_name):
         return fetch_and_process_manga_cards(self.web_interactions.driver, manga_name)
@@ -0,0 +1,376 @@
+import bisect
+import json
+import os
+import threading
+import time
+from Config.config import Config
+
+# Latency buckets in seconds, from a fast CDN hit to a page loaded by the browser
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class Counter:
+    """
+    Monotonic counter, optionally split by labels.
+    """
+    kind = "counter"
+
+    def __init__(self, name, description, label_names=()):
+        self.name = name
+        self.description = description
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        # (suffix, labels, value) of every series of the metric
+        with self._lock:
+            return [("", dict(zip(self.label_names, key)), value) for key, value in self._values.items()]
+
+    def snapshot(self):
+        return {format_labels(labels) or 'total': value for _, labels, value in self.samples()}
+
+
+class Gauge(Counter):
+    """
+    Value that can go up and down, optionally split by labels.
+    """
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.label_names)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram:
+    """
+    Distribution of observed values in cumulative buckets, as exposed by Prometheus.
+    """
+    kind = "histogram"
+
+    def __init__(self, name, description, buckets=DEFAULT_BUCKETS, label_names=()):
+        self.name = name
+        self.description = description
+        self.buckets = tuple(sorted(buckets))
+        self.label_names = tuple(label_names)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.label_names)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {'counts': [0] * (len(self.buckets) + 1), 'sum': 0.0, 'count': 0}
+            series['counts'][bisect.bisect_left(self.buckets, value)] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    def time(self, **labels):
+        # Context manager observing the duration of its block
+        return _Timer(self, labels)
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            for key, series in self._series.items():
+                labels = dict(zip(self.label_names, key))
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float('inf'),), series['counts']):
+                    cumulative += count
+                    samples.append(("_bucket", {**labels, 'le': format_bound(bound)}, cumulative))
+                samples.append(("_sum", labels, series['sum']))
+                samples.append(("_count", labels, series['count']))
+        return samples
+
+    def quantile(self, q, **labels):
+        """
+        Estimate a quantile from the buckets, as histogram_quantile does.
+
+        Args:
+            q (float): The quantile, between 0 and 1.
+            **labels: The labels of the series.
+
+        Returns:
+            float: The estimated value, None if nothing was observed.
+        """
+        key = tuple(str(labels.get(name, '')) for name in self.label_names)
+        with self._lock:
+            series = self._series.get(key)
+            if not series or not series['count']:
+                return None
+            counts = list(series['counts'])
+            total = series['count']
+        rank = q * total
+        cumulative = 0
+        lower = 0.0
+        for bound, count in zip(self.buckets + (self.buckets[-1],), counts):
+            if count and cumulative + count >= rank:
+                return lower + (bound - lower) * (rank - cumulative) / count
+            cumulative += count
+            lower = bound
+        return self.buckets[-1]
+
+    def snapshot(self):
+        snapshot = {}
+        with self._lock:
+            keys = list(self._series)
+        for key in keys:
+            labels = dict(zip(self.label_names, key))
+            with self._lock:
+                series = dict(self._series[key])
+            snapshot[format_labels(labels) or 'total'] = {
+                'count': series['count'],
+                'sum': series['sum'],
+                'p50': self.quantile(0.5, **labels),
+                'p95': self.quantile(0.95, **labels),
+                'p99': self.quantile(0.99, **labels),
+            }
+        return snapshot
+
+
+class _Timer:
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start_time = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.histogram.observe(time.perf_counter() - self.start_time, **self.labels)
+        return False
+
+
+def format_bound(bound):
+    return "+Inf" if bound == float('inf') else repr(float(bound))
+
+
+def format_labels(labels):
+    return ",".join(f'{name}="{value}"' for name, value in labels.items() if value != '')
+
+
+class MetricsRegistry:
+    """
+    The metrics of the downloader, rendered in the Prometheus text format or as a JSON snapshot.
+    """
+    def __init__(self):
+        self.started_at = time.time()
+        self._metrics = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, description, label_names=()):
+        return self.register(Counter(name, description, label_names))
+
+    def gauge(self, name, description, label_names=()):
+        return self.register(Gauge(name, description, label_names))
+
+    def histogram(self, name, description, buckets=DEFAULT_BUCKETS, label_names=()):
+        return self.register(Histogram(name, description, buckets, label_names))
+
+    def add_collector(self, collector):
+        # Function refreshing gauges from another component (e.g. the rate controller) before every export
+        with self._lock:
+            self._collectors.append(collector)
+        return collector
+
+    def remove_collector(self, collector):
+        # Stop collecting from a component that was closed
+        with self._lock:
+            if collector in self._collectors:
+                self._collectors.remove(collector)
+
+    def collect(self):
+        with self._lock:
+            collectors = list(self._collectors)
+            metrics = list(self._metrics.values())
+        for collector in collectors:
+            try:
+                collector()
+            except Exception:
+                pass
+        return metrics
+
+    def render_prometheus(self):
+        """
+        Render every metric in the Prometheus text exposition format.
+
+        Returns:
+            str: The metrics, one sample per line.
+        """
+        lines = []
+        for metric in self.collect():
+            lines.append(f"# HELP {metric.name} {metric.description}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for suffix, labels, value in metric.samples():
+                label_text = format_labels(labels)
+                lines.append(f"{metric.name}{suffix}{{{label_text}}} {value}" if label_text else f"{metric.name}{suffix} {value}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        """
+        Get the metrics as a JSON-serialisable dict, with the page and byte rates of the run.
+
+        Returns:
+            dict: The value of every metric by name, and the run duration and rates.
+        """
+        metrics = {metric.name: metric.snapshot() for metric in self.collect()}
+        elapsed = time.time() - self.started_at
+        pages = sum(metrics.get('manga_pages_downloaded_total', {}).values())
+        page_bytes = sum(metrics.get('manga_page_bytes_total', {}).values())
+        return {
+            'started_at': self.started_at,
+            'elapsed_seconds': elapsed,
+            'pages_per_second': pages / elapsed if elapsed else 0.0,
+            'bytes_per_second': page_bytes / elapsed if elapsed else 0.0,
+            'metrics': metrics,
+        }
+
+    def write_snapshot(self, path):
+        # Write the JSON snapshot atomically, at the end of a run
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path + ".tmp", 'w', encoding='utf-8') as snapshot_file:
+            json.dump(self.snapshot(), snapshot_file, indent=2)
+        os.replace(path + ".tmp", path)
+        return path
+
+
+class MetricsServer:
+    """
+    HTTP server exposing the metrics on /metrics (Prometheus) and /metrics.json in a background thread.
+    """
+    def __init__(self, registry, port, host="127.0.0.1"):
+        """
+        Initialize the MetricsServer instance and start serving.
+
+        Args:
+            registry (MetricsRegistry): The metrics to expose.
+            port (int): The port to listen on, 0 for a random one.
+            host (str): The address to listen on, only the local machine by default.
+        """
+        # http.server is only imported when the endpoint is enabled
+        from http.server import ThreadingHTTPServer
+        self.registry = registry
+        self.server = ThreadingHTTPServer((host, port), create_metrics_handler(registry))
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        self._thread = threading.Thread(target=self.server.serve_forever, name="metrics-server", daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def create_metrics_handler(registry):
+    from http.server import BaseHTTPRequestHandler
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == "/metrics":
+                body, content_type = registry.render_prometheus().encode('utf-8'), "text/plain; version=0.0.4"
+            elif self.path == "/metrics.json":
+                body, content_type = json.dumps(registry.snapshot()).encode('utf-8'), "application/json"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            # Scrapes are not worth a line in the console
+            pass
+
+    return MetricsHandler
+
+
+# Registry shared by every module of the downloader
+registry = MetricsRegistry()
+
+pages_downloaded = registry.counter("manga_pages_downloaded_total", "Pages downloaded.", ("engine",))
+page_bytes = registry.counter("manga_page_bytes_total", "Bytes of the pages downloaded.", ("engine",))
+page_download_seconds = registry.histogram("manga_page_download_seconds", "Download time of a page.", label_names=("engine",))
+page_failures = registry.counter("manga_page_failures_total", "Pages that failed to download, by reason.", ("reason",))
+http_retries = registry.counter("manga_http_retries_total", "Requests retried by the HTTP transport, by host.", ("host",))
+chapters_resolved = registry.counter("manga_chapters_resolved_total", "Chapter resolutions, by resolver and outcome.", ("resolver", "outcome"))
+chapter_resolve_seconds = registry.histogram("manga_chapter_resolve_seconds", "Time spent resolving the pages of a chapter.", label_names=("resolver",))
+chapters_archived = registry.counter("manga_chapters_archived_total", "Chapters saved to a .cbz archive.")
+chapters_incomplete = registry.counter("manga_chapters_incomplete_total", "Chapters kept as a checkpoint because of missing pages.")
+chapter_archive_seconds = registry.histogram("manga_chapter_archive_seconds", "Time spent writing the archive of a chapter.")
+network_idle_seconds = registry.histogram("manga_network_idle_wait_seconds", "Time spent in wait_for_network_idle.", label_names=("outcome",))
+host_concurrency_limit = registry.gauge("manga_host_concurrency_limit", "Current AIMD concurrency limit of a host.", ("host",))
+host_limit_adjustments = registry.counter("manga_host_limit_adjustments_total", "Concurrency limit adjustments of a host.", ("host", "direction"))
+host_throttled_seconds = registry.gauge("manga_host_throttled_seconds", "Time requests waited for a token of a host.", ("host",))
+node_quarantines = registry.counter("manga_node_quarantines_total", "Image nodes quarantined, by host and reason.", ("host", "reason"))
+page_failovers = registry.counter("manga_page_failovers_total", "Pages moved away from a quarantined image node, by target.", ("target",))
+node_latency_seconds = registry.gauge("manga_node_latency_seconds", "Average download time of a page from an image node.", ("host",))
+node_error_rate = registry.gauge("manga_node_error_rate", "Average error rate of an image node.", ("host",))
+node_throughput_bytes = registry.gauge("manga_node_throughput_bytes", "Average bytes per second of the pages of an image node.", ("host",))
+
+
+def watch_rate_controller(rate_controller):
+    """
+    Export the limits and throttled time of a rate controller as gauges.
+
+    Args:
+        rate_controller (HostRateController): The rate controller of the downloads.
+
+    Returns:
+        callable: The collector, to remove from the registry when the rate controller is no longer used.
+    """
+    def collect():
+        for host, stats in rate_controller.stats().items():
+            host_concurrency_limit.set(stats['limit'], host=host)
+            host_throttled_seconds.set(stats['throttled_seconds'], host=host)
+    return registry.add_collector(collect)
+
+
+def watch_node_health(node_health):
+    """
+    Export the health of the image nodes as gauges.
+
+    Args:
+        node_health (NodeHealthTracker): The health tracker of the downloads.
+
+    Returns:
+        callable: The collector, to remove from the registry when the health tracker is no longer used.
+    """
+    def collect():
+        for host, stats in node_health.stats().items():
+            if stats['latency'] is not None:
+                node_latency_seconds.set(stats['latency'], host=host)
+            node_error_rate.set(stats['error_rate'], host=host)
+            if stats['throughput'] is not None:
+                node_throughput_bytes.set(stats['throughput'], host=host)
+    return registry.add_collector(collect)
+
+
+def start_metrics_server(port=None):
+    """
+    Start the metrics endpoint if a port is configured.
+
+    Args:
+        port (int): The port to listen on, METRICS_PORT from the .env file by default.
+
+    Returns:
+        MetricsServer: The running server, None if the endpoint is disabled.
+    """
+    port = port if port is not None else os.getenv("METRICS_PORT", Config.METRICS_PORT)
+    if port in (None, ''):
+        return None
+    return MetricsServer(registry, int(port))
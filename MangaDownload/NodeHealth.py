@@ -0,0 +1,233 @@
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+import requests
+from Config.config import Config
+from MangaDownload.DownloadLogger import logger
+from MangaDownload import Metrics
+
+# The path of a page from its /data/ or /data-saver/ part, the same on every image server
+PAGE_PATH_PATTERN = re.compile(r'/(data|data-saver)/[^/]+/[^/]+$')
+
+
+def get_host(url):
+    return urlsplit(url or '').hostname
+
+
+def replace_base_url(url, base_url):
+    """
+    Move a page URL to another image server.
+
+    Args:
+        url (str): The URL of the page, {baseUrl}/data/{hash}/{filename} or its data saver version.
+        base_url (str): The base URL of the other server.
+
+    Returns:
+        str: The URL of the page on the other server, None if the URL is not an at-home page URL.
+    """
+    match = PAGE_PATH_PATTERN.search(urlsplit(url or '').path)
+    return base_url.rstrip('/') + match.group(0) if match else None
+
+
+class HostHealth:
+    """
+    Health of an image node, from the outcome of the pages downloaded from it.
+    """
+    def __init__(self, host, smoothing=Config.NODE_HEALTH_SMOOTHING):
+        """
+        Initialize the HostHealth instance.
+
+        Args:
+            host (str): The host of the node.
+            smoothing (float): The weight of the last download in the moving averages.
+        """
+        self.host = host
+        self.smoothing = smoothing
+        self.latency = None          # EWMA of the download time of a page
+        self.error_rate = 0.0        # EWMA of the failures, 1 when every download fails
+        self.throughput = None       # EWMA of the bytes per second of the successful downloads
+        self.samples = 0
+        self.consecutive_failures = 0
+        self.quarantined_until = 0.0
+        self.quarantines = 0
+        self.successes = 0
+        self.failures = 0
+
+    def record(self, success, latency, size=0):
+        alpha = self.smoothing
+        self.samples += 1
+        self.latency = latency if self.latency is None else (1 - alpha) * self.latency + alpha * latency
+        self.error_rate = (1 - alpha) * self.error_rate + alpha * (0.0 if success else 1.0)
+        if success:
+            self.successes += 1
+            self.consecutive_failures = 0
+            if latency > 0:
+                rate = size / latency
+                self.throughput = rate if self.throughput is None else (1 - alpha) * self.throughput + alpha * rate
+        else:
+            self.failures += 1
+            self.consecutive_failures += 1
+
+    def release(self):
+        # Back from quarantine on probation: the averages are rebuilt from the next downloads
+        self.quarantined_until = 0.0
+        self.samples = 0
+        self.error_rate = 0.0
+        self.consecutive_failures = 0
+        self.latency = None
+
+
+class NodeHealthTracker:
+    """
+    Per-host health of the MangaDex@Home image nodes, shared by every download engine.
+
+    A node failing several pages in a row, or whose error rate or latency stays too high, is
+    quarantined for a cooldown. The pages it still has to serve are then downloaded from another
+    node instead of each one waiting out the timeout.
+    """
+    def __init__(self, quarantine_seconds=Config.NODE_QUARANTINE_SECONDS, max_quarantine_seconds=Config.NODE_MAX_QUARANTINE_SECONDS,
+                 failure_threshold=Config.NODE_FAILURE_THRESHOLD, max_error_rate=Config.NODE_MAX_ERROR_RATE,
+                 max_latency=Config.NODE_MAX_LATENCY, min_samples=Config.NODE_MIN_SAMPLES, reporter=None):
+        """
+        Initialize the NodeHealthTracker instance.
+
+        Args:
+            quarantine_seconds (float): The cooldown of a node the first time it is quarantined, doubled every time it is quarantined again.
+            max_quarantine_seconds (float): The longest cooldown of a node.
+            failure_threshold (int): The number of pages failing in a row after which a node is quarantined.
+            max_error_rate (float): The error rate above which a node is quarantined.
+            max_latency (float): The average download time of a page, in seconds, above which a node is quarantined.
+            min_samples (int): The number of downloads needed before the error rate and latency are trusted.
+            reporter (NodeReporter): Optional reporter sending the outcome of every download to the at-home network.
+        """
+        self.quarantine_seconds = quarantine_seconds
+        self.max_quarantine_seconds = max_quarantine_seconds
+        self.failure_threshold = failure_threshold
+        self.max_error_rate = max_error_rate
+        self.max_latency = max_latency
+        self.min_samples = min_samples
+        self.reporter = reporter
+        self.hosts = {}
+        self._lock = threading.Lock()
+
+    def record(self, url, success, latency, size=0, cached=False):
+        """
+        Record the outcome of a page download.
+
+        Args:
+            url (str): The URL of the page.
+            success (bool): Whether the page was downloaded as an image.
+            latency (float): The duration of the download in seconds.
+            size (int): The number of bytes downloaded.
+            cached (bool): Whether the node served the page from its cache (X-Cache: HIT).
+        """
+        host = get_host(url)
+        if not host:
+            return
+        if self.reporter:
+            self.reporter.report(url, success, latency, size, cached)
+        with self._lock:
+            health = self.hosts.get(host)
+            if health is None:
+                health = self.hosts[host] = HostHealth(host)
+            health.record(success, latency, size)
+            reason = None if health.quarantined_until else self.get_degradation(health)
+            if reason:
+                health.quarantines += 1
+                cooldown = min(self.max_quarantine_seconds, self.quarantine_seconds * 2 ** (health.quarantines - 1))
+                health.quarantined_until = time.monotonic() + cooldown
+        if reason:
+            Metrics.node_quarantines.inc(host=host, reason=reason)
+            logger.warning(f"Image node {host} quarantined for {cooldown:.0f}s ({reason}), its pages are moved to another node")
+
+    def get_degradation(self, health):
+        # The reason a node should be quarantined, None while it is healthy
+        if health.consecutive_failures >= self.failure_threshold:
+            return "failures"
+        if health.samples < self.min_samples:
+            return None
+        if health.error_rate > self.max_error_rate:
+            return "errors"
+        if health.latency > self.max_latency:
+            return "latency"
+        return None
+
+    def is_quarantined(self, host):
+        with self._lock:
+            health = self.hosts.get(host)
+            if health is None or not health.quarantined_until:
+                return False
+            if time.monotonic() < health.quarantined_until:
+                return True
+            health.release()
+            logger.info(f"Image node {host} is back from quarantine")
+            return False
+
+    def stats(self):
+        """
+        Get the health of every node.
+
+        Returns:
+            dict: The latency, error rate, throughput, download counters and quarantine state of every host.
+        """
+        with self._lock:
+            return {host: {
+                'latency': health.latency,
+                'error_rate': health.error_rate,
+                'throughput': health.throughput,
+                'successes': health.successes,
+                'failures': health.failures,
+                'quarantines': health.quarantines,
+                'quarantined': bool(health.quarantined_until) and time.monotonic() < health.quarantined_until,
+            } for host, health in self.hosts.items()}
+
+    def close(self):
+        if self.reporter:
+            self.reporter.close()
+
+
+class NodeReporter:
+    """
+    Report the outcome of the page downloads to the MangaDex@Home network, as the at-home protocol asks
+    of its clients, so the network stops handing out the nodes that fail.
+
+    Reports are sent in the background and never delay the downloads. The origin server is not reported.
+    """
+    def __init__(self, report_url=Config.NODE_REPORT_URL, session=None, timeout=10):
+        """
+        Initialize the NodeReporter instance.
+
+        Args:
+            report_url (str): The report endpoint of the at-home network.
+            session (requests.Session): The session sending the reports.
+            timeout (int): The timeout of a report in seconds.
+        """
+        self.report_url = report_url
+        self.session = session or requests.Session()
+        self.timeout = timeout
+        # A single worker, the reports are small and their order does not matter
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="node-report")
+
+    def report(self, url, success, latency, size=0, cached=False):
+        if get_host(url) == get_host(Config.MANGADEX_UPLOADS_URL):
+            return
+        self._executor.submit(self.send, {
+            'url': url,
+            'success': success,
+            'bytes': size,
+            'duration': int(latency * 1000),
+            'cached': cached,
+        })
+
+    def send(self, report):
+        try:
+            self.session.post(self.report_url, json=report, timeout=self.timeout)
+        except requests.RequestException as e:
+            logger.debug(f"Error reporting {report['url']} to the at-home network: {e}")
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        self.session.close()
+
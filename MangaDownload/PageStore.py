@@ -0,0 +1,146 @@
+import hashlib
+import os
+import re
+import threading
+from MangaDownload.DownloadLogger import logger
+
+# MangaDex page filenames end with the SHA-256 of the page, e.g. 1-<sha256>.png
+URL_HASH_PATTERN = re.compile(r'-([0-9a-f]{64})\.\w+$')
+
+
+class PageStore:
+    """
+    Content-addressed store of page bodies, keyed by their SHA-256.
+
+    Identical pages (credits, recruitment pages, covers) are kept once however many chapters
+    use them, and a page whose URL embeds a known hash is not downloaded again.
+    """
+    def __init__(self, root):
+        """
+        Initialize the PageStore instance.
+
+        Args:
+            root (str): The folder of the store.
+        """
+        self.root = root
+        self.alias_dir = os.path.join(root, "aliases")
+        os.makedirs(self.alias_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._stats = {
+            'pages': 0,              # Pages referenced by a chapter
+            'page_bytes': 0,         # Bytes of the pages referenced by a chapter
+            'network_skipped': 0,    # Pages found in the store before downloading them
+            'duplicates': 0,         # Pages downloaded but already in the store
+            'stored': 0,             # New blobs written
+            'stored_bytes': 0,       # Bytes of the new blobs
+        }
+
+    def blob_path(self, digest):
+        # Two levels of sub-folders keep the folders small
+        return os.path.join(self.root, digest[:2], digest[2:4], digest)
+
+    def has(self, digest):
+        return os.path.isfile(self.blob_path(digest))
+
+    def get(self, digest):
+        with open(self.blob_path(digest), 'rb') as blob:
+            return blob.read()
+
+    def size(self, digest):
+        return os.path.getsize(self.blob_path(digest))
+
+    def extract_url_hash(self, url):
+        match = URL_HASH_PATTERN.search(url or '')
+        return match.group(1) if match else None
+
+    def lookup_url(self, url):
+        """
+        Find the blob of a page from the hash embedded in its URL, without downloading it.
+
+        Args:
+            url (str): The URL of the page.
+
+        Returns:
+            str: The digest of the stored page, None if it is not in the store.
+        """
+        url_hash = self.extract_url_hash(url)
+        if not url_hash:
+            return None
+        digest = url_hash
+        if not self.has(digest):
+            # The body of some pages does not match the hash of their filename
+            try:
+                with open(os.path.join(self.alias_dir, url_hash), encoding='utf-8') as alias:
+                    digest = alias.read().strip()
+            except OSError:
+                return None
+            if not self.has(digest):
+                return None
+        self.count_page(self.size(digest), network_skipped=True)
+        return digest
+
+    def put(self, img_data, url=None):
+        """
+        Store a page body.
+
+        Args:
+            img_data (bytes): The content of the page.
+            url (str): The URL the page was downloaded from, used to record its hash alias.
+
+        Returns:
+            str: The SHA-256 digest of the page.
+        """
+        digest = hashlib.sha256(img_data).hexdigest()
+        blob_path = self.blob_path(digest)
+        if os.path.isfile(blob_path):
+            self.count_page(len(img_data), duplicate=True)
+        else:
+            os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+            temp_path = f"{blob_path}.{threading.get_ident()}.tmp"
+            with open(temp_path, 'wb') as blob:
+                blob.write(img_data)
+            os.replace(temp_path, blob_path)
+            self.count_page(len(img_data), stored=True)
+
+        url_hash = self.extract_url_hash(url)
+        if url_hash and url_hash != digest:
+            with open(os.path.join(self.alias_dir, url_hash), 'w', encoding='utf-8') as alias:
+                alias.write(digest)
+        return digest
+
+    def count_page(self, size, network_skipped=False, duplicate=False, stored=False):
+        with self._lock:
+            self._stats['pages'] += 1
+            self._stats['page_bytes'] += size
+            self._stats['network_skipped'] += network_skipped
+            self._stats['duplicates'] += duplicate
+            self._stats['stored'] += stored
+            self._stats['stored_bytes'] += size if stored else 0
+
+    def stats(self):
+        """
+        Get the deduplication statistics of the run.
+
+        Returns:
+            dict: The counters, the dedup ratio (referenced bytes / stored bytes) and the bytes saved.
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        stats['bytes_saved'] = stats['page_bytes'] - stats['stored_bytes']
+        if stats['stored_bytes']:
+            stats['dedup_ratio'] = stats['page_bytes'] / stats['stored_bytes']
+        else:
+            # Every page came from the store
+            stats['dedup_ratio'] = float('inf') if stats['page_bytes'] else 1.0
+        return stats
+
+    def report(self):
+        # Log and print the deduplication statistics of the run
+        stats = self.stats()
+        if not stats['pages']:
+            return
+        message = (f"Page store: {stats['pages']} pages, {stats['stored']} new, {stats['network_skipped']} served without downloading, "
+                   f"{stats['duplicates']} duplicates, dedup ratio {stats['dedup_ratio']:.2f}, "
+                   f"{stats['bytes_saved'] / (1024 * 1024):.1f} MiB saved")
+        print(message)
+        logger.info(message)
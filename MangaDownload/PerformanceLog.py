@@ -0,0 +1,124 @@
+import json
+import re
+import time
+from MangaDownload.DownloadLogger import logger
+
+# Only the responses of the image servers and of the at-home endpoint are parsed, every other entry
+# is rejected on its raw string
+RESPONSE_RECEIVED_MARKER = '"Network.responseReceived"'
+IMAGE_HOST_MARKER = 'mangadex.network'
+AT_HOME_MARKER = '/at-home/server/'
+# Original pages are served from /data/, data saver pages from /data-saver/
+PAGE_URL_PATTERN = re.compile(r"^https://.*mangadex\.network/(data|data-saver)/.*\.(png|jpg)$")
+PAGE_NUMBER_PATTERN = re.compile(r'/(\d+)-')
+
+
+class PerformanceLogConsumer:
+    """
+    Incremental reader of the Chrome performance log of a chapter.
+
+    The log buffer is drained between the short waits for the chapter to load, on the thread driving
+    the browser since ChromeDriver runs the commands of a session one at a time, so each entry is read
+    once. Entries are filtered on their raw message before any JSON parsing, so the parsing cost
+    follows the number of pages rather than the volume of the log.
+    """
+    def __init__(self, driver, poll_interval=0.25):
+        """
+        Initialize the PerformanceLogConsumer instance.
+
+        Args:
+            driver (WebDriver): The browser whose performance log is read.
+            poll_interval (float): The number of seconds between two reads of the log while the chapter loads.
+        """
+        self.driver = driver
+        self.poll_interval = poll_interval
+        # Page number -> URL of the original and data saver pages, and URL -> DevTools request id,
+        # accumulated across reads
+        self.pages = {}
+        self.data_saver_pages = {}
+        self.request_ids = {}
+        # DevTools request id of the at-home response fetched by the reader
+        self.at_home_request_id = None
+        self.entries_read = 0
+        self.entries_parsed = 0
+
+    def discard_pending(self):
+        # Drop the entries logged before the chapter, e.g. by the previous chapter of the same browser
+        try:
+            self.driver.get_log('performance')
+        except Exception as e:
+            logger.warning(f"Error clearing the performance log: {e}")
+
+    def drain(self):
+        """
+        Read the new entries of the log and record the pages they contain.
+
+        Returns:
+            int: The number of pages known so far.
+        """
+        try:
+            entries = self.driver.get_log('performance')
+        except Exception as e:
+            logger.error(f"Error capturing network logs: {e}")
+            return self.page_count()
+        self.entries_read += len(entries)
+        for entry in entries:
+            message = entry.get('message', '')
+            if RESPONSE_RECEIVED_MARKER in message and (IMAGE_HOST_MARKER in message or AT_HOME_MARKER in message):
+                self.record_response(message)
+        return self.page_count()
+
+    def page_count(self):
+        # The reader loads either the original or the data saver pages, depending on its settings
+        return max(len(self.pages), len(self.data_saver_pages))
+
+    def record_response(self, message):
+        self.entries_parsed += 1
+        try:
+            params = json.loads(message).get('message', {}).get('params', {})
+        except ValueError as e:
+            logger.error(f"Error extracting URL from log: {e}")
+            return
+        url = params.get('response', {}).get('url')
+        if url and AT_HOME_MARKER in url:
+            self.at_home_request_id = params.get('requestId')
+            return
+        page_match = PAGE_URL_PATTERN.match(url or '')
+        if not page_match:
+            return
+        match = PAGE_NUMBER_PATTERN.search(url)
+        if not match:
+            logger.warning(f"No valid page number found in URL: {url}")
+            return
+        pages = self.pages if page_match.group(1) == 'data' else self.data_saver_pages
+        pages[int(match.group(1))] = url
+        if params.get('requestId'):
+            self.request_ids[url] = params['requestId']
+
+    def wait_for_pages(self, expected=None, timeout=5):
+        """
+        Wait until the pages of the chapter are in the log, reading it every poll interval.
+
+        Args:
+            expected (int): The number of pages of the chapter, None to only wait for the first page.
+            timeout (float): The maximum number of seconds to wait.
+
+        Returns:
+            bool: True if the pages were found, False on timeout.
+        """
+        def found():
+            return self.page_count() >= expected if expected else 1 in self.pages or 1 in self.data_saver_pages
+
+        deadline = time.monotonic() + timeout
+        self.drain()
+        while not found():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            time.sleep(min(self.poll_interval, remaining))
+            self.drain()
+        return True
+
+    def sorted_pages(self, data_saver=False):
+        # The (page_number, url) tuples of the original or data saver pages found so far, in page order
+        return sorted((self.data_saver_pages if data_saver else self.pages).items())
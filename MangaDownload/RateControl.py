@@ -0,0 +1,278 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from Config.config import Config
+from MangaDownload.DownloadLogger import logger
+from MangaDownload import Metrics
+
+
+class TokenBucket:
+    """
+    Token bucket limiting the request rate to a host, shared by every worker.
+    """
+    def __init__(self, rate, burst):
+        """
+        Initialize the TokenBucket instance.
+
+        Args:
+            rate (float): The number of requests allowed per second.
+            burst (int): The number of requests that can be sent at once after an idle period.
+        """
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated_at = time.monotonic()
+        self.throttled_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """
+        Take a token, going into debt if there is none left.
+
+        Returns:
+            float: The number of seconds to wait before sending the request.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            self.tokens -= 1
+            delay = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            self.throttled_seconds += delay
+            return delay
+
+    def acquire(self):
+        # Block the calling thread until the request can be sent
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+
+class AimdLimiter:
+    """
+    Concurrency limit of a host adjusted with additive increase / multiplicative decrease.
+
+    The limit grows by about one slot per round of successful requests while the latency stays
+    close to the best latency seen, and is cut when the host answers 429/5xx or times out.
+    """
+    def __init__(self, host, initial=Config.AIMD_INITIAL_LIMIT, minimum=Config.AIMD_MIN_LIMIT, maximum=Config.AIMD_MAX_LIMIT,
+                 decrease_factor=Config.AIMD_DECREASE_FACTOR, latency_tolerance=Config.AIMD_LATENCY_TOLERANCE, on_adjust=None):
+        """
+        Initialize the AimdLimiter instance.
+
+        Args:
+            host (str): The host the limit applies to.
+            initial (int): The starting concurrency limit.
+            minimum (int): The lowest concurrency limit.
+            maximum (int): The highest concurrency limit.
+            decrease_factor (float): The factor applied to the limit on congestion.
+            latency_tolerance (float): The latency, relative to the best one seen, above which the limit stops growing.
+            on_adjust (callable): Function called with (host, old_limit, new_limit, reason) on every adjustment.
+        """
+        self.host = host
+        self.minimum = minimum
+        self.maximum = max(minimum, maximum)
+        self.limit = float(min(max(initial, minimum), self.maximum))
+        self.decrease_factor = decrease_factor
+        self.latency_tolerance = latency_tolerance
+        self.on_adjust = on_adjust
+        self.in_flight = 0
+        self.latency = None          # EWMA of the request latency
+        self.best_latency = None     # Lowest EWMA seen, the latency of the host when it is not loaded
+        self.last_decrease = 0.0
+        self._condition = threading.Condition()
+        self._waiters = deque()      # (loop, future) of the coroutines waiting for a slot, in arrival order
+
+    def acquire(self):
+        # Wait until a slot is free
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+
+    async def acquire_async(self):
+        """
+        Wait until a slot is free without blocking the event loop.
+
+        The coroutine sleeps on a future until a released slot is handed to it, in arrival order.
+        """
+        with self._condition:
+            if self.in_flight < int(self.limit) and not self._waiters:
+                self.in_flight += 1
+                return
+            loop = asyncio.get_running_loop()
+            waiter = loop.create_future()
+            self._waiters.append((loop, waiter))
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            with self._condition:
+                try:
+                    self._waiters.remove((loop, waiter))
+                    handed_over = False
+                except ValueError:
+                    # The slot was already handed over, unless hand_over will give it back itself
+                    handed_over = waiter.done() and not waiter.cancelled()
+            if handed_over:
+                self.free_slot()
+            raise
+
+    def wake_waiters(self):
+        # Called with the condition held: hand the free slots to the waiting coroutines
+        while self._waiters and self.in_flight < int(self.limit):
+            loop, waiter = self._waiters.popleft()
+            self.in_flight += 1
+            loop.call_soon_threadsafe(self.hand_over, waiter)
+
+    def hand_over(self, waiter):
+        # Runs on the loop of the waiter, which may have been cancelled while its slot was on the way
+        if waiter.cancelled():
+            self.free_slot()
+        else:
+            waiter.set_result(None)
+
+    def free_slot(self):
+        with self._condition:
+            self.in_flight -= 1
+            self.wake_waiters()
+            self._condition.notify_all()
+
+    def release(self, latency, congested):
+        """
+        Free a slot and adjust the limit from the outcome of the request.
+
+        Args:
+            latency (float): The duration of the request in seconds.
+            congested (bool): Whether the host answered 429/5xx or timed out.
+        """
+        if congested:
+            self.free_slot()
+            self.record_congestion()
+            return
+
+        with self._condition:
+            self.in_flight -= 1
+            old_limit = self.limit
+            self.latency = latency if self.latency is None else 0.8 * self.latency + 0.2 * latency
+            self.best_latency = self.latency if self.best_latency is None else min(self.best_latency, self.latency)
+            # A slower host is congested even without errors, hold the limit until it recovers
+            if self.latency <= self.best_latency * self.latency_tolerance:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self.wake_waiters()
+            self._condition.notify_all()
+        self.report_adjustment(old_limit, "healthy")
+
+    def record_congestion(self):
+        # Cut the limit at most once per round trip, the requests already in flight hit the same congestion
+        with self._condition:
+            old_limit = self.limit
+            now = time.monotonic()
+            if now - self.last_decrease > (self.latency or 1.0):
+                self.limit = max(self.minimum, self.limit * self.decrease_factor)
+                self.last_decrease = now
+        self.report_adjustment(old_limit, "congestion")
+
+    def report_adjustment(self, old_limit, reason):
+        # Only the adjustments changing the number of slots are reported
+        if self.on_adjust and int(self.limit) != int(old_limit):
+            self.on_adjust(self.host, int(old_limit), int(self.limit), reason)
+
+
+class HostRateController:
+    """
+    Per-host concurrency limiters and token buckets shared by every download worker.
+    """
+    def __init__(self, rate_limits=None, max_limit=Config.AIMD_MAX_LIMIT):
+        """
+        Initialize the HostRateController instance.
+
+        Args:
+            rate_limits (dict): The (requests per second, burst) of the rate-limited hosts.
+            max_limit (int): The highest concurrency limit of a host.
+        """
+        self.rate_limits = Config.HOST_RATE_LIMITS if rate_limits is None else rate_limits
+        self.max_limit = max_limit
+        self.limiters = {}
+        self.buckets = {}
+        self.adjustments = deque(maxlen=Config.AIMD_ADJUSTMENT_HISTORY)
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def get_limiter(self, host):
+        with self._lock:
+            limiter = self.limiters.get(host)
+            if limiter is None:
+                limiter = self.limiters[host] = AimdLimiter(host, maximum=self.max_limit, on_adjust=self.record_adjustment)
+            return limiter
+
+    def get_bucket(self, host):
+        # Hosts without a published limit have no bucket
+        with self._lock:
+            if host not in self.buckets:
+                rate_limit = self.rate_limits.get(host)
+                self.buckets[host] = TokenBucket(*rate_limit) if rate_limit else None
+            return self.buckets[host]
+
+    def acquire(self, host):
+        """
+        Wait for a token and a concurrency slot of a host.
+
+        Args:
+            host (str): The host of the request.
+        """
+        bucket = self.get_bucket(host)
+        if bucket:
+            bucket.acquire()
+        self.get_limiter(host).acquire()
+
+    async def acquire_async(self, host):
+        """
+        Wait for a token and a concurrency slot of a host without blocking the event loop.
+
+        Args:
+            host (str): The host of the request.
+        """
+        bucket = self.get_bucket(host)
+        if bucket:
+            delay = bucket.reserve()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        await self.get_limiter(host).acquire_async()
+
+    def release(self, host, latency, congested):
+        self.get_limiter(host).release(latency, congested)
+
+    def record_adjustment(self, host, old_limit, new_limit, reason):
+        with self._lock:
+            self.adjustments.append({'time': time.time(), 'host': host, 'from': old_limit, 'to': new_limit, 'reason': reason})
+            counters = self._counters.setdefault(host, {'increases': 0, 'decreases': 0})
+            counters['increases' if new_limit > old_limit else 'decreases'] += 1
+        Metrics.host_limit_adjustments.inc(host=host, direction="increase" if new_limit > old_limit else "decrease")
+        if reason == "congestion":
+            logger.info(f"Concurrency limit of {host} lowered from {old_limit} to {new_limit}")
+
+    def stats(self):
+        """
+        Get the current limits and the adjustments of every host.
+
+        Returns:
+            dict: The limit, requests in flight, latency, adjustment counters and throttled time of every host.
+        """
+        with self._lock:
+            limiters = dict(self.limiters)
+            buckets = dict(self.buckets)
+            counters = {host: dict(values) for host, values in self._counters.items()}
+        stats = {}
+        for host, limiter in limiters.items():
+            bucket = buckets.get(host)
+            stats[host] = {
+                'limit': int(limiter.limit),
+                'in_flight': limiter.in_flight,
+                'latency': limiter.latency,
+                'increases': counters.get(host, {}).get('increases', 0),
+                'decreases': counters.get(host, {}).get('decreases', 0),
+                'rate': bucket.rate if bucket else None,
+                'throttled_seconds': bucket.throttled_seconds if bucket else 0.0,
+            }
+        return stats
@@ -0,0 +1,275 @@
+import json
+import os
+import random
+import re
+import time
+from Config.config import Config
+from MangaDownload.ChapterFeed import extract_manga_id, get_language_code, parse_chapter_number
+from MangaDownload.DownloadLogger import logger
+
+
+class SeriesWatcher:
+    """
+    Long-running watcher downloading the new chapters of subscribed series.
+
+    Every series is checked through the MangaDex feed endpoint, asking only for the chapters updated
+    after its cursor with a conditional request, so an unchanged series costs a single small request.
+    The chapter list is only scraped again when the feed reports new chapters. An updated chapter stays
+    pending in the state until its archive is saved, so a failed download is tried again on the next
+    polls. The polling interval of every series shrinks when it updates and grows when it does not.
+    """
+    FEED_PAGE_SIZE = 100
+
+    def __init__(self, manga_downloader, subscriptions, state_path=Config.WATCH_STATE_PATH, api_url=None):
+        """
+        Initialize the SeriesWatcher instance.
+
+        Args:
+            manga_downloader (MangaDownloader): The downloader of the new chapters.
+            subscriptions (list): The watched series, in the format returned by BatchJobs.load_job_file.
+            state_path (str): The file keeping the cursor, ETag and interval of every series between runs.
+            api_url (str): The base URL of the MangaDex API.
+        """
+        self.manga_downloader = manga_downloader
+        self.subscriptions = subscriptions
+        # Quality of the series whose subscription does not set one
+        self.default_quality = manga_downloader.quality
+        self.state_path = state_path
+        self.api_url = (api_url or os.getenv("MANGADEX_API_URL", Config.MANGADEX_API_URL)).rstrip('/')
+        self.default_interval = int(os.getenv("WATCH_INTERVAL", Config.WATCH_DEFAULT_INTERVAL))
+        self.state = self.load_state()
+
+    def load_state(self):
+        try:
+            with open(self.state_path, encoding='utf-8') as state_file:
+                return json.load(state_file)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable watch state {self.state_path}: {e}")
+            return {}
+
+    def save_state(self):
+        os.makedirs(os.path.dirname(self.state_path) or '.', exist_ok=True)
+        temp_path = self.state_path + ".tmp"
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as state_file:
+                json.dump(self.state, state_file, indent=2)
+            os.replace(temp_path, self.state_path)
+        except OSError as e:
+            logger.error(f"Error saving the watch state: {e}")
+
+    def get_series_state(self, subscription):
+        # Series are keyed by URL and language, the same series can be followed in several languages
+        key = f"{subscription['url']}#{subscription['language']}"
+        series_state = self.state.setdefault(key, {'cursor': None, 'etag': None, 'last_modified': None, 'feed_query': None,
+                                                   'interval': self.default_interval, 'next_poll': 0})
+        # Chapter id -> chapter number and number of attempts of the updated chapters not saved yet
+        series_state.setdefault('pending', {})
+        return series_state
+
+    def extract_manga_id(self, manga_url):
+        return extract_manga_id(manga_url)
+
+    def get_language_code(self, language):
+        return get_language_code(language)
+
+    def build_feed_params(self, subscription, cursor, newest_first=False, offset=0):
+        params = {
+            'translatedLanguage[]': self.get_language_code(subscription['language']),
+            'order[updatedAt]': 'desc' if newest_first else 'asc',
+            'limit': 1 if newest_first else self.FEED_PAGE_SIZE,
+            'offset': offset,
+            'includeFutureUpdates': 0,
+            'includeExternalUrl': 0,
+        }
+        if cursor:
+            # The API expects the timestamp without its timezone
+            params['updatedAtSince'] = cursor[:19]
+        return params
+
+    def fetch_feed(self, manga_id, params, series_state=None):
+        """
+        Fetch a page of the chapter feed of a manga.
+
+        Args:
+            manga_id (str): The id of the manga.
+            params (dict): The query parameters.
+            series_state (dict): The state of the series, whose ETag and Last-Modified make the request conditional.
+
+        Returns:
+            dict: The decoded JSON response, None if the feed did not change since the last request.
+
+        Raises:
+            requests.RequestException: If the request failed.
+        """
+        url = self.api_url + Config.MANGA_FEED_ENDPOINT.format(manga_id)
+        headers = {}
+        if series_state and series_state['feed_query'] == json.dumps(params, sort_keys=True):
+            if series_state['etag']:
+                headers['If-None-Match'] = series_state['etag']
+            if series_state['last_modified']:
+                headers['If-Modified-Since'] = series_state['last_modified']
+        response = self.manga_downloader.file_operations.transport.get(url, params=params, headers=headers)
+        if response.status_code == 304:
+            return None
+        response.raise_for_status()
+        if series_state is not None:
+            series_state['feed_query'] = json.dumps(params, sort_keys=True)
+            series_state['etag'] = response.headers.get('ETag')
+            series_state['last_modified'] = response.headers.get('Last-Modified')
+        return response.json()
+
+    def check_for_updates(self, subscription, series_state):
+        """
+        Find the chapters updated since the cursor of a series and add them to its pending chapters.
+
+        A series without a cursor is only bookmarked: its cursor is set to its latest update and
+        no chapter is returned, the existing chapters being the job of the batch command.
+
+        Args:
+            subscription (dict): The watched series.
+            series_state (dict): The state of the series, whose cursor, validators and pending chapters are updated.
+
+        Returns:
+            set: The ids of the pending chapters, the ones updated after the cursor and the ones not saved by the previous polls.
+        """
+        manga_id = self.extract_manga_id(subscription['url'])
+        if not manga_id:
+            raise ValueError(f"No manga id in {subscription['url']}")
+
+        if not series_state['cursor']:
+            feed = self.fetch_feed(manga_id, self.build_feed_params(subscription, None, newest_first=True))
+            chapters = feed.get('data', []) if feed else []
+            series_state['cursor'] = chapters[0]['attributes']['updatedAt'] if chapters else time.strftime('%Y-%m-%dT%H:%M:%S+00:00', time.gmtime())
+            return set()
+
+        cursor = series_state['cursor']
+        feed = self.fetch_feed(manga_id, self.build_feed_params(subscription, cursor), series_state)
+        if feed is None:
+            return set(series_state['pending'])
+        chapters = feed.get('data', [])
+        offset = len(chapters)
+        while offset < feed.get('total', 0):
+            feed = self.fetch_feed(manga_id, self.build_feed_params(subscription, cursor, offset=offset))
+            if not feed or not feed.get('data'):
+                break
+            chapters.extend(feed['data'])
+            offset += len(feed['data'])
+
+        # updatedAtSince is inclusive, the chapters at the cursor itself were already handled
+        updated = [chapter for chapter in chapters if chapter['attributes']['updatedAt'] > cursor]
+        # The cursor can move past the updated chapters, they stay pending until they are saved
+        for chapter in updated:
+            series_state['pending'].setdefault(chapter['id'], {'chapter': chapter['attributes'].get('chapter'), 'attempts': 0})
+        if updated:
+            series_state['cursor'] = max(chapter['attributes']['updatedAt'] for chapter in updated)
+        return set(series_state['pending'])
+
+    def download_new_chapters(self, subscription, pending):
+        """
+        Refresh the chapter list of a series and download its pending chapters.
+
+        A pending chapter is matched with the chapter list by id, or by number when the list shows
+        the upload of another group. Saved chapters leave the pending ones, the others are tried again
+        on the next polls until WATCH_MAX_ATTEMPTS.
+
+        Args:
+            subscription (dict): The watched series.
+            pending (dict): The pending chapters of the series, by chapter id.
+
+        Returns:
+            int: The number of chapters saved.
+        """
+        for entry in pending.values():
+            entry['attempts'] += 1
+        try:
+            return self.download_pending_chapters(subscription, pending)
+        finally:
+            for chapter_id, entry in list(pending.items()):
+                if entry['attempts'] >= Config.WATCH_MAX_ATTEMPTS:
+                    logger.error(f"Chapter {entry['chapter']} ({chapter_id}) of {subscription['url']} could not be saved "
+                                 f"after {entry['attempts']} attempts, it is no longer tried.")
+                    del pending[chapter_id]
+
+    def download_pending_chapters(self, subscription, pending):
+        self.manga_downloader.set_language(subscription['language'])
+        self.manga_downloader.set_quality(subscription.get('quality') or self.default_quality)
+        chapters = self.manga_downloader.fetch_chapters(subscription['url'], refresh=True) or []
+        series_name = subscription['title'] or self.manga_downloader.get_series_title(subscription['url'])
+        if not series_name:
+            logger.error(f"No title found for {subscription['url']}, skipping its new chapters.")
+            return 0
+
+        pending_numbers = {str(parse_chapter_number(entry['chapter'])): chapter_id for chapter_id, entry in pending.items()
+                           if parse_chapter_number(entry['chapter']) is not None}
+        saved = 0
+        for chapter in chapters:
+            chapter_id = self.extract_chapter_id(chapter['chapter_link'])
+            if chapter_id not in pending:
+                chapter_id = pending_numbers.get(str(chapter['chapter_number']))
+            if chapter_id not in pending:
+                continue
+            # Edited chapters are also reported by the feed, download_images_from_chapter skips the saved ones
+            print(f"New chapter {chapter['chapter_number']} of {series_name}: {chapter['chapter_name']}")
+            self.manga_downloader.download_images_from_chapter((chapter['chapter_link'], series_name, chapter['chapter_number']))
+            if self.manga_downloader.file_operations.check_cbz_file_exist(series_name, chapter['chapter_number']):
+                del pending[chapter_id]
+                saved += 1
+        if pending:
+            logger.warning(f"{len(pending)} chapters of {series_name} are not saved yet, they are tried again on the next poll.")
+        return saved
+
+    def extract_chapter_id(self, chapter_link):
+        match = re.search(r'/chapter/([0-9a-fA-F-]{36})', chapter_link or '')
+        return match.group(1) if match else None
+
+    def schedule_next_poll(self, series_state, updated):
+        # Poll series that update more often, back off from the quiet ones
+        if updated:
+            interval = series_state['interval'] / 2
+        else:
+            interval = series_state['interval'] * 1.5
+        series_state['interval'] = min(max(interval, Config.WATCH_MIN_INTERVAL), Config.WATCH_MAX_INTERVAL)
+        # The jitter keeps the series from being polled in lockstep
+        jitter = random.uniform(1 - Config.WATCH_JITTER, 1 + Config.WATCH_JITTER)
+        series_state['next_poll'] = time.time() + series_state['interval'] * jitter
+
+    def poll(self, subscription):
+        """
+        Check a series and download its new chapters.
+
+        Args:
+            subscription (dict): The watched series.
+
+        Returns:
+            int: The number of new chapters.
+        """
+        series_state = self.get_series_state(subscription)
+        chapter_ids = set()
+        try:
+            chapter_ids = self.check_for_updates(subscription, series_state)
+            if chapter_ids:
+                logger.info(f"{len(chapter_ids)} updated chapters for {subscription['url']}")
+                self.download_new_chapters(subscription, series_state['pending'])
+        except Exception as e:
+            logger.error(f"Error polling {subscription['url']}: {e}")
+        self.schedule_next_poll(series_state, bool(chapter_ids))
+        self.save_state()
+        return len(chapter_ids)
+
+    def run(self, max_polls=None):
+        """
+        Poll the subscriptions forever, each one when its interval has elapsed.
+
+        Args:
+            max_polls (int): Stop after this number of polls, None to run until interrupted.
+        """
+        polls = 0
+        while max_polls is None or polls < max_polls:
+            subscription = min(self.subscriptions, key=lambda sub: self.get_series_state(sub)['next_poll'])
+            delay = self.get_series_state(subscription)['next_poll'] - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            self.poll(subscription)
+            polls += 1
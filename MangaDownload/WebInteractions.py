@@ -10,12 +10,10 @@ from selenium.common.exceptions import (
     TimeoutException,
 )
 from Config.config import Config
-from Config.logs_config import setup_logging
 from Driver.driver_config import driver_setup
 from enum import Enum
 from threading import Lock
-
-logger = setup_logging('manga_download', Config.MANGA_DOWNLOAD_LOG_PATH)
+from MangaDownload.DownloadLogger import logger
 
 class WaitCondition(Enum):
     FIRST_PAGE = 1
@@ -25,19 +23,25 @@ class WebInteractions:
     _instance = None
     _lock = Lock()
 
-    def __new__(cls, *args, **kwargs):
+    def __new__(cls, *args, driver=None, **kwargs):
+        # A WebInteractions wrapping a given driver (e.g. leased from a DriverPool) is not the singleton
+        if driver is not None:
+            return super().__new__(cls)
         with cls._lock:
             if not cls._instance:
-                cls._instance = super().__new__(cls, *args, **kwargs)
+                # object.__new__ takes no arguments, they are handled by __init__
+                cls._instance = super().__new__(cls)
         return cls._instance
 
-    def __init__(self):
+    def __init__(self, driver=None, headless=False):
         if hasattr(self, 'driver'):
             return  # Prevent re-initialization
 
-        self.driver = driver_setup()
+        self.driver = driver or driver_setup(headless=headless)
         self.original_tab_handle = None
         self.last_loaded_img_src = None
+        # Number of pages loaded by this driver
+        self.navigation_count = 0
 
     def is_button_clickable(self, button):
         """
@@ -149,6 +153,7 @@ class WebInteractions:
 
         try:
             self.driver.get(url)
+            self.navigation_count += 1
             if wait_condition:
                 self.wait_until_page_loaded(wait_condition)
             return True
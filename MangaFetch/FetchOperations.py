@@ -1,6 +1,6 @@
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
-from Config.config import Config
+from Config.config import Config, ScriptConfig
 from Config.logs_config import setup_logging
 logger = setup_logging('manga_fetch', Config.MANGA_DOWNLOAD_LOG_PATH)
 
@@ -42,17 +42,17 @@ def wait_for_page_to_load(driver, timeout=5):
     # Wait until the manga cards are present on the page
     WebDriverWait(driver, timeout).until(lambda d: d.find_elements(by=By.CLASS_NAME, value='manga-card'))
 
-def find_manga_cards(driver):
+def extract_manga_cards(driver):
     """
-    Finds all the manga cards on the page.
+    Extracts the title and link of all the manga cards on the page in a single script.
 
     Args:
         driver: The Selenium WebDriver instance.
 
     Returns:
-        A list of WebElements representing the manga cards.
+        list: A list of dictionaries containing the manga title and link.
     """
-    return driver.find_elements(by=By.CLASS_NAME, value='manga-card')
+    return driver.execute_script(ScriptConfig.manga_cards_script, '.manga-card') or []
 
 
 def fetch_manga_cards(driver, manga_name):
@@ -64,72 +64,13 @@ def fetch_manga_cards(driver, manga_name):
         page_number (int): The page number to fetch manga cards from.
 
     Returns:
-        A list of manga cards found on the page.
+        A list of dictionaries containing the title and link of the manga cards found on the page.
     """
     navigate_to_manga_url(driver, format_manga_url(manga_name))  # Navigate to the manga url
     wait_for_page_to_load(driver)  # Wait for the page to load
-    return find_manga_cards(driver)  # Return the manga cards
+    return extract_manga_cards(driver)  # Return the manga cards
 
 
-def get_manga_link(manga_card):
-    """
-    Get the hyperlink of the manga from the given manga card element.
-
-    Args:
-        manga_card (WebElement): The manga card element.
-
-    Returns:
-        str: The hyperlink of the manga.
-    """
-    return manga_card.find_element(by=By.TAG_NAME, value=Config.HYPERLINK).get_attribute(Config.HREF)
-
-
-def get_manga_info_list(manga_card):
-    """
-    Splits the manga card text by newline characters and returns a list of strings.
-
-    Args:
-        manga_card (WebElement): The manga card element.
-
-    Returns:
-        list: A list of strings containing the manga information.
-    """
-    return manga_card.text.split('\n')
-
-
-def create_manga_dict(title, link):
-    """
-    Create a dictionary with manga information.
-
-    Args:
-        title (str): The title of the manga.
-        link (str): The link to the manga.
-        status (str): The status of the manga.
-        desc (str): The description of the manga.
-
-    Returns:
-        dict: A dictionary containing the manga information.
-    """
-    return {
-        'title': title,
-        'link': link,
-    }
-
-def extract_manga_info(manga_card):
-    """
-    Extracts manga information from a manga card.
-
-    Args:
-        manga_card (WebElement): The manga card element.
-
-    Returns:
-        dict: A dictionary containing the manga title, link, status, and description.
-              Returns None if the manga info list is empty.
-    """
-    if manga_info_list := get_manga_info_list(manga_card):
-        return create_manga_dict(manga_info_list[0], get_manga_link(manga_card))
-    return None
-
 def fetch_and_process_manga_cards(driver, manga_name):
     """
     Fetches manga cards for a given manga name and processes them to extract manga info.
@@ -141,5 +82,4 @@ def fetch_and_process_manga_cards(driver, manga_name):
     Returns:
         list: A list of dictionaries containing manga info.
     """
-    return [manga_info for manga_card in fetch_manga_cards(driver, manga_name)
-            if (manga_info := extract_manga_info(manga_card))]
\ No newline at end of file
+    return fetch_manga_cards(driver, manga_name)
\ No newline at end of file
@@ -1,29 +1,201 @@
+import argparse
+import os
+import threading
+from concurrent.futures import Future
 from dotenv import load_dotenv
-from MangaDownload.WebInteractions import WebInteractions
-from MangaDownload.MangaOperations import MangaDownloader
-from MangaDownload.FileOperations import FileOperations
+from Config.config import Config
+from MangaDownload import Metrics
 load_dotenv()
 
-def instantiate_classes():
-    web_interactions = WebInteractions() 
-    file_operations = FileOperations(web_interactions)
-    return MangaDownloader(web_interactions, file_operations)
+# Selenium, requests and Pillow are only imported by the commands that use them, so the first
+# prompt is shown without waiting for them.
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Download manga chapters from MangaDex.")
+    parser.add_argument("command", nargs="?", default="download", choices=["download", "batch", "watch", "reindex", "audit", "repair"],
+                        help="download: search and download a manga (default). batch: download the jobs of a job file without prompting. "
+                             "watch: keep polling the series of a job file and download their new chapters. "
+                             "reindex: rebuild the library index from disk. "
+                             "audit: check every archive of the library and write the repair queue. "
+                             "repair: download again the bad pages of the archives in the repair queue.")
+    parser.add_argument("--jobs", default=None,
+                        help="JSON or YAML job file of the batch and watch commands.")
+    parser.add_argument("--engine", choices=Config.DOWNLOAD_ENGINES, default=None,
+                        help="Download engine used for the pages (overrides DOWNLOAD_ENGINE in the .env file).")
+    parser.add_argument("--transcode", choices=["webp", "jpeg", "avif"], default=None,
+                        help="Re-encode the pages before archiving them (overrides TRANSCODE_FORMAT).")
+    parser.add_argument("--drivers", type=int, default=None,
+                        help="Number of headless browsers resolving chapters in parallel, 0 to use the main browser (overrides DRIVER_POOL_SIZE).")
+    parser.add_argument("--quality", choices=Config.QUALITY_TIERS, default=None,
+                        help="Quality of the pages: original, data-saver, or data-saver-with-fallback to use the original pages "
+                             "of chapters without data saver pages (overrides QUALITY). A series keeps the quality of its saved chapters.")
+    return parser.parse_args()
+
+def create_driver_pool(args):
+    size = args.drivers if args.drivers is not None else int(os.getenv("DRIVER_POOL_SIZE", Config.DRIVER_POOL_SIZE))
+    if size <= 0:
+        return None
+    # The pool starts its browsers lazily, on the first chapter resolved with Selenium
+    from Driver.driver_pool import DriverPool
+    return DriverPool(size=size)
+
+def prewarm_browser(headless=False):
+    """
+    Start the browser and load the download modules in the background.
+
+    Args:
+        headless (bool): Run the browser without opening a window.
+
+    Returns:
+        Future: A future resolving to the WebInteractions instance.
+    """
+    future = Future()
+    def start():
+        try:
+            # Imported for its side effect only: the download modules are loaded while the user types
+            import MangaDownload.MangaOperations  # noqa: F401
+            from MangaDownload.WebInteractions import WebInteractions
+            future.set_result(WebInteractions(headless=headless))
+        except BaseException as e:
+            future.set_exception(e)
+    threading.Thread(target=start, name="browser-prewarm", daemon=True).start()
+    return future
+
+def get_prewarmed_browser(browser):
+    # A failed prewarm is not fatal, the browser is then started when it is first needed
+    try:
+        web_interactions = browser.result()
+    except Exception as e:
+        from MangaDownload.DownloadLogger import logger
+        logger.error(f"Error starting the browser in the background: {e}")
+        return None
+    return web_interactions if getattr(web_interactions, 'driver', None) else None
+
+def instantiate_classes(args, driver_pool=None, headless=False, web_interactions=None):
+    # Without a web_interactions, the browser is only started when a chapter list or page needs it
+    from MangaDownload.MangaOperations import MangaDownloader
+    from MangaDownload.FileOperations import FileOperations
+    file_operations = FileOperations(web_interactions, download_engine=args.engine, transcode_format=args.transcode, headless=headless)
+    manga_downloader = MangaDownloader(web_interactions, file_operations, driver_pool=driver_pool, headless=headless)
+    if args.quality:
+        manga_downloader.set_quality(args.quality)
+    return manga_downloader
+
+def load_jobs(args):
+    from MangaDownload.BatchJobs import load_job_file
+    if not args.jobs:
+        raise ValueError(f"The {args.command} command requires a job file (--jobs FILE).")
+    jobs = load_job_file(args.jobs)
+    if not jobs:
+        raise ValueError(f"The job file {args.jobs} has no jobs.")
+    return jobs
+
+def download_batch(args, driver_pool=None):
+    # Run the jobs of the job file unattended, sharing the browsers and the HTTP pool between them
+    from MangaDownload.BatchJobs import run_batch
+    jobs = load_jobs(args)
+    manga_downloader = instantiate_classes(args, driver_pool, headless=True)
+    try:
+        failed = run_batch(manga_downloader, jobs)
+    finally:
+        manga_downloader.file_operations.close()
+    print(f"Batch finished: {len(jobs) - len(failed)} of {len(jobs)} jobs succeeded.")
+
+def watch_subscriptions(args, driver_pool=None):
+    # Poll the series of the job file until interrupted
+    from MangaDownload.SeriesWatcher import SeriesWatcher
+    subscriptions = load_jobs(args)
+    manga_downloader = instantiate_classes(args, driver_pool, headless=True)
+    print(f"Watching {len(subscriptions)} series. Press Ctrl+C to stop.")
+    try:
+        SeriesWatcher(manga_downloader, subscriptions).run()
+    finally:
+        manga_downloader.file_operations.close()
+
+def reindex_library():
+    # Rebuild the library index without starting a browser
+    from MangaDownload.LibraryIndex import LibraryIndex, rebuild_library_index
+    save_path = os.getenv("SAVE_PATH", Config.DEFAULT_SAVE_PATH)
+    library_index = LibraryIndex(Config.LIBRARY_INDEX_PATH)
+    try:
+        print(f"Indexed {rebuild_library_index(library_index, save_path)} chapters.")
+    finally:
+        library_index.close()
+
+def audit_library():
+    # Check the archives in a process pool, without starting a browser
+    from MangaDownload.LibraryAudit import run_audit
+    save_path = os.getenv("SAVE_PATH", Config.DEFAULT_SAVE_PATH)
+    workers = os.getenv("AUDIT_WORKERS", Config.AUDIT_WORKERS)
+    decode = str(os.getenv("AUDIT_DECODE_IMAGES", Config.AUDIT_DECODE_IMAGES)).lower() not in ("0", "false", "no")
+    summary = run_audit(save_path, max_workers=int(workers) if workers else None, decode=decode)
+    print(f"Audited {summary['archives']} archives: {summary['damaged']} damaged ({summary['unreadable']} unreadable, "
+          f"{summary['bad_pages']} bad pages). Repair queue written to {Config.REPAIR_QUEUE_PATH}.")
+
+def repair_library(args, driver_pool=None):
+    # Download again the bad pages found by the last audit
+    from MangaDownload.LibraryRepair import ArchiveRepairer
+    manga_downloader = instantiate_classes(args, driver_pool, headless=True)
+    try:
+        repaired, remaining = ArchiveRepairer(manga_downloader).repair_queue()
+    finally:
+        manga_downloader.file_operations.close()
+    print(f"Repaired {repaired} archives, {remaining} left in the repair queue.")
+
+def write_metrics_snapshot():
+    # Keep the metrics of the run next to the logs
+    try:
+        print(f"Metrics written to {Metrics.registry.write_snapshot(Config.METRICS_SNAPSHOT_PATH)}")
+    except OSError as e:
+        print(f"Could not write the metrics snapshot: {e}")
 
 def main():
+    driver_pool = None
+    metrics_server = None
+    run_started = False
     try:
-        manga_downloader = instantiate_classes()
-        chapters, series_name = manga_downloader.search_and_select_manga() 
+        args = parse_arguments()
+        if args.command == "reindex":
+            reindex_library()
+            return
+        if args.command == "audit":
+            audit_library()
+            return
+        run_started = True
+        metrics_server = Metrics.start_metrics_server()
+        if metrics_server:
+            print(f"Metrics available on http://127.0.0.1:{metrics_server.port}/metrics")
+        driver_pool = create_driver_pool(args)
+        if args.command == "batch":
+            download_batch(args, driver_pool)
+            return
+        if args.command == "watch":
+            watch_subscriptions(args, driver_pool)
+            return
+        if args.command == "repair":
+            repair_library(args, driver_pool)
+            return
+        # The browser starts while the user types the name of the manga
+        browser = prewarm_browser()
+        manga_name = input(Config.MANGA_NAME_PROMPT)
+        manga_downloader = instantiate_classes(args, driver_pool, web_interactions=get_prewarmed_browser(browser))
+        chapters, series_name = manga_downloader.search_and_select_manga(manga_name)
         if chapters and series_name:
-            for chapter in chapters:
-                manga_downloader.print_chapter_info(chapter)
-                manga_chapter = chapter['chapter_link'], series_name, chapter['chapter_number']
-                manga_downloader.download_images_from_chapter(manga_chapter) 
-    except KeyboardInterrupt as e:
+            from MangaDownload.ChapterPipeline import ChapterPipeline
+            ChapterPipeline(manga_downloader).run(chapters, series_name)
+            manga_downloader.file_operations.close()
+    except KeyboardInterrupt:
         exit(0)
     except Exception as e:
         print(f"An unexpected error occurred: {e}")
     finally:
+        # Quit the pooled browsers, even on KeyboardInterrupt, so no Chrome process is left behind
+        if driver_pool:
+            driver_pool.shutdown()
+        if metrics_server:
+            metrics_server.close()
+        if run_started:
+            write_metrics_snapshot()
         exit()
 if __name__ == "__main__":
     main()
-    
\ No newline at end of file
@@ -0,0 +1,19 @@
+import pytest
+from Config.config import Config
+
+
+@pytest.fixture
+def file_operations(tmp_path, monkeypatch):
+    """
+    FileOperations saving into a temporary library, with its index and caches in a temporary folder.
+    """
+    from MangaDownload.FileOperations import FileOperations
+    save_path = tmp_path / "Mangas"
+    save_path.mkdir()
+    monkeypatch.setenv("SAVE_PATH", str(save_path))
+    monkeypatch.delenv("PAGE_STORE_PATH", raising=False)
+    monkeypatch.delenv("TRANSCODE_FORMAT", raising=False)
+    monkeypatch.setattr(Config, "LIBRARY_INDEX_PATH", str(tmp_path / "Cache" / "library.sqlite3"))
+    file_operations = FileOperations(download_engine="threads")
+    yield file_operations
+    file_operations.close()
@@ -0,0 +1,44 @@
+import os
+import zipfile
+import pytest
+from Benchmarks.fake_cdn import FakeCdn, FakeCdnConfig
+
+
+@pytest.fixture
+def cdn():
+    with FakeCdn(FakeCdnConfig(latency=0, latency_jitter=0, size_median=4 * 1024, size_sigma=0.5)) as cdn:
+        yield cdn
+
+
+def chapter_page_data(cdn, broken_pages=()):
+    # Pages outside /data/ are answered with a 404 by the fake CDN
+    return [("Series", 1, page_number, f"{cdn.base_url}/missing/{page_number}.png" if page_number in broken_pages
+             else cdn.page_url(1, page_number)) for page_number in range(1, 6)]
+
+
+def test_an_interrupted_chapter_only_downloads_its_missing_pages(file_operations, cdn):
+    file_operations.bulk_save_png_links(chapter_page_data(cdn, broken_pages={3}))
+
+    cbz_file_path = file_operations.get_cbz_file_path("Series", 1)
+    assert not os.path.exists(cbz_file_path)
+    checkpoint = file_operations.open_checkpoint("Series", 1)
+    assert sorted(checkpoint.completed) == [1, 2, 4, 5]
+
+    requests_before = cdn.requests
+    file_operations.bulk_save_png_links(chapter_page_data(cdn))
+
+    assert cdn.requests - requests_before == 1
+    assert not os.path.exists(checkpoint.staging_dir)
+    assert file_operations.check_cbz_file_exist("Series", 1)
+
+
+def test_the_archive_holds_every_page_in_order(file_operations, cdn):
+    file_operations.bulk_save_png_links(chapter_page_data(cdn), chapter_link="https://mangadex.org/chapter/1")
+
+    with zipfile.ZipFile(file_operations.get_cbz_file_path("Series", 1)) as cbz_file:
+        names = cbz_file.namelist()
+        bodies = [cbz_file.read(name) for name in names]
+        assert cbz_file.testzip() is None
+
+    assert names == sorted(names)
+    assert bodies == [cdn.page_body(f"/data/1/{page_number}.png") for page_number in range(1, 6)]
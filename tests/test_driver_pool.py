@@ -0,0 +1,109 @@
+import sys
+import threading
+import pytest
+from Driver.driver_pool import DriverPool
+
+
+class FakeDriver:
+    def __init__(self, factory):
+        self.factory = factory
+        self.current_url = "about:blank"
+        self.closed = False
+
+    def quit(self):
+        self.closed = True
+        self.factory.quit()
+
+
+class FakeDriverFactory:
+    """
+    Driver factory counting the browsers started and alive.
+    """
+    def __init__(self):
+        self.created = 0
+        self.alive = 0
+        self.max_alive = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, headless=True):
+        with self._lock:
+            self.created += 1
+            self.alive += 1
+            self.max_alive = max(self.max_alive, self.alive)
+        return FakeDriver(self)
+
+    def quit(self):
+        with self._lock:
+            self.alive -= 1
+
+
+@pytest.mark.parametrize("max_navigations", [10 ** 6, 1])
+def test_pool_never_runs_more_browsers_than_its_size(max_navigations):
+    factory = FakeDriverFactory()
+    # With a navigation limit of 1 every release restarts the browser, racing the waiters for its slot
+    pool = DriverPool(size=1, max_navigations=max_navigations, driver_factory=factory)
+    leases = 0
+    max_leases = 0
+    lock = threading.Lock()
+
+    def worker():
+        nonlocal leases, max_leases
+        for _ in range(200):
+            pooled = pool.acquire()
+            pooled.navigations += 1
+            with lock:
+                leases += 1
+                max_leases = max(max_leases, leases)
+            with lock:
+                leases -= 1
+            pool.release(pooled)
+
+    # Switch threads as often as possible so the waiters interleave with the browser starts
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        threads = [threading.Thread(target=worker) for _ in range(16)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(switch_interval)
+    pool.shutdown()
+
+    assert factory.max_alive == 1
+    assert max_leases == 1
+    if max_navigations > 1:
+        assert factory.created == 1
+
+
+def test_pool_restarts_a_browser_after_its_navigation_limit():
+    factory = FakeDriverFactory()
+    pool = DriverPool(size=1, max_navigations=2, driver_factory=factory)
+    with pool.lease() as pooled:
+        pooled.navigations = 2
+    with pool.lease() as pooled:
+        assert pooled.navigations == 0
+    pool.shutdown()
+
+    assert factory.created == 2
+    assert pooled.driver.closed
+
+
+def test_pool_replaces_a_dead_browser():
+    factory = FakeDriverFactory()
+    pool = DriverPool(size=1, driver_factory=factory)
+    with pool.lease() as pooled:
+        del pooled.driver.current_url
+    with pool.lease() as replacement:
+        assert replacement is not pooled
+    pool.shutdown()
+
+    assert factory.created == 2
+
+
+def test_pool_refuses_leases_after_shutdown():
+    pool = DriverPool(size=1, driver_factory=FakeDriverFactory())
+    pool.shutdown()
+    with pytest.raises(RuntimeError):
+        pool.acquire()
@@ -0,0 +1,51 @@
+from Benchmarks.fake_cdn import FakeCdn, FakeCdnConfig
+from MangaDownload.HttpTransport import HttpTransport
+from MangaDownload.RateControl import HostRateController
+
+
+def test_failed_requests_are_retried_until_they_succeed():
+    config = FakeCdnConfig(latency=0, latency_jitter=0, error_rate=0.3, size_median=1024, size_sigma=0, seed=1)
+    with FakeCdn(config) as cdn:
+        transport = HttpTransport(max_retries=10, backoff_factor=0)
+        try:
+            responses = [transport.get(cdn.page_url(1, page_number)) for page_number in range(1, 21)]
+        finally:
+            transport.close()
+
+    assert [response.status_code for response in responses] == [200] * 20
+    assert cdn.errors > 0
+    assert cdn.requests == 20 + cdn.errors
+    assert transport.stats()['retries'] == cdn.errors
+
+
+def test_retries_stop_after_the_limit_and_cut_the_host_limit():
+    config = FakeCdnConfig(latency=0, latency_jitter=0, error_rate=1.0, size_median=1024, size_sigma=0)
+    with FakeCdn(config) as cdn:
+        rate_controller = HostRateController(rate_limits={}, max_limit=8)
+        transport = HttpTransport(max_retries=2, backoff_factor=0, rate_controller=rate_controller)
+        try:
+            response = transport.get(cdn.page_url(1, 1))
+        finally:
+            transport.close()
+
+    assert response.status_code == 503
+    assert cdn.requests == 3
+    limiter = rate_controller.get_limiter("127.0.0.1")
+    assert int(limiter.limit) < 8
+    assert limiter.in_flight == 0
+
+
+def test_a_streamed_response_holds_its_slot_until_it_is_closed():
+    config = FakeCdnConfig(latency=0, latency_jitter=0, size_median=64 * 1024, size_sigma=0)
+    with FakeCdn(config) as cdn:
+        transport = HttpTransport(max_retries=0)
+        limiter = transport.rate_controller.get_limiter("127.0.0.1")
+        try:
+            with transport.get(cdn.page_url(1, 1), stream=True) as response:
+                assert limiter.in_flight == 1
+                body = b"".join(response.iter_content(chunk_size=8192))
+            assert limiter.in_flight == 0
+        finally:
+            transport.close()
+
+    assert body == cdn.page_body("/data/1/1.png")
@@ -0,0 +1,64 @@
+import os
+import zipfile
+from MangaDownload.LibraryIndex import LibraryIndex, rebuild_library_index
+
+
+def write_archive(path, pages=2):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with zipfile.ZipFile(path, "w") as cbz_file:
+        for page_number in range(pages):
+            cbz_file.writestr(f"{page_number:03}.png", b"\x89PNG\r\n\x1a\n")
+
+
+def test_record_and_list_the_chapters_of_a_series(tmp_path):
+    archive = tmp_path / "Series Chapter 1.cbz"
+    write_archive(str(archive))
+    library_index = LibraryIndex(str(tmp_path / "Cache" / "library.sqlite3"))
+    library_index.record_chapter("Series", 1, str(archive), 2)
+
+    assert library_index.get_chapter_files("Series") == {"1": str(archive)}
+    assert library_index.get_series_quality("Series") == "original"
+
+    library_index.remove_chapters("Series", ["1"])
+    assert not library_index.has_series("Series")
+    library_index.close()
+
+
+def test_rebuild_indexes_every_archive_of_the_library(tmp_path):
+    save_path = tmp_path / "Mangas"
+    write_archive(str(save_path / "A" / "Alpha" / "Alpha Chapter 1.cbz"))
+    write_archive(str(save_path / "A" / "Alpha" / "Alpha Chapter 2.5.cbz"))
+    write_archive(str(save_path / "B" / "Beta" / "Beta Chapter Oneshot-1a2b3c4d.cbz"))
+    library_index = LibraryIndex(str(tmp_path / "library.sqlite3"))
+
+    assert rebuild_library_index(library_index, str(save_path), max_workers=2) == 3
+    assert set(library_index.get_chapter_files("Alpha")) == {"1", "2.5"}
+    assert set(library_index.get_chapter_files("Beta")) == {"Oneshot-1a2b3c4d"}
+    library_index.close()
+
+
+def test_the_index_is_kept_out_of_the_save_path(file_operations):
+    assert not file_operations.library_index.db_path.startswith(file_operations.save_path)
+
+
+def test_existing_chapters_are_indexed_from_the_folder_once(file_operations):
+    write_archive(file_operations.get_cbz_file_path("Series", 1))
+    write_archive(file_operations.get_cbz_file_path("Series", 2))
+
+    assert file_operations.check_cbz_file_exist("Series", 1)
+    assert file_operations.check_cbz_file_exist("Series", "2")
+    assert not file_operations.check_cbz_file_exist("Series", 3)
+    assert set(file_operations.library_index.get_chapter_files("Series")) == {"1", "2"}
+
+
+def test_a_deleted_archive_is_downloaded_again(file_operations):
+    write_archive(file_operations.get_cbz_file_path("Series", 1))
+    write_archive(file_operations.get_cbz_file_path("Series", 2))
+    file_operations.get_existing_chapters("Series")
+    os.remove(file_operations.get_cbz_file_path("Series", 2))
+    # A later run, with the per-series cache empty
+    file_operations._existing_chapters.clear()
+
+    assert file_operations.check_cbz_file_exist("Series", 1)
+    assert not file_operations.check_cbz_file_exist("Series", 2)
+    assert set(file_operations.library_index.get_chapter_files("Series")) == {"1"}
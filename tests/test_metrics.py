@@ -0,0 +1,22 @@
+from MangaDownload import Metrics
+from MangaDownload.RateControl import HostRateController
+
+
+def test_limit_adjustments_are_exported_as_a_counter():
+    controller = HostRateController(rate_limits={})
+    limiter = controller.get_limiter("adjusted.test")
+    limiter.acquire()
+    limiter.release(1.0, congested=True)
+
+    text = Metrics.registry.render_prometheus()
+    assert "# TYPE manga_host_limit_adjustments_total counter" in text
+    assert 'manga_host_limit_adjustments_total{host="adjusted.test",direction="decrease"} 1' in text
+
+
+def test_a_closed_file_operations_is_no_longer_collected(file_operations):
+    collectors = list(file_operations._metrics_collectors)
+    assert all(collector in Metrics.registry._collectors for collector in collectors)
+
+    file_operations.close()
+
+    assert not any(collector in Metrics.registry._collectors for collector in collectors)
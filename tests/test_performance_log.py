@@ -0,0 +1,92 @@
+import json
+import threading
+from contextlib import contextmanager
+from MangaDownload.ChapterResolvers import SeleniumChapterResolver
+from MangaDownload.PerformanceLog import PerformanceLogConsumer
+
+
+def page_response(page_number):
+    url = f"https://node.mangadex.network/data/hash/{page_number}-page.png"
+    message = {'message': {'method': 'Network.responseReceived',
+                           'params': {'requestId': str(page_number), 'response': {'url': url}}}}
+    return {'message': json.dumps(message)}
+
+
+class FakeDriver:
+    """
+    Driver running one command at a time, as ChromeDriver does for a session, and logging the pages
+    loaded by every wait for the chapter.
+    """
+    def __init__(self, waits_before_ready=3, pages_per_wait=2):
+        self.waits_before_ready = waits_before_ready
+        self.pages_per_wait = pages_per_wait
+        self.commands = []
+        self.threads = set()
+        self._log = []
+        self._next_page = 1
+        self._busy = threading.Lock()
+
+    @contextmanager
+    def run(self, command):
+        # A second command while one is running would have to wait for it in ChromeDriver
+        assert self._busy.acquire(blocking=False), "commands sent concurrently on the same session"
+        self.commands.append(command)
+        self.threads.add(threading.get_ident())
+        try:
+            yield
+        finally:
+            self._busy.release()
+
+    def set_script_timeout(self, timeout):
+        pass
+
+    def execute_async_script(self, script, timeout_ms, quiet_ms):
+        with self.run("wait"):
+            for _ in range(self.pages_per_wait):
+                self._log.append(page_response(self._next_page))
+                self._next_page += 1
+            self.waits_before_ready -= 1
+            return {'ready': self.waits_before_ready <= 0, 'active': 0, 'expected': None, 'loaded': self._next_page - 1}
+
+    def get_log(self, log_type):
+        with self.run("log"):
+            entries, self._log = self._log, []
+            return entries
+
+
+class FakeWebInteractions:
+    def __init__(self, driver):
+        self.driver = driver
+
+
+def test_the_log_is_drained_between_the_waits_on_the_same_thread():
+    driver = FakeDriver(waits_before_ready=3, pages_per_wait=2)
+    resolver = SeleniumChapterResolver(FakeWebInteractions(driver))
+    log_consumer = PerformanceLogConsumer(driver, poll_interval=0.01)
+
+    chapter_state = resolver.wait_for_network_idle(timeout=5, log_consumer=log_consumer)
+
+    assert chapter_state['ready']
+    assert driver.commands == ["wait", "log"] * 3
+    assert driver.threads == {threading.get_ident()}
+    assert [page_number for page_number, _ in log_consumer.sorted_pages()] == [1, 2, 3, 4, 5, 6]
+
+
+def test_the_wait_gives_up_at_the_timeout():
+    driver = FakeDriver(waits_before_ready=10 ** 6, pages_per_wait=0)
+    resolver = SeleniumChapterResolver(FakeWebInteractions(driver))
+    log_consumer = PerformanceLogConsumer(driver, poll_interval=0.01)
+
+    chapter_state = resolver.wait_for_network_idle(timeout=0.05, log_consumer=log_consumer)
+
+    assert not chapter_state['ready']
+
+
+def test_only_the_page_responses_are_parsed():
+    driver = FakeDriver()
+    driver._log = [page_response(1), {'message': '{"message": {"method": "Network.requestWillBeSent"}}'}, page_response(2)]
+    log_consumer = PerformanceLogConsumer(driver)
+
+    assert log_consumer.wait_for_pages(expected=2, timeout=1)
+    assert log_consumer.entries_read == 3
+    assert log_consumer.entries_parsed == 2
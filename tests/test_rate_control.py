@@ -0,0 +1,91 @@
+import asyncio
+import threading
+import time
+from MangaDownload.RateControl import AimdLimiter, HostRateController, TokenBucket
+
+
+def test_async_waiters_get_the_slots_in_arrival_order():
+    limiter = AimdLimiter("cdn.test", initial=1, minimum=1, maximum=1)
+    order = []
+
+    async def request(index):
+        await limiter.acquire_async()
+        order.append(index)
+        await asyncio.sleep(0)
+        limiter.release(0.01, congested=False)
+
+    async def main():
+        await asyncio.gather(*(request(index) for index in range(50)))
+
+    asyncio.run(main())
+
+    assert order == list(range(50))
+    assert limiter.in_flight == 0
+
+
+def test_async_waiters_do_not_poll_while_the_host_is_full():
+    controller = HostRateController(rate_limits={}, max_limit=1)
+    limiter = controller.get_limiter("cdn.test")
+    limiter.limit = 1
+
+    async def main():
+        await controller.acquire_async("cdn.test")
+        waiters = [asyncio.ensure_future(controller.acquire_async("cdn.test")) for _ in range(1000)]
+        await asyncio.sleep(0)
+        cpu_start = time.process_time()
+        await asyncio.sleep(0.5)
+        cpu_used = time.process_time() - cpu_start
+        for waiter in waiters:
+            waiter.cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+        return cpu_used
+
+    assert asyncio.run(main()) < 0.1
+    assert limiter.in_flight == 1
+
+
+def test_a_slot_released_from_another_thread_wakes_the_loop():
+    limiter = AimdLimiter("cdn.test", initial=1, minimum=1, maximum=1)
+    limiter.acquire()
+
+    async def main():
+        timer = threading.Timer(0.05, limiter.release, args=(0.01, False))
+        timer.start()
+        await asyncio.wait_for(limiter.acquire_async(), timeout=5)
+
+    asyncio.run(main())
+    assert limiter.in_flight == 1
+
+
+def test_a_cancelled_waiter_gives_its_slot_back():
+    limiter = AimdLimiter("cdn.test", initial=1, minimum=1, maximum=1)
+
+    async def main():
+        await limiter.acquire_async()
+        cancelled = asyncio.ensure_future(limiter.acquire_async())
+        waiting = asyncio.ensure_future(limiter.acquire_async())
+        await asyncio.sleep(0)
+        # The slot is handed to the first waiter, cancelled before it runs
+        limiter.release(0.01, congested=False)
+        cancelled.cancel()
+        await asyncio.wait_for(waiting, timeout=5)
+
+    asyncio.run(main())
+    assert limiter.in_flight == 1
+
+
+def test_congestion_halves_the_limit():
+    limiter = AimdLimiter("cdn.test", initial=8, minimum=1, maximum=30)
+    limiter.acquire()
+    limiter.release(0.5, congested=True)
+
+    assert int(limiter.limit) == 4
+
+
+def test_token_bucket_spaces_the_requests_after_the_burst():
+    bucket = TokenBucket(rate=10, burst=2)
+    delays = [bucket.reserve() for _ in range(4)]
+
+    assert delays[:2] == [0.0, 0.0]
+    assert 0.05 < delays[2] <= 0.1
+    assert 0.15 < delays[3] <= 0.2